@@ -10,12 +10,15 @@ from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
 from PySide6.QtCore import Qt, QDate
 from PySide6.QtGui import QFont, QPalette, QColor, QIcon, QIntValidator
 from style_sheet import StyleSheet
-from database import Database
+from metrics import metrics
 import qtawesome as qta
 from company_manager_dialog import CompanyManagerDialog
 from vehicle_manager_dialog import VehicleManagerDialog
 from wash_item_manager_dialog import WashItemManagerDialog
+from wash_item_catalog import WashItemCatalog
+from wash_items import price_at, item_ref
 class AddRecordDialog(QDialog):
+    @metrics.timed("dialog.AddRecordDialog")
     def __init__(self, parent=None, data=None, current_company=None, current_vehicle=None):
         super().__init__(parent)
         self.setWindowTitle("新增紀錄")
@@ -25,8 +28,16 @@ class AddRecordDialog(QDialog):
         self.current_company = current_company
         self.current_vehicle = current_vehicle
         self.database = parent.database if parent else None
+        self.wash_item_catalog = getattr(parent, "wash_item_catalog", None)
+        if self.wash_item_catalog is None and self.database:
+            self.wash_item_catalog = WashItemCatalog(self.database, self)
         self.wash_items = self.load_wash_items()
         self.setup_ui()
+        self.date_edit.dateChanged.connect(self.update_wash_item_prices)
+        # 其他視窗修改洗車項目時就地更新勾選框
+        if self.wash_item_catalog:
+            self.wash_item_catalog.items_changed.connect(self.on_wash_items_changed)
+            self.finished.connect(self.unsubscribe)
         
         # 初始化完成後更新車輛列表
         if self.company_combo.count() > 1:
@@ -42,33 +53,24 @@ class AddRecordDialog(QDialog):
         self.update_vehicles()
 
     def load_wash_items(self):
-        try:
-            if not self.database:
-                return []
-            # 從 Firebase 載入洗車項目
-            items = self.database.get_wash_items()
-            if not items:
-                default_items = [
-                    "引擎清洗",
-                    "車身清洗",
-                    "輪胎清洗",
-                    "車斗清洗",
-                    "內裝清洗"
-                ]
-                self.database.save_wash_items(default_items)
-                return default_items
-            return items
-        except Exception as e:
-            print(f"載入洗車項目時發生錯誤：{str(e)}")
+        # 主視窗載入資料時已取得洗車項目（並隨即時更新保持最新），不會重新下載
+        if not self.wash_item_catalog:
             return []
+        return self.wash_item_catalog.items()
 
     def save_wash_items(self, items):
         try:
-            if self.database:
-                self.database.save_wash_items(items)
+            if self.wash_item_catalog:
+                self.wash_item_catalog.set_items(items)
         except Exception as e:
             print(f"儲存洗車項目時發生錯誤：{str(e)}")
 
+    def unsubscribe(self):
+        try:
+            self.wash_item_catalog.items_changed.disconnect(self.on_wash_items_changed)
+        except (RuntimeError, TypeError):
+            pass
+
     def setup_ui(self):
         layout = QVBoxLayout()
         layout.setSpacing(20)
@@ -239,33 +241,58 @@ class AddRecordDialog(QDialog):
         # 重新建立勾選框
         self.wash_items_checkboxes = {}
         for item in self.wash_items:
-            # 處理新格式（字典）和舊格式（字串）
-            if isinstance(item, dict):
-                item_name = item["name"]
-                checkbox = QCheckBox(f"{item_name} - ${item['price']}")
-                checkbox.setProperty("item_data", item)  # 儲存完整的項目資料
-            else:
-                item_name = item
-                checkbox = QCheckBox(item_name)
-                checkbox.setProperty("item_data", {"name": item, "price": 0})
-
-            checkbox.setStyleSheet("""
-                QCheckBox {
-                    margin-right: 10px;
-                }
-            """)
-            self.wash_items_checkboxes[item_name] = checkbox
+            checkbox = self.create_wash_item_checkbox(item)
+            self.wash_items_checkboxes[item["id"]] = checkbox
             self.items_layout.addWidget(checkbox)
         self.items_layout.addStretch()
 
+    def create_wash_item_checkbox(self, item):
+        checkbox = QCheckBox()
+        self.set_checkbox_item(checkbox, item)
+        checkbox.setStyleSheet("""
+            QCheckBox {
+                margin-right: 10px;
+            }
+        """)
+        return checkbox
+
+    def record_date(self):
+        return self.date_edit.date().toString("yyyy-MM-dd")
+
+    def set_checkbox_item(self, checkbox, item):
+        # 顯示紀錄日期當天適用的價格
+        checkbox.setText(f"{item['name']} - ${price_at(item, self.record_date())}")
+        checkbox.setProperty("item_data", item)  # 儲存完整的項目資料
+
+    def update_wash_item_prices(self):
+        """日期變更時，勾選框改為顯示該日期適用的價格"""
+        for checkbox in self.wash_items_checkboxes.values():
+            self.set_checkbox_item(checkbox, checkbox.property("item_data"))
+
+    def on_wash_items_changed(self, items):
+        """洗車項目變更時就地更新勾選框，保留仍存在項目的勾選狀態"""
+        self.wash_items = items
+        old_checkboxes = self.wash_items_checkboxes
+        self.wash_items_checkboxes = {}
+        for index, item in enumerate(items):
+            checkbox = old_checkboxes.pop(item["id"], None)
+            if checkbox is None:
+                checkbox = self.create_wash_item_checkbox(item)
+                self.items_layout.insertWidget(index, checkbox)
+            else:
+                self.set_checkbox_item(checkbox, item)
+                if self.items_layout.indexOf(checkbox) != index:
+                    self.items_layout.removeWidget(checkbox)
+                    self.items_layout.insertWidget(index, checkbox)
+            self.wash_items_checkboxes[item["id"]] = checkbox
+        for checkbox in old_checkboxes.values():
+            self.items_layout.removeWidget(checkbox)
+            checkbox.deleteLater()
+
     def manage_wash_items(self):
-        """管理洗車項目"""
+        """管理洗車項目（修改會透過 wash_item_catalog 通知，勾選框隨即更新）"""
         dialog = WashItemManagerDialog(self)
-        if dialog.exec():
-            self.wash_items = dialog.get_wash_items()
-            self.setup_wash_items()
-            if hasattr(self, 'save_wash_items'):
-                self.save_wash_items(self.wash_items)
+        dialog.exec()
 
     def load_companies(self):
         self.company_combo.clear()
@@ -297,15 +324,11 @@ class AddRecordDialog(QDialog):
         """獲取記錄數據"""
         items = []
         
-        # 收集所有服務項目
+        # 收集所有服務項目：只寫入項目 ID 及紀錄日期適用的價格版本，名稱及金額由目錄查出
+        record_date = self.record_date()
         for checkbox in self.wash_items_checkboxes.values():
             if checkbox.isChecked():
-                item_data = checkbox.property("item_data")
-                if isinstance(item_data, dict):
-                    items.append({
-                        "name": item_data["name"],
-                        "price": item_data["price"]
-                    })
+                items.append(item_ref(checkbox.property("item_data"), record_date))
         
         # 添加校正項目（如果有填寫）
         calibration_name = self.calibration_name.text().strip()
@@ -329,7 +352,7 @@ class AddRecordDialog(QDialog):
         record_data = {
             "company_id": self.company_combo.currentData(),
             "vehicle_id": self.vehicle_combo.currentData(),
-            "date": self.date_edit.date().toString("yyyy-MM-dd"),
+            "date": record_date,
             "items": items,
             "remarks": self.remarks_edit.toPlainText(),
             "payment_type": payment_type
@@ -387,15 +410,3 @@ class AddRecordDialog(QDialog):
         else:
             # 如果之前选中的车辆已被删除，则设置为第一个选项
             self.vehicle_combo.setCurrentIndex(0)
-
-    def update_wash_items(self):
-        """更新洗車項目"""
-        if hasattr(self, 'wash_items_checkboxes'):
-            # 保存當前已選中的項目
-            selected_items = self.get_selected_items()
-            # 重新設置勾選框
-            self.setup_wash_items()
-            # 恢復之前選中的項目
-            for item_text, checkbox in self.wash_items_checkboxes.items():
-                if item_text in selected_items:
-                    checkbox.setChecked(True)
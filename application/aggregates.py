@@ -0,0 +1,89 @@
+# aggregates.py
+from datetime import date
+
+
+def month_of(date_ordinal):
+    """日期序數所屬的月份（yyyymm），無法解析的日期回傳 None"""
+    if not date_ordinal:
+        return None
+    day = date.fromordinal(date_ordinal)
+    return day.year * 100 + day.month
+
+
+def month_start(month):
+    """月份第一天的日期序數"""
+    return date(month // 100, month % 100, 1).toordinal()
+
+
+def next_month(month):
+    year, month = divmod(month, 100)
+    return (year + 1) * 100 + 1 if month == 12 else year * 100 + month + 1
+
+
+class Totals:
+    """一組紀錄的筆數及金額，另依應付/應收類型分開加總"""
+
+    __slots__ = ("count", "amount", "by_payment")
+
+    def __init__(self):
+        self.count = 0
+        self.amount = 0
+        self.by_payment = [0, 0, 0]  # 依 record_store.PAYMENT_TYPES 的代碼
+
+    def add(self, amount, payment_code, sign=1):
+        self.count += sign
+        self.amount += sign * amount
+        self.by_payment[payment_code] += sign * amount
+
+    def merge(self, other):
+        self.count += other.count
+        self.amount += other.amount
+        for code, amount in enumerate(other.by_payment):
+            self.by_payment[code] += amount
+
+
+class RecordAggregates:
+    """依全部、公司、車輛、月份及應付/應收類型累計的金額
+
+    每筆紀錄新增或刪除時只更新它所屬的幾個分組，不需要重新掃描紀錄。
+    分組的 key：
+        ("all",)
+        ("company", company_code) / ("vehicle", vehicle_code)
+        ("month", month) / ("company_month", company_code, month) /
+        ("vehicle_month", vehicle_code, month)
+        ("payment", payment_code)
+    """
+
+    def __init__(self):
+        self.groups = {}
+
+    def clear(self):
+        self.groups = {}
+
+    @staticmethod
+    def keys_of(company_code, vehicle_code, month, payment_code):
+        keys = [("all",), ("company", company_code), ("vehicle", vehicle_code),
+                ("payment", payment_code)]
+        if month is not None:
+            keys.append(("month", month))
+            keys.append(("company_month", company_code, month))
+            keys.append(("vehicle_month", vehicle_code, month))
+        return keys
+
+    def add(self, amount, company_code, vehicle_code, date_ordinal, payment_code, sign=1):
+        """累計一筆紀錄，sign 為 -1 時扣除"""
+        month = month_of(date_ordinal)
+        for key in self.keys_of(company_code, vehicle_code, month, payment_code):
+            totals = self.groups.get(key)
+            if totals is None:
+                totals = self.groups[key] = Totals()
+            totals.add(amount, payment_code, sign)
+            if not totals.count:
+                del self.groups[key]
+
+    def remove(self, amount, company_code, vehicle_code, date_ordinal, payment_code):
+        self.add(amount, company_code, vehicle_code, date_ordinal, payment_code, sign=-1)
+
+    def get(self, *key):
+        """取得某分組的累計，不存在時回傳空的 Totals"""
+        return self.groups.get(key) or Totals()
@@ -0,0 +1,15 @@
+# app_paths.py
+import os
+import sys
+
+
+def get_data_dir():
+    """取得本地資料目錄（快取、待同步紀錄等），不存在時自動建立"""
+    data_dir = os.environ.get('RECORD_SYSTEM_DATA_DIR')
+    if not data_dir:
+        if sys.platform == 'win32' and os.environ.get('LOCALAPPDATA'):
+            data_dir = os.path.join(os.environ['LOCALAPPDATA'], 'RecordSystem')
+        else:
+            data_dir = os.path.join(os.path.expanduser('~'), '.record_system')
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
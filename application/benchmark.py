@@ -0,0 +1,287 @@
+# benchmark.py
+"""主畫面各項操作的效能量測
+
+以 sample_data 產生的資料（存在記憶體儲存後端中）開啟主視窗，依序量測：
+    sync              首次啟動從儲存後端下載全部資料到本地副本
+    startup           由本地副本啟動，到全部紀錄顯示在表格上
+    table_build       update_table() 重建表格
+    filter_keystroke  搜尋框每輸入一個字的篩選（含重繪），取平均
+    filter_company    切換公司的篩選
+    totals            update_totals() 金額總計
+    export_xlsx/csv   匯出目前的篩選結果（parquet 需安裝 pyarrow）
+    save_data         修改 100 筆紀錄後 save_data()
+
+視窗以 Qt offscreen 模式執行，不需要螢幕。結果可用 --output 存成 JSON，
+之後以 --compare 與新的結果逐項比較。
+
+用法（在 application 目錄下執行）：
+    python -m benchmark --sizes 1000 10000 --output before.json
+    python -m benchmark --sizes 1000 10000 --compare before.json
+"""
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+SAVE_COUNT = 100         # save_data 修改的紀錄數
+SLOWER_THRESHOLD = 0.1   # 比較時慢超過 10% 標示出來
+LOAD_TIMEOUT = 3600      # 秒
+
+DESCRIPTIONS = {
+    "generate": "產生資料",
+    "sync": "首次下載",
+    "startup": "由本地副本啟動",
+    "table_build": "重建表格",
+    "filter_keystroke": "搜尋（每個字）",
+    "filter_company": "切換公司",
+    "totals": "金額總計",
+    "export_xlsx": "匯出 Excel",
+    "export_csv": "匯出 CSV",
+    "export_parquet": "匯出 Parquet",
+    "save_data": f"儲存 {SAVE_COUNT} 筆修改",
+}
+
+
+class Benchmark:
+    """在同一個 QApplication 中依序量測各資料量"""
+
+    def __init__(self, app, repeat=1, seed=0, exports=("xlsx", "csv", "parquet")):
+        self.app = app
+        self.repeat = repeat
+        self.seed = seed
+        self.exports = exports
+        self.results = []
+
+    def pump(self, until=None, timeout=LOAD_TIMEOUT):
+        """處理 Qt 事件，直到 until() 成立（未指定時只處理目前的事件）"""
+        deadline = time.perf_counter() + timeout
+        while True:
+            self.app.processEvents()
+            if until is None or until():
+                return
+            if time.perf_counter() > deadline:
+                raise TimeoutError("等待逾時")
+            time.sleep(0.005)
+
+    def add(self, size, name, runs, **details):
+        """記錄一個項目，seconds 預設為各次的中位數"""
+        details.setdefault("seconds", statistics.median(runs))
+        result = dict(size=size, benchmark=name, runs=runs, **details)
+        self.results.append(result)
+        print(format_result(result), flush=True)
+
+    def measure(self, size, name, function, repeat=None):
+        runs = []
+        for _ in range(repeat or self.repeat):
+            start = time.perf_counter()
+            function()
+            self.pump()
+            runs.append(time.perf_counter() - start)
+        self.add(size, name, runs)
+
+    def run(self, size):
+        from sample_data import generate_data
+        from main import MainWindow
+
+        start = time.perf_counter()
+        data = generate_data(size, self.seed)
+        self.add(size, "generate", [time.perf_counter() - start])
+
+        window = MainWindow()
+        try:
+            database = window.database
+            database.storage.update({"": data})
+            del data
+            start = time.perf_counter()
+            database.sync()
+            self.add(size, "sync", [time.perf_counter() - start])
+
+            start = time.perf_counter()
+            window.show()
+            # 本地副本載入完成、背景確認過全部公司後會開始監聽變更
+            self.pump(lambda: window.change_stream is not None)
+            self.add(size, "startup", [time.perf_counter() - start], rows=window.table_model.rowCount())
+            window.change_stream.close()
+
+            self.measure(size, "table_build", window.update_table)
+            self.measure_keystrokes(size, window)
+            self.measure_company_filter(size, window)
+            self.measure(size, "totals", window.update_totals)
+            self.measure_exports(size, window)
+            self.measure_save(size, window)
+        finally:
+            window.close()
+            window.deleteLater()
+            self.pump()
+            gc.collect()
+
+    def measure_keystrokes(self, size, window):
+        """逐字輸入車牌及服務項目，每個字立即篩選（不等待 FilterScheduler 的延遲）"""
+        plates = [window.table_model.store.plate(0)] if len(window.table_model.store) else []
+        runs = []
+        for _ in range(self.repeat):
+            for text in plates + ["攪拌桶清洗"]:
+                for length in range(1, len(text) + 1):
+                    start = time.perf_counter()
+                    window.search_input.setText(text[:length])
+                    window.filter_scheduler.flush()
+                    self.pump()
+                    runs.append(time.perf_counter() - start)
+                window.search_input.clear()
+                window.filter_scheduler.flush()
+                self.pump()
+        self.add(size, "filter_keystroke", runs, seconds=statistics.mean(runs), max=max(runs))
+
+    def measure_company_filter(self, size, window):
+        if window.company_combo.count() < 2:
+            return
+
+        def select(index):
+            window.company_combo.setCurrentIndex(index)
+            window.filter_scheduler.flush()
+
+        runs = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            select(1)
+            self.pump()
+            runs.append(time.perf_counter() - start)
+            select(0)
+            self.pump()
+        self.add(size, "filter_company", runs)
+
+    def measure_exports(self, size, window):
+        from record_export import EXPORTERS
+
+        with tempfile.TemporaryDirectory() as directory:
+            for extension in self.exports:
+                if extension == "parquet":
+                    try:
+                        import pyarrow  # noqa: F401
+                    except ImportError:
+                        continue
+                path = os.path.join(directory, f"benchmark.{extension}")
+
+                def export():
+                    # 與 export_records 相同：篩選結果的列位置及資料副本
+                    positions = window.proxy_model.source_rows()
+                    EXPORTERS[f".{extension}"](window.table_model.store.snapshot(), positions, path)
+
+                self.measure(size, f"export_{extension}", export)
+
+    def measure_save(self, size, window):
+        """每次修改不同的 SAVE_COUNT 筆紀錄，避免與前一次尚未回傳的版本號衝突"""
+        targets = []
+        for company_id, company_data in window.data["companies"].items():
+            for vehicle_id, vehicle_data in company_data.get("vehicles", {}).items():
+                for record_id, record in vehicle_data.get("records", {}).items():
+                    targets.append((company_id, vehicle_id, record_id, record))
+        rounds = iter([targets[start:start + SAVE_COUNT] for start in range(0, len(targets), SAVE_COUNT)])
+
+        def save():
+            for company_id, vehicle_id, record_id, record in next(rounds, []):
+                record["remarks"] = f"{record.get('remarks', '')}（已修改）"
+                window.database.mark_dirty("companies", company_id, "vehicles", vehicle_id,
+                                           "records", record_id, "remarks")
+            window.save_data()
+
+        self.measure(size, "save_data", save)
+
+
+def format_result(result):
+    seconds = result["seconds"]
+    text = f"{result['size']:>9,}  {DESCRIPTIONS.get(result['benchmark'], result['benchmark']):<16}{seconds * 1000:12.2f} ms"
+    if "max" in result:
+        text += f"（最慢 {result['max'] * 1000:.2f} ms）"
+    if "rows" in result:
+        text += f"（{result['rows']:,} 列）"
+    return text
+
+
+def environment():
+    from PySide6 import __version__ as pyside_version
+
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "pyside": pyside_version,
+    }
+    try:
+        info["commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return info
+
+
+def compare(results, baseline_path, out=sys.stdout):
+    """與之前的結果逐項比較，只比較兩邊都有的資料量及項目"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(result["size"], result["benchmark"]): result["seconds"]
+                    for result in json.load(f)["results"]}
+    print(f"\n與 {baseline_path} 比較：", file=out)
+    for result in results:
+        before = baseline.get((result["size"], result["benchmark"]))
+        if not before:
+            continue
+        change = result["seconds"] / before - 1
+        mark = "  較慢" if change > SLOWER_THRESHOLD else ""
+        print(f"{result['size']:>9,}  {DESCRIPTIONS.get(result['benchmark'], result['benchmark']):<16}"
+              f"{before * 1000:12.2f} → {result['seconds'] * 1000:.2f} ms（{change:+.1%}）{mark}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="量測主畫面各項操作的效能")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="紀錄筆數（可指定多個）")
+    parser.add_argument("--repeat", type=int, default=3, help="每個項目重複次數，取中位數")
+    parser.add_argument("--seed", type=int, default=0, help="sample_data 的亂數種子")
+    parser.add_argument("--exports", nargs="*", default=["xlsx", "csv", "parquet"],
+                        choices=["xlsx", "csv", "parquet"], help="要量測的匯出格式")
+    parser.add_argument("--output", help="將結果存成 JSON")
+    parser.add_argument("--compare", metavar="JSON", help="與之前存下的結果比較")
+    args = parser.parse_args(argv)
+
+    # 使用記憶體中的儲存後端及暫存的資料目錄，不會動到實際的資料
+    data_dir = tempfile.TemporaryDirectory()
+    os.environ["RECORD_SYSTEM_DATA_DIR"] = data_dir.name
+    os.environ["RECORD_SYSTEM_STORAGE"] = "memory"
+
+    from PySide6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([sys.argv[0]])
+
+    benchmark = Benchmark(app, args.repeat, args.seed, args.exports)
+    for size in args.sizes:
+        benchmark.run(size)
+
+    if args.output:
+        report = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "environment": environment(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "results": benchmark.results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"結果已存到 {args.output}")
+    if args.compare:
+        compare(benchmark.results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
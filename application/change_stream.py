@@ -0,0 +1,187 @@
+# change_stream.py
+import threading
+from collections import namedtuple
+from change_tracker import assoc_path
+from records import normalize_records
+
+
+# kind：insert / update / delete
+# level：company / vehicle / record / wash_items / migrate
+# value：新的資料，公司不含 vehicles、車輛不含 records，刪除時為 None
+# migrate 事件代表該車輛的紀錄在 Firebase 上仍是舊格式（例如網頁版以陣列寫回），需要轉換後寫回
+ChangeEvent = namedtuple("ChangeEvent", "kind level company_id vehicle_id record_id value")
+
+
+def without(node, key):
+    """節點的欄位（不含下層的 vehicles 或 records）"""
+    if not isinstance(node, dict):
+        return None
+    return {field: value for field, value in node.items() if field != key}
+
+
+def diff_vehicle(company_id, vehicle_id, before, after, events):
+    """比較一台車輛前後的資料，將差異加入 events"""
+    meta_before = without(before, "records")
+    meta_after = without(after, "records")
+    if meta_after is not None and meta_after != meta_before:
+        kind = "insert" if meta_before is None else "update"
+        events.append(ChangeEvent(kind, "vehicle", company_id, vehicle_id, None, meta_after))
+
+    records_before = normalize_records(company_id, vehicle_id, (before or {}).get("records"))[0]
+    records_after, migrate = normalize_records(company_id, vehicle_id, (after or {}).get("records"))
+    for record_id, record in records_after.items():
+        old = records_before.get(record_id)
+        if old is None:
+            events.append(ChangeEvent("insert", "record", company_id, vehicle_id, record_id, record))
+        elif old != record:
+            events.append(ChangeEvent("update", "record", company_id, vehicle_id, record_id, record))
+    for record_id in records_before.keys() - records_after.keys():
+        events.append(ChangeEvent("delete", "record", company_id, vehicle_id, record_id, None))
+
+    if meta_after is None and meta_before is not None:
+        events.append(ChangeEvent("delete", "vehicle", company_id, vehicle_id, None, None))
+    elif migrate:
+        events.append(ChangeEvent("update", "migrate", company_id, vehicle_id, None, None))
+
+
+def diff_company(company_id, before, after, events):
+    """比較一間公司前後的資料，將差異加入 events"""
+    meta_before = without(before, "vehicles")
+    meta_after = without(after, "vehicles")
+    if meta_after is not None and meta_after != meta_before:
+        kind = "insert" if meta_before is None else "update"
+        events.append(ChangeEvent(kind, "company", company_id, None, None, meta_after))
+
+    vehicles_before = (before or {}).get("vehicles") or {}
+    vehicles_after = (after or {}).get("vehicles") or {}
+    for vehicle_id in list(vehicles_after) + [v for v in vehicles_before if v not in vehicles_after]:
+        vehicle_before = vehicles_before.get(vehicle_id)
+        vehicle_after = vehicles_after.get(vehicle_id)
+        if vehicle_before is not vehicle_after:
+            diff_vehicle(company_id, vehicle_id, vehicle_before, vehicle_after, events)
+
+    if meta_after is None and meta_before is not None:
+        events.append(ChangeEvent("delete", "company", company_id, None, None, None))
+
+
+def copy_structure(companies):
+    """複製公司/車輛/紀錄字典的結構（紀錄本身共用），作為比較的起點"""
+    copied = {}
+    for company_id, company_data in companies.items():
+        vehicles = {}
+        for vehicle_id, vehicle_data in company_data.get("vehicles", {}).items():
+            vehicles[vehicle_id] = dict(vehicle_data, records=dict(vehicle_data.get("records") or {}))
+        copied[company_id] = dict(company_data, vehicles=vehicles)
+    return copied
+
+
+class ChangeStream:
+    """監聽 Firebase 上已載入公司及 wash_items 的變更，轉為細部的新增/修改/刪除事件
+
+    只訂閱紀錄已載入的公司（companies/<id>），尚未選擇過的公司不會被下載，
+    保留延後載入及 ETag 同步的效果；新增或刪除的公司由主視窗定期以
+    shallow 查詢公司 ID 得知（Firebase 的監聽無法只取一層）。
+    保留一份遠端資料的副本，每個 put/patch 事件只比較受影響的公司或車輛。
+    訂閱後 Firebase 送出的第一個事件是該公司完整的資料，與 watch() 傳入的
+    目前資料比較後，只會送出期間的差異。
+    callback(events) 在 Firebase 的監聽執行緒中呼叫。
+    """
+
+    def __init__(self, database, callback):
+        self.database = database
+        self.callback = callback
+        self.companies = {}
+        self.wash_items = None
+        self.registrations = {}  # company_id（wash_items 為 None）-> 監聽
+        # 每個訂閱各有監聽執行緒，比較及更新副本時依序進行
+        self.lock = threading.Lock()
+
+    def start(self, companies, wash_items=None):
+        """開始監聽，companies 為目前已載入的公司（以 copy_structure 複製）"""
+        self.wash_items = wash_items
+        self.registrations[None] = self.database.listen("wash_items", self._on_wash_items_event)
+        for company_id, company_data in companies.items():
+            self.watch(company_id, company_data)
+
+    def watch(self, company_id, company_data):
+        """開始監聽一間已載入的公司，company_data 為目前畫面上的資料（以 copy_structure 複製）"""
+        with self.lock:
+            if company_id in self.registrations:
+                return
+            self.companies[company_id] = company_data
+            self.registrations[company_id] = None  # 連線期間避免重複訂閱
+        registration = self.database.listen(
+            f"companies/{company_id}", lambda event: self._on_company_event(company_id, event)
+        )
+        with self.lock:
+            if company_id in self.registrations:
+                self.registrations[company_id] = registration
+                return
+        registration.close()  # 連線期間已取消監聽
+
+    def unwatch(self, company_id):
+        """停止監聽一間公司（已被刪除）"""
+        with self.lock:
+            registration = self.registrations.pop(company_id, None)
+            self.companies.pop(company_id, None)
+        if registration is not None:
+            registration.close()
+
+    def watched(self):
+        with self.lock:
+            return {company_id for company_id in self.registrations if company_id is not None}
+
+    def close(self):
+        with self.lock:
+            registrations, self.registrations = self.registrations, {}
+        for registration in registrations.values():
+            if registration is not None:
+                registration.close()
+
+    def _on_company_event(self, company_id, event):
+        events = []
+        with self.lock:
+            if company_id not in self.registrations:
+                return
+            for parts, value in self._updates(event):
+                parts = [company_id] + parts
+                # 紀錄或車輛以下的變更只比較該車輛，其餘比較整間公司
+                if len(parts) >= 3 and parts[1] == "vehicles":
+                    scope = parts[:3]
+                else:
+                    scope = parts[:1]
+                company = self.companies.get(scope[0])
+                before = company if len(scope) == 1 else ((company or {}).get("vehicles") or {}).get(scope[2])
+                after = assoc_path(before, parts[len(scope):], value)
+                self.companies = assoc_path(self.companies, scope, after) or {}
+                self._diff_scope(scope, before, after, events)
+        if events:
+            self.callback(events)
+
+    def _diff_scope(self, scope, before, after, events):
+        count = len(events)
+        if len(scope) == 1:
+            diff_company(scope[0], before, after, events)
+        else:
+            diff_vehicle(scope[0], scope[2], before, after, events)
+        if len(events) > count:
+            self.database.remote_changed(f"companies/{scope[0]}")
+
+    def _on_wash_items_event(self, event):
+        before = self.wash_items
+        for parts, value in self._updates(event):
+            self.wash_items = assoc_path(self.wash_items, parts, value)
+        if self.wash_items == before:
+            return
+        self.database.remote_changed("wash_items")
+        # 以原本的格式傳出（網頁版為以項目 ID 為 key 的物件），由 WashItemCatalog 整理
+        self.callback([ChangeEvent("update", "wash_items", None, None, None, self.wash_items)])
+
+    @staticmethod
+    def _updates(event):
+        """將 put/patch 事件轉為 [(路徑片段, 新資料)]"""
+        parts = [part for part in event.path.split("/") if part]
+        if event.event_type == "put":
+            return [(parts, event.data)]
+        return [(parts + [part for part in key.split("/") if part], value)
+                for key, value in (event.data or {}).items()]
@@ -0,0 +1,112 @@
+# change_tracker.py
+
+
+def join_path(*parts):
+    """將路徑片段組合成 Firebase 路徑"""
+    return "/".join(str(part).strip("/") for part in parts if part != "")
+
+
+def get_path_value(data, path):
+    """依路徑從巢狀資料中取值，路徑不存在時回傳 None"""
+    node = data
+    for key in path.split("/"):
+        if isinstance(node, dict):
+            node = node.get(key)
+        elif isinstance(node, list):
+            try:
+                node = node[int(key)]
+            except (ValueError, IndexError):
+                return None
+        else:
+            return None
+        if node is None:
+            return None
+    return node
+
+
+def set_path_value(data, path, value):
+    """依路徑寫入巢狀資料，value 為 None 時刪除該節點"""
+    keys = path.split("/")
+    node = data
+    for key in keys[:-1]:
+        if isinstance(node, list):
+            node = node[int(key)]
+            continue
+        if not isinstance(node.get(key), (dict, list)):
+            if value is None:
+                return
+            node[key] = {}
+        node = node[key]
+    key = keys[-1]
+    if isinstance(node, list):
+        index = int(key)
+        if value is None:
+            if index < len(node):
+                node.pop(index)
+        elif index < len(node):
+            node[index] = value
+        else:
+            node.append(value)
+    elif value is None:
+        node.pop(key, None)
+    else:
+        node[key] = value
+
+
+def assoc_path(node, parts, value):
+    """回傳套用修改後的新節點，只複製路徑上的節點，原本的資料不會被修改
+
+    與 Firebase 相同，value 為 None 代表刪除，清空的節點也會一併移除。
+    """
+    if not parts:
+        return value
+    if isinstance(node, list):
+        node = {str(index): child for index, child in enumerate(node) if child is not None}
+    node = dict(node) if isinstance(node, dict) else {}
+    key = parts[0]
+    child = assoc_path(node.get(key), parts[1:], value)
+    if child is None:
+        node.pop(key, None)
+    else:
+        node[key] = child
+    return node or None
+
+
+def apply_updates(data, updates):
+    """將多路徑更新套用到巢狀資料"""
+    for path, value in updates.items():
+        set_path_value(data, path, value)
+    return data
+
+
+class ChangeTracker:
+    """記錄 self.data 中被修改過的路徑，儲存時只上傳這些路徑"""
+
+    def __init__(self):
+        self.dirty_paths = set()
+
+    def mark(self, *parts):
+        """標記路徑為已變更"""
+        self.dirty_paths.add(join_path(*parts))
+
+    def has_changes(self):
+        return bool(self.dirty_paths)
+
+    def collect(self, data):
+        """依目前資料產生多路徑更新內容，已被上層路徑涵蓋的子路徑會略過"""
+        updates = {}
+        for path in sorted(self.dirty_paths):
+            if any(path.startswith(parent + "/") for parent in updates):
+                continue
+            # 路徑已不存在時以 None 刪除
+            updates[path] = get_path_value(data, path)
+        return updates
+
+    def discard(self, paths):
+        """移除已成功寫入的路徑"""
+        paths = set(paths)
+        # 子路徑也已隨上層路徑一併寫入
+        self.dirty_paths = {
+            p for p in self.dirty_paths
+            if p not in paths and not any(p.startswith(path + "/") for path in paths)
+        }
@@ -0,0 +1,179 @@
+# cli.py
+"""洗車紀錄命令列工具（不需要開啟視窗）
+
+用法（在 application 目錄下執行）：
+    python -m cli list --company 甲公司 --from 2024-01-01 --to 2024-01-31
+    python -m cli totals --by vehicle --search 引擎
+    python -m cli totals --by item --from 2024-01-01
+    python -m cli export 一月紀錄.xlsx --company 甲公司
+    python -m cli --storage json:D:/備份/records.json list
+"""
+import argparse
+import csv
+import sys
+from datetime import datetime
+from pathlib import Path
+from database import Database
+from storage import create_storage, parse_storage_spec
+from records import migrate_records, item_name, DATE_FORMATS
+from record_store import RecordStore, PAYMENT_TYPE_CODES
+from record_query import RecordQuery
+from record_export import EXPORTERS, FLAT_HEADERS, flat_row, item_price
+from aggregates import Totals, month_of
+
+
+def parse_date(value):
+    """命令列日期參數，接受 yyyy-MM-dd 或 yyyy/MM/dd"""
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).toordinal()
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"無法解析日期：{value}")
+
+
+def build_parser():
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("--company", help="公司 ID 或名稱")
+    filters.add_argument("--vehicle", help="車輛 ID 或車牌號碼")
+    filters.add_argument("--from", dest="start", type=parse_date, help="起始日期")
+    filters.add_argument("--to", dest="end", type=parse_date, help="結束日期")
+    filters.add_argument("--search", default="", help="搜尋文字（與主畫面搜尋相同）")
+    filters.add_argument("--offline", action="store_true",
+                         help="不與儲存後端同步，直接使用本地副本（可能不是最新資料）")
+    # 舊版的參數，現在預設就會同步
+    filters.add_argument("--sync", action="store_true", help=argparse.SUPPRESS)
+
+    parser = argparse.ArgumentParser(prog="python -m cli", description="查詢及匯出洗車紀錄")
+    parser.add_argument("--storage", metavar="SPEC",
+                        help="儲存後端，例如 sqlite、json:路徑、memory（預設依設定檔，未設定時為 Firebase）")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", parents=[filters], help="列出符合條件的紀錄")
+    totals = commands.add_parser("totals", parents=[filters], help="顯示金額總計")
+    totals.add_argument("--by", choices=["company", "vehicle", "month", "item"],
+                        help="分組方式（item 為各服務項目的金額）")
+    export = commands.add_parser("export", parents=[filters], help="匯出符合條件的紀錄")
+    export.add_argument("path", help="輸出檔案（.xlsx、.csv 或 .parquet）")
+    return parser
+
+
+def find_company(data, value):
+    """以 ID 或名稱找出公司 ID"""
+    companies = data["companies"]
+    if value in companies:
+        return value
+    for company_id, company_data in companies.items():
+        if company_data.get("name") == value:
+            return company_id
+    return None
+
+
+def find_vehicle(data, value, company_id=None):
+    """以 ID 或車牌號碼找出車輛 ID，可限定公司"""
+    for cid, company_data in data["companies"].items():
+        if company_id and cid != company_id:
+            continue
+        vehicles = company_data.get("vehicles", {})
+        if value in vehicles:
+            return value
+        for vehicle_id, vehicle_data in vehicles.items():
+            if vehicle_data.get("plate") == value:
+                return vehicle_id
+    return None
+
+
+def load_store(database, offline=False):
+    """載入資料並建立 RecordStore
+
+    預設先與儲存後端同步（只下載 ETag 有變更的部分），offline 時只讀取本地副本。
+    """
+    if not offline:
+        database.sync()
+    data = database.get_cached_data()
+    migrate_records(data)  # 只在記憶體中轉換，不寫回
+    store = RecordStore()
+    store.load(data)
+    return data, store
+
+
+def format_totals(label, totals):
+    return (f"{label}\t{totals.count} 筆\t"
+            f"應收 ${totals.by_payment[PAYMENT_TYPE_CODES['receivable']]:,}\t"
+            f"應付 ${totals.by_payment[PAYMENT_TYPE_CODES['payable']]:,}\t"
+            f"合計 ${totals.amount:,}")
+
+
+def print_list(store, positions, out):
+    writer = csv.writer(out, delimiter="\t", lineterminator="\n")
+    writer.writerow(FLAT_HEADERS)
+    for position in positions:
+        writer.writerow(flat_row(store, position))
+
+
+def print_totals(store, query, group_by, out):
+    if group_by is None:
+        print(format_totals("全部", query.subtotal(store)), file=out)
+        return
+    groups = {}
+    for position in query.positions(store):
+        if group_by == "item":
+            for item in store.items[position]:
+                groups.setdefault(item_name(item), Totals()).add(
+                    item_price(item) or 0, store.payment_types[position])
+            continue
+        if group_by == "company":
+            key = store.company_name(position)
+        elif group_by == "vehicle":
+            key = f"{store.company_name(position)} {store.plate(position)}"
+        else:
+            month = month_of(store.date_ordinals[position])
+            key = f"{month // 100}-{month % 100:02d}" if month else "日期格式錯誤"
+        groups.setdefault(key, Totals()).add(store.totals[position], store.payment_types[position])
+    for key in sorted(groups):
+        print(format_totals(key, groups[key]), file=out)
+
+
+def main(argv=None, out=sys.stdout):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        database = Database(create_storage(parse_storage_spec(args.storage)) if args.storage else None,
+                            read_only=True)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        data, store = load_store(database, args.offline)
+    except Exception as e:
+        print(f"同步資料失敗：{e}（加上 --offline 可使用本地副本）", file=sys.stderr)
+        return 1
+
+    company_id = "all"
+    if args.company:
+        company_id = find_company(data, args.company)
+        if company_id is None:
+            parser.error(f"找不到公司：{args.company}")
+    vehicle_id = "all"
+    if args.vehicle:
+        vehicle_id = find_vehicle(data, args.vehicle, None if company_id == "all" else company_id)
+        if vehicle_id is None:
+            parser.error(f"找不到車輛：{args.vehicle}")
+
+    query = RecordQuery(company_id, vehicle_id, args.start, args.end, args.search)
+
+    if args.command == "list":
+        print_list(store, query.positions(store), out)
+    elif args.command == "totals":
+        print_totals(store, query, args.by, out)
+    elif args.command == "export":
+        extension = Path(args.path).suffix.lower()
+        if extension not in EXPORTERS:
+            parser.error("只支援 .xlsx、.csv 或 .parquet 檔案")
+        positions = query.positions(store)
+        EXPORTERS[extension](store, positions, args.path)
+        print(f"已匯出 {len(positions)} 筆紀錄到 {args.path}", file=out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+# company_loader.py
+import threading
+from collections import deque
+from PySide6.QtCore import QObject, Signal
+
+
+class CompanyLoader(QObject):
+    """在背景下載公司的完整資料（含紀錄），每批同時下載多間公司
+
+    request() 可指定優先載入（例如使用者剛選擇的公司），同一次執行中
+    已取得的公司不會重複下載。每完成一間公司發出 company_loaded，
+    佇列清空時發出 idle。
+    """
+
+    company_loaded = Signal(str, object, bool)  # company_id, 資料（已刪除為 None）, 是否有變更
+    load_failed = Signal(str, str)  # company_id, 錯誤訊息
+    idle = Signal()
+
+    def __init__(self, database, parent=None):
+        super().__init__(parent)
+        self.database = database
+        self.queue = deque()
+        self.fetched = set()
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def request(self, company_ids, urgent=False):
+        """要求載入公司，urgent 為 True 時排在佇列最前面"""
+        with self.condition:
+            for company_id in (reversed(list(company_ids)) if urgent else company_ids):
+                if company_id in self.fetched:
+                    continue
+                if company_id in self.queue:
+                    if not urgent:
+                        continue
+                    self.queue.remove(company_id)
+                if urgent:
+                    self.queue.appendleft(company_id)
+                else:
+                    self.queue.append(company_id)
+            self.condition.notify()
+
+    def is_fetched(self, company_id):
+        with self.condition:
+            return company_id in self.fetched
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+                # 一次取出最多 pool 大小的公司同時下載，之後加入的優先公司排在下一批最前面
+                batch = [self.queue.popleft()
+                         for _ in range(min(len(self.queue), self.database.pool.max_workers))]
+            for company_id, value, changed, error in self.database.get_companies(batch):
+                if error is not None:
+                    print(f"載入公司資料失敗：{error}")
+                    self.load_failed.emit(company_id, str(error))
+                    continue
+                with self.condition:
+                    self.fetched.add(company_id)
+                self.company_loaded.emit(company_id, value, changed)
+            with self.condition:
+                empty = not self.queue
+            if empty:
+                self.idle.emit()
@@ -11,10 +11,12 @@ from PySide6.QtCore import Qt, QDate, Signal
 from PySide6.QtGui import QFont, QPalette, QColor, QIcon
 from company_dialog import CompanyDialog
 from style_sheet import StyleSheet
+from metrics import metrics
 
 class CompanyManagerDialog(QDialog):
     company_updated = Signal()  # 添加信号
     
+    @metrics.timed("dialog.CompanyManagerDialog")
     def __init__(self, parent=None, data=None):
         super().__init__(parent)
         self.setWindowTitle("公司管理")
@@ -34,7 +36,9 @@ class CompanyManagerDialog(QDialog):
             company_id = item.data(Qt.UserRole)
             companies[company_id] = self.data["companies"][company_id]
             # 添加排序索引
-            companies[company_id]["sort_index"] = i
+            if companies[company_id].get("sort_index") != i:
+                companies[company_id]["sort_index"] = i
+                self.mark_dirty("companies", company_id, "sort_index")
         
         # 更新資料
         self.data["companies"] = companies
@@ -50,6 +54,12 @@ class CompanyManagerDialog(QDialog):
         self.load_companies()
         self.company_updated.emit()
 
+    def mark_dirty(self, *parts):
+        """標記變更的路徑，儲存時只上傳這些資料"""
+        database = getattr(self.parent, 'database', None)
+        if database:
+            database.mark_dirty(*parts)
+
     def setup_ui(self):
         layout = QVBoxLayout()
         layout.setSpacing(20)
@@ -110,6 +120,7 @@ class CompanyManagerDialog(QDialog):
             company_id = str(uuid.uuid4())
             company_data["vehicles"] = {}
             self.data["companies"][company_id] = company_data
+            self.mark_dirty("companies", company_id)
             self.load_companies()
             self.save_and_update()
             self.company_updated.emit()
@@ -131,6 +142,8 @@ class CompanyManagerDialog(QDialog):
             # 保留原有的車輛資料
             updated_data["vehicles"] = company_data.get("vehicles", {})
             self.data["companies"][company_id].update(updated_data)
+            for key in ("name", "tax_id", "phone", "address"):
+                self.mark_dirty("companies", company_id, key)
             self.load_companies()
             self.save_and_update()
             self.company_updated.emit()
@@ -155,6 +168,7 @@ class CompanyManagerDialog(QDialog):
         
         if reply == QMessageBox.StandardButton.Yes:
             del self.data["companies"][company_id]
+            self.mark_dirty("companies", company_id)
             self.load_companies()
             self.save_and_update()
             self.company_updated.emit()
@@ -1,37 +1,46 @@
 # database.py
-import os
-import sys
 import time
-import firebase_admin
-from firebase_admin import credentials, db
-from datetime import datetime
-import json
+import threading
+from concurrent.futures import as_completed
+from change_tracker import ChangeTracker, get_path_value, apply_updates
+from local_cache import LocalCache, subtree_of
+from write_queue import WriteQueue
+from subtree_cache import SubtreeCache
+from versioning import guard_of
+from storage import create_storage, MeasuredStorage
+from request_pool import RequestPool
+from metrics import metrics
+from startup_timer import startup
 
 class Database:
-    def __init__(self):
+    def __init__(self, storage=None, read_only=False):
         self.MAX_RETRIES = 3
         self.RETRY_DELAY = 1  # 秒
-        
-        # 檢查是否已經初始化
-        if not firebase_admin._apps:
-            try:
-                # 取得正確的路徑
-                if getattr(sys, 'frozen', False):
-                    # 如果是打包後的執行檔
-                    application_path = sys._MEIPASS
-                else:
-                    # 如果是直接執行 Python 檔案
-                    application_path = os.path.dirname(os.path.abspath(__file__))
-                    
-                # 初始化 Firebase
-                cred = credentials.Certificate(os.path.join(application_path, 'firebase-key.json'))
-                firebase_admin.initialize_app(cred, {
-                    'databaseURL': 'https://record-system-aa15c-default-rtdb.firebaseio.com'
-                })
-            except Exception as e:
-                print(f"Firebase 初始化失敗：{e}")
-                raise
-        self.root = db.reference()
+        self.changes = ChangeTracker()
+        # 儲存後端（預設為 Firebase，見 storage.py）在第一次需要存取時才連線，本地副本可以先使用
+        self.storage = storage or create_storage()
+        if metrics.enabled:
+            self.storage = MeasuredStorage(self.storage)
+        self.connected = False
+        self.connect_lock = threading.Lock()
+        self.cache = LocalCache(self.storage.local_path('local_cache.db'))
+        self.subtrees = SubtreeCache()  # 本次執行已下載的公司子樹
+        self.pool = RequestPool()  # 同時進行的讀取，相同的請求只送一次
+        # 唯讀模式（命令列工具）不開啟待上傳佇列，不會上傳或搶用桌面版尚未上傳的修改
+        self.read_only = read_only
+        self.write_queue = None if read_only else WriteQueue(
+            self.storage, self.storage.local_path('pending_writes.db'))
+
+    def connect(self):
+        """連線到儲存後端並啟動背景上傳（只會執行一次），回傳 StorageBackend"""
+        with self.connect_lock:
+            if not self.connected:
+                with startup.measure("storage init"):
+                    self.storage.connect()
+                self.connected = True
+                if self.write_queue is not None:
+                    self.write_queue.start()
+        return self.storage
 
     def _retry_operation(self, operation):
         """執行操作並在失敗時重試"""
@@ -43,67 +52,298 @@ class Database:
                     print(f"操作失敗（重試{self.MAX_RETRIES}次後）：{e}")
                     raise
                 print(f"操作失敗，正在重試（{attempt + 1}/{self.MAX_RETRIES}）：{e}")
+                metrics.increment("database.retry", "retries")
                 time.sleep(self.RETRY_DELAY)
 
+    def mark_dirty(self, *parts):
+        """標記資料中已變更的路徑，例如 mark_dirty('companies', company_id, 'sort_index')"""
+        self.changes.mark(*parts)
+
+    def pending_count(self):
+        """尚未上傳到 Firebase 的寫入數量"""
+        return self.write_queue.pending_count() if self.write_queue is not None else 0
+
+    def pending_updates(self):
+        """尚未上傳的寫入 {路徑: 資料}，唯讀模式沒有"""
+        return self.write_queue.pending_updates() if self.write_queue is not None else {}
+
+    def base_version(self, node_path, local_version):
+        """寫入節點時的基準版本號（包含本次執行已上傳、尚未回到本地資料的版本）"""
+        if self.write_queue is None:
+            return local_version
+        return self.write_queue.base_version(node_path, local_version)
+
+    def _enqueue(self, updates, base_versions=None):
+        if self.write_queue is None:
+            raise RuntimeError("唯讀模式無法寫入資料")
+        self.write_queue.enqueue(updates, base_versions)
+
+    @metrics.timed("database.save_data")
     def save_data(self, data):
-        """儲存所有資料"""
-        def _save():
-            self.root.child('companies').set(data.get('companies', {}))
+        """儲存已變更的資料（加入背景寫入佇列，以多路徑 update 上傳）"""
+        updates = self.changes.collect(data)
+        if not updates:
             return True
-        
+
         try:
-            return self._retry_operation(_save)
+            self._enqueue(updates, self._base_versions(updates, data))
+            self.changes.discard(updates.keys())
+            self._update_cache(updates.keys(), data)
+            return True
         except Exception as e:
             print(f"儲存資料失敗：{e}")
             return False
 
+    def _base_versions(self, updates, data):
+        """寫入路徑所屬節點在本地的版本號（即修改前最後看到的遠端版本）"""
+        base_versions = {}
+        for path in updates:
+            node_path = guard_of(path)
+            if node_path is None:
+                continue
+            node = get_path_value(data, node_path)
+            if isinstance(node, dict):
+                base_versions[path] = self.base_version(node_path, node.get("version"))
+        return base_versions
+
+    @metrics.timed("database.save_wash_items")
     def save_wash_items(self, items):
         """儲存洗車項目"""
-        def _save():
-            self.root.child('wash_items').set(items)
-            return True
-        
         try:
-            return self._retry_operation(_save)
+            self._enqueue({'wash_items': items})
+            self.cache.put('wash_items', items)
+            return True
         except Exception as e:
             print(f"儲存洗車項目失敗：{e}")
             return False
 
+    @metrics.timed("database.get_wash_items")
     def get_wash_items(self):
         """獲取洗車項目"""
         def _get():
-            items = self.root.child('wash_items').get()
+            items = self.connect().get('wash_items')
             return items if items else []
         
         try:
-            return self._retry_operation(_get)
+            return self.pool.run(("get", "wash_items"), lambda: self._retry_operation(_get))
         except Exception as e:
             print(f"讀取洗車項目失敗：{e}")
             return []
 
+    @metrics.timed("database.get_all_data")
     def get_all_data(self):
-        """獲取所有資料"""
+        """獲取所有資料（優先使用本地副本，只有首次啟動才從 Firebase 下載）"""
+        if self.cache.is_empty():
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"讀取資料失敗：{e}")
+                return {"companies": {}}
+        return self.get_cached_data()
+
+    def get_cached_data(self):
+        """只讀取本地副本，不存取網路"""
+        # 套用尚未上傳的寫入，避免重新啟動後看不到離線時的修改
+        return apply_updates(self.cache.load_tree(), self.pending_updates())
+
+    def get_company_ids(self):
+        """Firebase 上目前的公司 ID（shallow 查詢，不下載內容）"""
+        self.connect()
+        return list(self._get_shallow('companies') or {})
+
+    def _get_shallow(self, path):
+        return self.pool.run(
+            ("shallow", path), lambda: self._retry_operation(lambda: self.storage.get(path, shallow=True))
+        )
+
+    def _get_shallow_many(self, paths):
+        """同時送出多個 shallow 查詢，依相同順序回傳結果"""
+        return self.pool.map([
+            (("shallow", path), lambda path=path: self._retry_operation(
+                lambda: self.storage.get(path, shallow=True)))
+            for path in paths
+        ])
+
+    @metrics.timed("database.get_skeleton")
+    def get_skeleton(self):
+        """以 shallow 查詢取得公司/車輛結構（名稱、車牌、sort_index 等），不下載紀錄
+
+        shallow 查詢只回傳一層：基本型別的欄位直接回傳值，物件則以 True 代替，
+        因此每台車輛的 records 都不會被下載。公司、車輛列表、車輛依序分三批
+        同時查詢，洗車項目也同時下載。
+        """
+        wash_items = self.pool.submit(("skeleton", "wash_items"), self.get_wash_items)
+        company_ids = self.get_company_ids()
+        company_paths = [f"companies/{company_id}" for company_id in company_ids]
+        companies = {company_id: company or {} for company_id, company
+                     in zip(company_ids, self._get_shallow_many(company_paths))}
+
+        with_vehicles = [company_id for company_id in company_ids if companies[company_id].get('vehicles')]
+        vehicle_lists = self._get_shallow_many(
+            [f"companies/{company_id}/vehicles" for company_id in with_vehicles]
+        )
+        vehicle_paths = []
+        for company_id, vehicle_ids in zip(with_vehicles, vehicle_lists):
+            vehicle_paths.extend((company_id, vehicle_id) for vehicle_id in vehicle_ids or {})
+        vehicles = self._get_shallow_many(
+            [f"companies/{company_id}/vehicles/{vehicle_id}" for company_id, vehicle_id in vehicle_paths]
+        )
+
+        for company in companies.values():
+            company['vehicles'] = {}
+        for (company_id, vehicle_id), vehicle in zip(vehicle_paths, vehicles):
+            companies[company_id]['vehicles'][vehicle_id] = vehicle or {}
+        skeleton = {"companies": companies, "wash_items": wash_items.result()}
+
+        # 套用尚未上傳的寫入，紀錄之後隨公司資料一起載入
+        apply_updates(skeleton, self.pending_updates())
+        for company_data in skeleton["companies"].values():
+            for vehicle_data in company_data.get("vehicles", {}).values():
+                vehicle_data["records"] = {}
+        return skeleton
+
+    @metrics.timed("database.get_company")
+    def get_company(self, company_id):
+        """取得單一公司的完整資料（含紀錄）
+
+        回傳 (data, changed)：changed 代表資料是由 Firebase 下載的新版本，
+        ETag 未變更時使用本地副本。本次執行已取得的公司直接從記憶體快取回傳。
+        公司已被刪除時 data 為 None。
+        """
+        path = f"companies/{company_id}"
+        value = self.subtrees.get(path)
+        changed = False
+        if value is None:
+            # 同一間公司同時被要求時（例如背景載入及衝突後重新載入）只下載一次
+            value, changed = self.pool.run(("company", path), lambda: self._load_company(path))
+
+        # 套用尚未上傳的寫入
+        pending = {key: update for key, update in self.pending_updates().items()
+                   if key == path or key.startswith(path + "/")}
+        if pending:
+            value = get_path_value(apply_updates({"companies": {company_id: value}}, pending), path)
+        return value, changed
+
+    def _load_company(self, path):
+        self.connect()
+        cached_value, etag = self.cache.get(path)
+        changed, value, etag = self._fetch_if_changed(path, etag if cached_value else None)
+        if changed:
+            self.cache.put(path, value, etag)
+        else:
+            value = cached_value
+        if value is not None:
+            self.subtrees.put(path, value)
+        return value, changed
+
+    def get_companies(self, company_ids):
+        """同時取得多間公司，依完成的順序逐一產生 (company_id, data, changed, 錯誤)
+
+        下載失敗時 data 為 None、changed 為 False，錯誤為拋出的例外，成功時為 None。
+        """
+        futures = {
+            self.pool.submit(("get_company", company_id), lambda company_id=company_id: self.get_company(company_id)):
+                company_id
+            for company_id in company_ids
+        }
+        for future in as_completed(futures):
+            company_id = futures[future]
+            try:
+                value, changed = future.result()
+            except Exception as e:
+                yield company_id, None, False, e
+            else:
+                yield company_id, value, changed, None
+
+    @metrics.timed("database.sync")
+    def sync(self):
+        """比對 ETag，只下載 Firebase 上有變更的公司及節點並更新本地副本
+
+        回傳 {路徑: 新資料}，遠端已刪除的路徑值為 None
+        """
+        self.connect()
+        etags = self.cache.get_etags()
+        top_keys = self._get_shallow('') or {}
+        remote_paths = []
+        for key in top_keys:
+            if key == 'companies':
+                company_ids = self._get_shallow('companies') or {}
+                remote_paths.extend(f"companies/{company_id}" for company_id in company_ids)
+            else:
+                remote_paths.append(key)
+
+        # 仍有寫入待上傳的部分以本地為準，上傳完成後的下次同步再更新
+        pending = {subtree_of(path) for path in self.pending_updates()}
+        changes = {}
+        paths = [path for path in remote_paths if path not in pending]
+        results = self.pool.map([
+            (("fetch", path), lambda path=path: self._fetch_if_changed(path, etags.get(path)))
+            for path in paths
+        ])
+        for path, (changed, value, etag) in zip(paths, results):
+            if changed:
+                self.cache.put(path, value, etag)
+                self.subtrees.discard(path)
+                changes[path] = value
+        for path in set(etags) - set(remote_paths) - pending:
+            self.cache.put(path, None)
+            self.subtrees.discard(path)
+            changes[path] = None
+        self.cache.set_last_sync()
+        return changes
+
+    def listen(self, path, callback):
+        """訂閱路徑的變更事件，回傳的物件可呼叫 close() 停止監聽
+
+        callback(event) 在儲存後端的監聽執行緒中呼叫。
+        """
+        return self.connect().listen(path, callback)
+
+    def remote_changed(self, path):
+        """遠端資料已變更：清除本地副本的 ETag 及記憶體快取，下次載入時重新下載"""
+        subtree = subtree_of(path)
+        self.cache.invalidate(subtree)
+        self.subtrees.discard(subtree)
+
+    def _fetch_if_changed(self, path, etag):
+        """ETag 相同時不下載內容"""
         def _get():
-            data = self.root.get()
-            return data if data else {"companies": {}}
-        
+            if etag:
+                return self.storage.get_if_changed(path, etag)
+            value, new_etag = self.storage.get_with_etag(path)
+            return True, value, new_etag
+
+        return self._retry_operation(_get)
+
+    def _update_cache(self, paths, data):
+        """將已寫入 Firebase 的資料同步到本地副本，並清除 ETag 以便下次同步確認"""
+        for subtree in {subtree_of(path) for path in paths}:
+            self.subtrees.discard(subtree)
+            if subtree == 'companies':
+                self.subtrees.clear()
+                companies = data.get('companies', {})
+                for company_id in self.cache.company_ids() - set(companies):
+                    self.cache.put(f"companies/{company_id}", None)
+                for company_id, company_data in companies.items():
+                    self.cache.put(f"companies/{company_id}", company_data)
+            else:
+                self.cache.put(subtree, get_path_value(data, subtree))
+
+    @metrics.timed("database.delete_record")
+    def delete_record(self, company_id, vehicle_id, record_id, version=None):
+        """依紀錄 ID 刪除特定記錄
+
+        version 為本地紀錄的版本號，遠端在這之後被修改過時不會刪除。
+        """
+        # 構建記錄的路徑
+        record_path = f'companies/{company_id}/vehicles/{vehicle_id}/records/{record_id}'
         try:
-            return self._retry_operation(_get)
-        except Exception as e:
-            print(f"讀取資料失敗：{e}")
-            return {"companies": {}}
-
-    def delete_record(self, company_id, vehicle_id, record_index):
-        """刪除特定記錄"""
-        def _delete():
-            # 構建記錄的路徑
-            record_path = f'companies/{company_id}/vehicles/{vehicle_id}/records/{record_index}'
-            # 從 Firebase 中刪除記錄
-            self.root.child(record_path).delete()
+            # 加入背景寫入佇列，從 Firebase 中刪除記錄
+            version = self.base_version(record_path, version)
+            self._enqueue({record_path: None}, {record_path: version})
+            self.cache.invalidate(subtree_of(record_path))
+            self.subtrees.discard(subtree_of(record_path))
             return True
-        
-        try:
-            return self._retry_operation(_delete)
         except Exception as e:
             print(f"刪除記錄失敗：{e}")
             return False
\ No newline at end of file
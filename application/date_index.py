@@ -0,0 +1,34 @@
+# date_index.py
+from bisect import bisect_left, bisect_right
+
+
+class DateIndex:
+    """依日期序數排序的紀錄 ID 列表，區間查詢為兩次二分搜尋加上切片"""
+
+    def __init__(self):
+        self.ordinals = []
+        self.record_ids = []
+
+    def __len__(self):
+        return len(self.ordinals)
+
+    def add(self, ordinal, record_id):
+        position = bisect_right(self.ordinals, ordinal)
+        self.ordinals.insert(position, ordinal)
+        self.record_ids.insert(position, record_id)
+
+    def remove(self, ordinal, record_id):
+        start = bisect_left(self.ordinals, ordinal)
+        end = bisect_right(self.ordinals, ordinal, start)
+        for position in range(start, end):
+            if self.record_ids[position] == record_id:
+                del self.ordinals[position]
+                del self.record_ids[position]
+                return
+
+    def range(self, start_ordinal=None, end_ordinal=None):
+        """取得日期在 [start_ordinal, end_ordinal] 之間的紀錄 ID（依日期排序）"""
+        lo = 0 if start_ordinal is None else bisect_left(self.ordinals, start_ordinal)
+        hi = len(self.ordinals) if end_ordinal is None else bisect_right(self.ordinals, end_ordinal)
+        return self.record_ids[lo:hi]
+
@@ -0,0 +1,82 @@
+# diagnostics_dialog.py
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                               QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox)
+from style_sheet import StyleSheet
+from metrics import metrics
+
+COLUMNS = [
+    ("操作", None),
+    ("次數", "count"),
+    ("平均 (ms)", "avg_ms"),
+    ("P50 (ms)", "p50_ms"),
+    ("P95 (ms)", "p95_ms"),
+    ("最長 (ms)", "max_ms"),
+    ("傳送 (KB)", "bytes_sent"),
+    ("接收 (KB)", "bytes_received"),
+    ("重試", "retries"),
+    ("錯誤", "errors"),
+]
+
+
+class DiagnosticsDialog(QDialog):
+    """效能診斷（主視窗按 Ctrl+Shift+D 開啟），顯示 metrics 記錄的各項操作耗時"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("效能診斷")
+        self.setStyleSheet(StyleSheet.MAIN_STYLE)
+        self.setMinimumSize(900, 500)
+        self.setup_ui()
+        self.refresh()
+
+    def setup_ui(self):
+        layout = QVBoxLayout()
+
+        if not metrics.enabled:
+            layout.addWidget(QLabel("尚未啟用效能記錄，請以 --metrics 參數或設定 RECORD_SYSTEM_METRICS 環境變數後重新啟動。"))
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels([title for title, _ in COLUMNS])
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        refresh_btn = QPushButton("重新整理")
+        refresh_btn.clicked.connect(self.refresh)
+        clear_btn = QPushButton("清除")
+        clear_btn.clicked.connect(self.clear)
+        log_btn = QPushButton("寫入紀錄檔")
+        log_btn.clicked.connect(self.write_log)
+        close_btn = QPushButton("關閉")
+        close_btn.clicked.connect(self.accept)
+        for button in (refresh_btn, clear_btn, log_btn, close_btn):
+            button_layout.addWidget(button)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def refresh(self):
+        summary = metrics.summary()
+        self.table.setRowCount(len(summary))
+        for row, (name, values) in enumerate(summary.items()):
+            for column, (_, key) in enumerate(COLUMNS):
+                if key is None:
+                    text = name
+                elif key.startswith("bytes_"):
+                    text = f"{values[key] / 1024:,.1f}" if key in values else ""
+                else:
+                    text = f"{values[key]:,}" if key in values else ""
+                self.table.setItem(row, column, QTableWidgetItem(text))
+
+    def clear(self):
+        metrics.clear()
+        self.refresh()
+
+    def write_log(self):
+        try:
+            path = metrics.write_summary()
+        except OSError as e:
+            QMessageBox.warning(self, "錯誤", f"寫入紀錄檔失敗：{e}")
+            return
+        QMessageBox.information(self, "成功", f"已寫入 {path}")
@@ -0,0 +1,74 @@
+# export_worker.py
+import os
+import threading
+import uuid
+from PySide6.QtCore import QObject, Signal
+from record_export import ExportCancelled
+from metrics import metrics
+
+
+class ExportWorker(QObject):
+    """在背景執行緒執行匯出，透過 signal 回報進度及結果
+
+    exporter 為 record_export 中的匯出函式；store 應為 RecordStore.snapshot()，
+    匯出期間主畫面新增或刪除紀錄不會影響匯出的內容。
+    先寫入同一目錄下的暫存檔，完成後才取代 file_path，失敗或取消時
+    只刪除暫存檔，使用者選擇覆蓋的原檔案不受影響。
+    """
+
+    progress = Signal(int, int)
+    finished = Signal(str)
+    failed = Signal(str)
+    cancelled = Signal()
+
+    def __init__(self, exporter, store, positions, file_path, parent=None):
+        super().__init__(parent)
+        self.exporter = exporter
+        self.store = store
+        self.positions = positions
+        self.file_path = file_path
+        self.temp_path = None
+        self.cancel_event = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def report(self, done, total):
+        self.progress.emit(done, total)
+        return not self.cancel_event.is_set()
+
+    def run(self):
+        try:
+            with metrics.span(f"export.{self.exporter.__name__}") as span:
+                span.add("rows", len(self.positions))
+                self.temp_path = self.create_temp_file()
+                self.exporter(self.store, self.positions, self.temp_path, self.report)
+                os.replace(self.temp_path, self.file_path)
+        except ExportCancelled:
+            self.remove_temp_file()
+            self.cancelled.emit()
+        except Exception as e:
+            self.remove_temp_file()
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(self.file_path)
+
+    def create_temp_file(self):
+        """在目標目錄建立暫存檔（同一磁碟才能以 os.replace 直接取代），保留副檔名"""
+        directory, name = os.path.split(os.path.abspath(self.file_path))
+        stem, extension = os.path.splitext(name)
+        temp_path = os.path.join(directory, f".{stem}.{uuid.uuid4().hex[:8]}{extension}")
+        open(temp_path, "xb").close()
+        return temp_path
+
+    def remove_temp_file(self):
+        """刪除中止時留下的不完整暫存檔"""
+        if self.temp_path is None:
+            return
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
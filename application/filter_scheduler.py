@@ -0,0 +1,31 @@
+# filter_scheduler.py
+from PySide6.QtCore import QObject, QTimer
+
+
+class FilterScheduler(QObject):
+    """合併短時間內的篩選請求
+
+    每次 schedule() 都會重新計時，只有在停止輸入 delay 毫秒後才執行一次篩選，
+    之前尚未執行的請求視為過期直接捨棄。
+    """
+
+    def __init__(self, callback, delay=200, parent=None):
+        super().__init__(parent)
+        self.callback = callback
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.callback)
+
+    def schedule(self, *args):
+        """要求篩選（可直接連接任何 signal，參數會被忽略）"""
+        self.timer.start()
+
+    def flush(self):
+        """立即執行等待中的篩選"""
+        self.timer.stop()
+        self.callback()
+
+    def cancel(self):
+        """取消等待中的篩選"""
+        self.timer.stop()
@@ -0,0 +1,109 @@
+# local_cache.py
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from app_paths import get_data_dir
+
+
+def subtree_of(path):
+    """取得路徑所屬的快取單位：每間公司一筆，其餘最上層節點各一筆"""
+    parts = path.split("/")
+    if parts[0] == "companies" and len(parts) >= 2:
+        return f"companies/{parts[1]}"
+    return parts[0]
+
+
+class LocalCache:
+    """Firebase 資料的本地 SQLite 副本
+
+    以「公司」及其他最上層節點為單位儲存，並記錄各自的 ETag，
+    啟動時可直接從本地載入，再於背景只下載有變更的部分。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_data_dir(), 'local_cache.db')
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS subtrees ("
+                "path TEXT PRIMARY KEY, etag TEXT, value TEXT NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+
+    def is_empty(self):
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM subtrees LIMIT 1").fetchone()
+        return row is None
+
+    def load_tree(self):
+        """從本地副本組合出與 get_all_data() 相同結構的資料"""
+        tree = {"companies": {}}
+        with self.lock:
+            rows = self.conn.execute("SELECT path, value FROM subtrees").fetchall()
+        for path, value in rows:
+            value = json.loads(value)
+            if path.startswith("companies/"):
+                tree["companies"][path.split("/", 1)[1]] = value
+            else:
+                tree[path] = value
+        return tree
+
+    def get(self, path):
+        """讀取單一快取單位，回傳 (value, etag)，不存在時為 (None, None)"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, etag FROM subtrees WHERE path = ?", (path,)
+            ).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    def get_etags(self):
+        """取得各快取單位的 ETag"""
+        with self.lock:
+            rows = self.conn.execute("SELECT path, etag FROM subtrees").fetchall()
+        return dict(rows)
+
+    def put(self, path, value, etag=None):
+        """寫入或刪除（value 為 None）一個快取單位"""
+        with self.lock, self.conn:
+            if value is None:
+                self.conn.execute("DELETE FROM subtrees WHERE path = ?", (path,))
+            else:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO subtrees (path, etag, value) VALUES (?, ?, ?)",
+                    (path, etag, json.dumps(value, ensure_ascii=False))
+                )
+
+    def invalidate(self, path):
+        """清除 ETag，下次同步時重新下載該單位"""
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE subtrees SET etag = NULL WHERE path = ?", (path,))
+
+    def company_ids(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path FROM subtrees WHERE path LIKE 'companies/%'"
+            ).fetchall()
+        return {path.split("/", 1)[1] for path, in rows}
+
+    def get_last_sync(self):
+        """取得上次與 Firebase 同步完成的時間"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM meta WHERE key = 'last_sync'"
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_last_sync(self, timestamp=None):
+        timestamp = timestamp or datetime.now().isoformat(timespec='seconds')
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_sync', ?)",
+                (timestamp,)
+            )
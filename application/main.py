@@ -1,29 +1,68 @@
 import sys
-import json
-import uuid
+from startup_timer import startup
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
-from openpyxl import Workbook
-import qtawesome as qta
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QHBoxLayout, QLabel, QPushButton, QComboBox, 
-                            QTableWidget, QTableWidgetItem, QHeaderView, 
+                            QTableView, QHeaderView, 
                             QMessageBox, QLineEdit, QDateEdit, QDialog,
                             QFormLayout, QTextEdit, QListWidget, QCheckBox,
                             QListWidgetItem, QMenu, QScrollArea, QFileDialog,
-                            QStyle, QInputDialog)
-from PySide6.QtCore import Qt, QDate
-from PySide6.QtGui import QFont, QPalette, QColor, QIcon
+                            QStyle, QInputDialog, QProgressDialog)
+from PySide6.QtCore import Qt, QDate, QTimer, Signal
+from PySide6.QtGui import QFont, QPalette, QColor, QIcon, QKeySequence, QShortcut
 from database import Database
+from local_cache import subtree_of
+from filter_scheduler import FilterScheduler
+from records import new_record_id, migrate_records
+from record_store import RecordStore, PAYMENT_TYPE_CODES, split_records
+from company_loader import CompanyLoader
+from change_stream import ChangeStream, copy_structure, diff_company
+from versioning import same_content
+from wash_item_catalog import WashItemCatalog
+from record_table_model import (RecordTableModel, RecordFilterProxyModel,
+                                DeleteButtonDelegate, ACTION_COLUMN)
 from style_sheet import StyleSheet
-from add_record_dialog import AddRecordDialog
-from company_manager_dialog import CompanyManagerDialog
-from vehicle_manager_dialog import VehicleManagerDialog
-from wash_item_manager_dialog import WashItemManagerDialog
-from company_dialog import CompanyDialog
-from vehicle_dialog import VehicleDialog
+from metrics import metrics
+# 對話框、qtawesome、openpyxl 等在第一次使用時才載入，讓主視窗盡快顯示
+startup.mark("imports")
+
+# 匯出檔案類型 -> 副檔名
+EXPORT_FILE_FILTERS = {
+    "Excel 檔案 (*.xlsx)": ".xlsx",
+    "CSV 檔案 (*.csv)": ".csv",
+    "Parquet 檔案 (*.parquet)": ".parquet",
+}
+
+def has_pending(path, pending, children=None):
+    """路徑（或其上層）有尚未上傳的本地修改
+
+    children 為下層節點的欄位名稱（vehicles 或 records），只修改下層時
+    不影響這一層的欄位。
+    """
+    for pending_path in pending:
+        if path == pending_path or path.startswith(pending_path + "/"):
+            return True
+        if pending_path.startswith(path + "/"):
+            if pending_path[len(path) + 1:].split("/")[0] != children:
+                return True
+    return False
 
 class MainWindow(QMainWindow):
+    company_ids_loaded = Signal(object)  # Firebase 上目前的公司 ID
+    pending_changed = Signal(int)  # 待上傳的寫入數量變更
+    write_failed = Signal(object, str)  # 放棄上傳的路徑、錯誤訊息
+    skeleton_loaded = Signal(object, bool)  # 公司/車輛結構，是否隨後會載入全部紀錄
+    records_loaded = Signal(object)  # 一批依日期排序的紀錄
+    load_finished = Signal(object)  # 全部紀錄載入完成，帶有被轉換格式的車輛
+    load_failed = Signal(str)
+    remote_events = Signal(object)  # Firebase 即時推送的 ChangeEvent 列表
+
+    LOAD_BATCH_SIZE = 2000  # 每批加入表格的紀錄數
+    COMPANY_POLL_INTERVAL = 60000  # 確認 Firebase 上新增/刪除公司的間隔（毫秒）
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("電子紀錄系統")
@@ -34,7 +73,11 @@ class MainWindow(QMainWindow):
         # 初始化資料
         self.data = {"companies": {}}
         self.database = Database()
-        self.load_data()
+        # 洗車項目由主視窗及各對話框共用
+        self.wash_item_catalog = WashItemCatalog(self.database, self)
+        self.wash_item_catalog.items_changed.connect(self.on_wash_items_changed)
+        self.first_paint_done = False
+        self.loading = True
         
         # 設置主要 widget 和布局
         central_widget = QWidget()
@@ -54,7 +97,7 @@ class MainWindow(QMainWindow):
         self.company_combo.addItem("全部公司", "all")
         self.company_combo.setMinimumWidth(150)
         manage_company_btn = QPushButton()
-        manage_company_btn.setIcon(qta.icon('fa5s.cog'))
+        self.manage_company_btn = manage_company_btn  # 圖示於首次繪製後載入
         manage_company_btn.setToolTip("管理公司")
         manage_company_btn.setStyleSheet("""
             QPushButton {
@@ -81,7 +124,7 @@ class MainWindow(QMainWindow):
         self.vehicle_combo.addItem("全部車輛", "all")
         self.vehicle_combo.setMinimumWidth(150)
         manage_vehicle_btn = QPushButton()
-        manage_vehicle_btn.setIcon(qta.icon('fa5s.cog'))
+        self.manage_vehicle_btn = manage_vehicle_btn
         manage_vehicle_btn.setToolTip("管理車輛")
         manage_vehicle_btn.setStyleSheet("""
             QPushButton {
@@ -111,11 +154,13 @@ class MainWindow(QMainWindow):
         # 新增紀錄和匯出按鈕
         buttons_layout = QHBoxLayout()
         add_record_btn = QPushButton("新增紀錄")
+        self.add_record_btn = add_record_btn
         add_record_btn.setMinimumWidth(150)
         add_record_btn.clicked.connect(self.add_record)
         export_btn = QPushButton("匯出篩選資料")
+        self.export_btn = export_btn
         export_btn.setMinimumWidth(150)
-        export_btn.clicked.connect(self.export_excel)
+        export_btn.clicked.connect(self.export_records)
         buttons_layout.addWidget(add_record_btn)
         buttons_layout.addWidget(export_btn)
         buttons_layout.setSpacing(10)
@@ -146,7 +191,8 @@ class MainWindow(QMainWindow):
         # 搜尋欄位
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("搜尋服務項目、備註...")
-        self.search_input.textChanged.connect(self.filter_records)
+        self.filter_scheduler = FilterScheduler(self.filter_records, parent=self)
+        self.search_input.textChanged.connect(self.filter_scheduler.schedule)
         search_layout.addWidget(self.search_input)
 
         # 清除搜尋按鈕
@@ -157,10 +203,12 @@ class MainWindow(QMainWindow):
         layout.addLayout(search_layout)
 
         # 表格
-        self.table = QTableWidget()
-        self.table.setColumnCount(9)  # 減少一欄
-        self.table.setHorizontalHeaderLabels(["類型", "日期", "公司", "車牌號碼", "車輛種類", "服務項目", "備註", "金額總計", "操作"])
-        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)  # 禁止編輯
+        self.table_model = RecordTableModel(self)
+        self.table = QTableView()
+        self.proxy_model = RecordFilterProxyModel(self)
+        self.proxy_model.setSourceModel(self.table_model)
+        self.table.setModel(self.proxy_model)
+        self.table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)  # 禁止編輯
         header = self.table.horizontalHeader()
         
         # 設置表格標題可調整大小
@@ -185,7 +233,7 @@ class MainWindow(QMainWindow):
         header.setSectionResizeMode(6, QHeaderView.ResizeMode.Stretch)  # 備註
         self.table.verticalHeader().setVisible(False)
         self.table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background-color: white;
                 alternate-background-color: #f9f9f9;
             }
@@ -196,21 +244,47 @@ class MainWindow(QMainWindow):
                 border-right: 1px solid #ccc;
                 border-bottom: 1px solid #ccc;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 5px;
                 border-bottom: 1px solid #eee;
             }
         """)
         self.table.setAlternatingRowColors(True)
         self.table.setWordWrap(True)  # 啟用自動換行
-        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)  # 自動調整行高
+        # 只調整可見列的行高，避免為全部紀錄計算內容大小
+        self.table.verticalScrollBar().valueChanged.connect(self.resize_visible_rows)
+        # 重新篩選時 proxy 會對每段連續的列各發出一次 rowsInserted，合併到事件迴圈空閒時才調整一次
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.timeout.connect(self.resize_visible_rows)
+        self.proxy_model.modelReset.connect(self.resize_timer.start)
+        self.proxy_model.layoutChanged.connect(self.resize_timer.start)
+        self.proxy_model.rowsInserted.connect(self.resize_timer.start)
+        # 確保表格項目可以顯示工具提示
+        self.table.setMouseTracking(True)  # 啟用滑鼠追蹤
+        self.table.viewport().setMouseTracking(True)
+        # 刪除按鈕由 delegate 繪製，也可由右鍵選單刪除
+        self.delete_delegate = DeleteButtonDelegate(self.table)
+        self.delete_delegate.delete_clicked.connect(self.delete_record)
+        self.table.setItemDelegateForColumn(ACTION_COLUMN, self.delete_delegate)
+        self.table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.table.customContextMenuRequested.connect(self.show_table_menu)
         layout.addWidget(self.table)
+
+        # 表格下方顯示篩選結果及全部紀錄的金額總計
+        self.totals_label = QLabel()
+        self.totals_label.setAlignment(Qt.AlignmentFlag.AlignRight)
+        layout.addWidget(self.totals_label)
+        self.table_model.modelReset.connect(self.update_totals)
+        self.table_model.rowsInserted.connect(self.update_totals)
+        self.table_model.rowsRemoved.connect(self.update_totals)
         
         # 設置事件處理
-        self.company_combo.currentIndexChanged.connect(self.filter_records)
-        self.vehicle_combo.currentIndexChanged.connect(self.filter_records)
-        self.start_date.dateChanged.connect(self.filter_records)
-        self.end_date.dateChanged.connect(self.filter_records)
+        # 所有篩選條件的變更都交給 scheduler 合併成一次篩選
+        self.company_combo.currentIndexChanged.connect(self.on_company_changed)
+        self.vehicle_combo.currentIndexChanged.connect(self.filter_scheduler.schedule)
+        self.start_date.dateChanged.connect(self.filter_scheduler.schedule)
+        self.end_date.dateChanged.connect(self.filter_scheduler.schedule)
         
         # 初始化下拉選單
         self.update_company_combo()
@@ -218,16 +292,436 @@ class MainWindow(QMainWindow):
         
         # 更新表格
         self.update_table()
+        self.filter_scheduler.flush()
+
+        # 狀態列顯示待同步數量
+        self.sync_status_label = QLabel()
+        self.statusBar().addPermanentWidget(self.sync_status_label)
+        self.pending_changed.connect(self.update_sync_status)
+        self.database.write_queue.on_pending_changed = self.pending_changed.emit
+        self.database.write_queue.on_conflict = self.reload_after_conflict
+        self.write_failed.connect(self.on_write_failed)
+        self.database.write_queue.on_failed = self.write_failed.emit
+        self.update_sync_status(self.database.pending_count())
+
+        # 隱藏的效能診斷視窗
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self, self.show_diagnostics)
+
+        # 視窗繪製後才在背景載入資料，載入期間可先選擇公司、車輛
+        self.skeleton_loaded.connect(self.on_skeleton_loaded)
+        self.records_loaded.connect(self.on_records_loaded)
+        self.load_finished.connect(self.on_load_finished)
+        self.load_failed.connect(self.on_load_failed)
+        self.company_ids_loaded.connect(self.on_company_ids_loaded)
+        # 公司紀錄在選擇該公司（或全部公司）時才從 Firebase 載入
+        self.loaded_companies = set()  # 紀錄已在 self.data 中的公司
+        self.remote_changes = {}
+        self.company_loader = CompanyLoader(self.database, self)
+        self.company_loader.company_loaded.connect(self.on_company_loaded)
+        self.company_loader.idle.connect(self.on_company_loader_idle)
+        # 第一次載入完成後監聽 Firebase 的變更，逐筆更新畫面
+        self.change_stream = None
+        self.remote_events.connect(self.apply_change_events)
+        self.loading_label = QLabel("載入中…")
+        self.statusBar().addWidget(self.loading_label)
+        self.set_loading(True)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_paint_done:
+            self.first_paint_done = True
+            startup.mark("first paint")
+            QTimer.singleShot(0, self.after_first_paint)
+
+    def closeEvent(self, event):
+        if self.change_stream is not None:
+            self.change_stream.close()
+        if metrics.enabled:
+            metrics.write_summary()
+        super().closeEvent(event)
+
+    def after_first_paint(self):
+        """視窗顯示後才執行的初始化"""
+        threading.Thread(target=self.load_in_background, daemon=True).start()
+        with startup.measure("icons"):
+            import qtawesome as qta
+            self.manage_company_btn.setIcon(qta.icon('fa5s.cog'))
+            self.manage_vehicle_btn.setIcon(qta.icon('fa5s.cog'))
+
+    def load_in_background(self):
+        """在背景執行緒載入資料，先送出公司/車輛結構，再分批送出紀錄
+
+        有本地副本時由本地載入全部紀錄，之後再確認 Firebase 上的公司列表；
+        首次啟動只下載公司/車輛結構，紀錄由 CompanyLoader 依需要下載。
+        """
+        local = not self.database.cache.is_empty()
+        try:
+            if local:
+                with startup.measure("local cache"):
+                    data = self.database.get_cached_data()
+            else:
+                with startup.measure("skeleton"):
+                    data = self.database.get_skeleton()
+        except Exception as e:
+            self.load_failed.emit(str(e))
+            data = {"companies": {}}
+        migrated = migrate_records(data)
+        skeleton, entries = split_records(data)
+        self.skeleton_loaded.emit(skeleton, local)
+        for start in range(0, len(entries), self.LOAD_BATCH_SIZE):
+            self.records_loaded.emit(entries[start:start + self.LOAD_BATCH_SIZE])
+        self.load_finished.emit(migrated)
+        if local:
+            try:
+                self.company_ids_loaded.emit(self.database.get_company_ids())
+            except Exception as e:
+                print(f"讀取公司列表失敗：{e}")
+
+    def on_skeleton_loaded(self, data, local):
+        """公司/車輛結構載入後即可選擇，紀錄稍後分批加入"""
+        if "wash_items" in data:
+            self.wash_item_catalog.reset(data.pop("wash_items"))
+        self.data = data
+        self.loaded_companies = set(data["companies"]) if local else set()
+        self.refresh_combos()
+        self.update_table()
 
-    def load_data(self):
-        """從資料庫載入資料"""
+    def on_records_loaded(self, batch):
+        """將一批紀錄加入資料及表格"""
+        entries = []
+        for company_id, vehicle_id, record in batch:
+            company_data = self.data["companies"].get(company_id)
+            vehicle_data = company_data and company_data.get("vehicles", {}).get(vehicle_id)
+            if vehicle_data is None:
+                continue
+            vehicle_data.setdefault("records", {})[record["id"]] = record
+            entries.append((company_id, company_data, vehicle_id, vehicle_data, record))
+        self.table_model.add_records(entries)
+        self.loading_label.setText(f"載入中…（已載入 {len(self.table_model.store)} 筆）")
+
+    def on_load_finished(self, migrated):
+        startup.mark("records loaded")
+        self.save_migrated(migrated)
+        self.set_loading(False)
+        self.company_loader.start()
+        self.request_company_records()
+
+    def on_load_failed(self, message):
+        QMessageBox.warning(self, "錯誤", f"載入資料時發生錯誤：{message}")
+
+    def set_loading(self, loading):
+        """載入期間停用會修改資料的操作，避免寫入不完整的資料"""
+        self.loading = loading
+        for widget in (self.add_record_btn, self.export_btn,
+                       self.manage_company_btn, self.manage_vehicle_btn):
+            widget.setEnabled(not loading)
+        self.loading_label.setVisible(loading)
+
+    def migrate_record_ids(self):
+        """將舊版陣列格式的紀錄轉為以紀錄 ID 為 key，並寫回資料庫"""
+        self.save_migrated(migrate_records(self.data))
+
+    def save_migrated(self, migrated):
+        """將轉換過格式的車輛紀錄寫回資料庫"""
+        for company_id, vehicle_id in migrated:
+            self.database.mark_dirty("companies", company_id, "vehicles", vehicle_id, "records")
+        if migrated:
+            self.save_data()
+
+    def request_company_records(self):
+        """載入目前選擇的公司（或全部公司）的紀錄，已載入的公司會確認是否有更新"""
+        if self.loading:
+            return
+        company_id = self.company_combo.currentData()
+        if company_id == "all":
+            company_ids = [self.company_combo.itemData(i) for i in range(1, self.company_combo.count())]
+            self.company_loader.request(company_ids)
+        else:
+            self.company_loader.request([company_id], urgent=True)
+            company_ids = [company_id]
+        if any(company_id not in self.loaded_companies for company_id in company_ids):
+            self.loading_label.setText("正在載入公司紀錄…")
+            self.loading_label.show()
+
+    def on_company_ids_loaded(self, company_ids):
+        """Firebase 上已刪除的公司從畫面移除，新增的公司排入載入佇列"""
+        removed = set(self.data["companies"]) - set(company_ids)
+        for company_id in removed:
+            self.unwatch_company(company_id)
+            self.queue_remote_change(f"companies/{company_id}", None)
+        added = [company_id for company_id in company_ids if company_id not in self.data["companies"]]
+        self.company_loader.request(added)
+
+    def on_company_loaded(self, company_id, value, changed):
+        """公司資料下載完成：第一次載入時加入紀錄，已載入的公司有更新時只套用差異"""
+        if value is None:
+            self.queue_remote_change(f"companies/{company_id}", None)
+            return
+        if company_id in self.loaded_companies:
+            if changed:
+                # 本地寫入不會記錄 ETag，啟動時已載入的公司幾乎都會標示為有更新，
+                # 與畫面上的資料比較後逐筆套用，不重建整個表格
+                events = []
+                diff_company(company_id, self.data["companies"].get(company_id), value, events)
+                self.apply_change_events(events)
+            self.watch_company(company_id)
+            return
+        self.loaded_companies.add(company_id)
+
+        migrated = migrate_records({"companies": {company_id: value}})
+        company_data = self.data["companies"].get(company_id)
+        if company_data is None:
+            # Firebase 上新增的公司
+            company_data = self.data["companies"][company_id] = dict(value, vehicles={})
+            self.refresh_combos()
+        entries = []
+        for vehicle_id, remote_vehicle in value.get("vehicles", {}).items():
+            vehicle_data = company_data.setdefault("vehicles", {}).get(vehicle_id)
+            if vehicle_data is None:
+                vehicle_data = company_data["vehicles"][vehicle_id] = dict(remote_vehicle, records={})
+            records = vehicle_data.setdefault("records", {})
+            for record_id, record in (remote_vehicle.get("records") or {}).items():
+                if record_id not in records:
+                    records[record_id] = record
+                    entries.append((company_id, company_data, vehicle_id, vehicle_data, record))
+        self.insert_entries(entries)
+        self.save_migrated(migrated)
+        self.watch_company(company_id)
+
+    def insert_entries(self, entries):
+        """將已加入 self.data 的紀錄依日期順序加入表格"""
+        entries.sort(key=lambda entry: RecordStore.sort_key(entry[4]))
+        store = self.table_model.store
+        if len(entries) > self.LOAD_BATCH_SIZE and store.insert_position(entries[0][4]) != len(store):
+            # 大量紀錄與既有紀錄的日期交錯時，重建比逐筆插入快
+            self.update_table()
+        else:
+            self.table_model.add_records(entries)
+
+    def reload_after_conflict(self, node_path):
+        """本地修改因其他人已修改或刪除而未寫入（於上傳執行緒呼叫），重新下載該公司"""
+        company_id = subtree_of(node_path).split("/")[1]
+        self.database.remote_changed(node_path)
         try:
-            self.data = self.database.get_all_data()
-            if not self.data:
-                self.data = {"companies": {}}
+            value, _ = self.database.get_company(company_id)
         except Exception as e:
-            QMessageBox.warning(self, "錯誤", f"載入資料時發生錯誤：{str(e)}")
-            self.data = {"companies": {}}
+            print(f"重新載入公司資料失敗：{e}")
+            return
+        self.company_loader.company_loaded.emit(company_id, value, True)
+
+    def on_company_loader_idle(self):
+        self.loading_label.hide()
+        startup.print_report()
+        if self.change_stream is None:
+            self.start_change_stream()
+
+    def start_change_stream(self):
+        """開始監聽 Firebase 的變更（連線在背景執行緒建立）
+
+        只監聽已載入紀錄的公司，之後載入的公司再由 watch_company() 加入；
+        新增或刪除的公司定期以 shallow 查詢確認，不下載其他公司的紀錄。
+        """
+        self.change_stream = ChangeStream(self.database, self.remote_events.emit)
+        companies = copy_structure({company_id: company_data
+                                    for company_id, company_data in self.data["companies"].items()
+                                    if company_id in self.loaded_companies})
+        wash_items = self.wash_item_catalog.snapshot()
+
+        def _start():
+            try:
+                self.change_stream.start(companies, wash_items)
+            except Exception as e:
+                print(f"監聽資料變更失敗：{e}")
+
+        threading.Thread(target=_start, daemon=True).start()
+        self.company_poll_timer = QTimer(self)
+        self.company_poll_timer.timeout.connect(self.poll_company_ids)
+        self.company_poll_timer.start(self.COMPANY_POLL_INTERVAL)
+
+    def watch_company(self, company_id):
+        """開始監聽剛載入紀錄（或本機新增）的公司"""
+        if self.change_stream is None or company_id not in self.data["companies"]:
+            return
+        company_data = copy_structure({company_id: self.data["companies"][company_id]})[company_id]
+
+        def _watch():
+            try:
+                self.change_stream.watch(company_id, company_data)
+            except Exception as e:
+                print(f"監聽公司資料變更失敗：{e}")
+
+        threading.Thread(target=_watch, daemon=True).start()
+
+    def unwatch_company(self, company_id):
+        if self.change_stream is not None:
+            self.change_stream.unwatch(company_id)
+
+    def poll_company_ids(self):
+        """在背景以 shallow 查詢確認 Firebase 上新增或刪除的公司"""
+        def _poll():
+            try:
+                self.company_ids_loaded.emit(self.database.get_company_ids())
+            except Exception as e:
+                print(f"讀取公司列表失敗：{e}")
+
+        threading.Thread(target=_poll, daemon=True).start()
+
+    def apply_change_events(self, events):
+        """逐筆套用 Firebase 推送的變更，只更新受影響的紀錄、車輛或公司
+
+        尚未上傳的本地修改所在的路徑不會被遠端資料覆蓋。
+        """
+        pending = set(self.database.changes.dirty_paths)
+        pending.update(self.database.pending_updates())
+        companies = self.data["companies"]
+        entries = []
+        migrated = []
+        structure_changed = False
+
+        for event in events:
+            if event.level == "wash_items":
+                if not has_pending("wash_items", pending):
+                    self.wash_item_catalog.reset(event.value)
+                continue
+            company_data = companies.get(event.company_id)
+            if event.level == "company":
+                if has_pending(f"companies/{event.company_id}", pending, "vehicles"):
+                    continue
+                if event.kind == "delete":
+                    structure_changed = True
+                    self.remove_company_records(companies.pop(event.company_id, None))
+                    self.loaded_companies.discard(event.company_id)
+                    self.unwatch_company(event.company_id)
+                    continue
+                vehicles = company_data.get("vehicles", {}) if company_data else {}
+                unchanged = company_data is not None and same_content(
+                    dict(company_data, vehicles=None), dict(event.value, vehicles=None))
+                company_data = companies[event.company_id] = dict(event.value, vehicles=vehicles)
+                # 之後的事件會帶有這間公司全部的紀錄
+                self.loaded_companies.add(event.company_id)
+                if not unchanged:
+                    structure_changed = True
+                    self.table_model.update_company(event.company_id, company_data)
+                continue
+            if company_data is None:
+                continue
+            vehicles = company_data.setdefault("vehicles", {})
+            vehicle_data = vehicles.get(event.vehicle_id)
+            vehicle_path = f"companies/{event.company_id}/vehicles/{event.vehicle_id}"
+            if event.level == "vehicle":
+                if has_pending(vehicle_path, pending, "records"):
+                    continue
+                if event.kind == "delete":
+                    structure_changed = True
+                    vehicle_data = vehicles.pop(event.vehicle_id, None)
+                    if vehicle_data:
+                        self.remove_company_records({"vehicles": {event.vehicle_id: vehicle_data}})
+                    continue
+                records = vehicle_data.get("records", {}) if vehicle_data else {}
+                unchanged = vehicle_data is not None and same_content(
+                    dict(vehicle_data, records=None), dict(event.value, records=None))
+                vehicle_data = vehicles[event.vehicle_id] = dict(event.value, records=records)
+                if not unchanged:
+                    structure_changed = True
+                    self.table_model.update_vehicle(event.company_id, company_data,
+                                                    event.vehicle_id, vehicle_data)
+                continue
+            if vehicle_data is None:
+                continue
+            if event.level == "migrate":
+                migrated.append((event.company_id, event.vehicle_id))
+                continue
+            if has_pending(f"{vehicle_path}/records/{event.record_id}", pending):
+                continue
+            records = vehicle_data.setdefault("records", {})
+            if event.kind == "delete":
+                if records.pop(event.record_id, None) is not None:
+                    self.table_model.remove_record(event.record_id)
+                continue
+            old_record = records.get(event.record_id)
+            if old_record == event.value:
+                continue  # 本地已有相同資料
+            records[event.record_id] = event.value
+            if same_content(old_record, event.value):
+                continue  # 只有版本號不同（例如自己剛上傳的紀錄），表格不需要更新
+            if old_record is not None:
+                self.table_model.remove_record(event.record_id)
+            entries.append((event.company_id, company_data, event.vehicle_id, vehicle_data, event.value))
+
+        self.insert_entries(entries)
+        if structure_changed:
+            self.refresh_combos()
+        self.save_migrated(migrated)
+
+    def remove_company_records(self, company_data):
+        """從表格移除公司（或單一車輛）底下的所有紀錄"""
+        if not company_data:
+            return
+        for vehicle_data in company_data.get("vehicles", {}).values():
+            for record_id in vehicle_data.get("records") or {}:
+                self.table_model.remove_record(record_id)
+
+    def queue_remote_change(self, path, value):
+        """合併短時間內的遠端變更，一次套用"""
+        if not self.remote_changes:
+            QTimer.singleShot(0, self.flush_remote_changes)
+        self.remote_changes[path] = value
+
+    def flush_remote_changes(self):
+        changes, self.remote_changes = self.remote_changes, {}
+        if changes:
+            self.apply_remote_changes(changes)
+
+    def apply_remote_changes(self, changes):
+        """套用背景同步取得的變更，尚未儲存的本地修改不會被覆蓋"""
+        pending = {subtree_of(path) for path in self.database.changes.dirty_paths}
+        pending.update(subtree_of(path) for path in self.database.pending_updates())
+        for path, value in changes.items():
+            if path in pending:
+                continue
+            if path.startswith("companies/"):
+                company_id = path.split("/", 1)[1]
+                if value is None:
+                    self.data["companies"].pop(company_id, None)
+                else:
+                    self.data["companies"][company_id] = value
+            elif path == "wash_items":
+                self.wash_item_catalog.reset(value)
+            elif value is None:
+                self.data.pop(path, None)
+            else:
+                self.data[path] = value
+        # 網頁版會以陣列寫回紀錄
+        self.migrate_record_ids()
+        self.refresh_combos()
+        self.update_table()
+
+    def refresh_combos(self):
+        """重建公司、車輛選單並保留目前的選擇"""
+        company_id = self.company_combo.currentData()
+        vehicle_id = self.vehicle_combo.currentData()
+        self.update_company_combo()
+        index = self.company_combo.findData(company_id)
+        if index >= 0:
+            self.company_combo.setCurrentIndex(index)
+        self.update_vehicle_combo()
+        index = self.vehicle_combo.findData(vehicle_id)
+        if index >= 0:
+            self.vehicle_combo.setCurrentIndex(index)
+
+    def update_sync_status(self, count):
+        """更新狀態列的同步狀態"""
+        if count:
+            self.sync_status_label.setText(f"待同步：{count} 筆")
+            self.sync_status_label.setStyleSheet("color: #d9822b;")
+        else:
+            self.sync_status_label.setText("已同步")
+            self.sync_status_label.setStyleSheet("color: #4caf50;")
+
+    def on_write_failed(self, paths, message):
+        """修改無法上傳（例如權限不足），已從待上傳佇列移除"""
+        details = "\n".join(paths[:5])
+        QMessageBox.warning(self, "錯誤", f"以下修改無法上傳，已略過：\n{details}\n\n錯誤：{message}")
 
     def save_data(self):
         """儲存資料到資料庫"""
@@ -236,8 +730,16 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.warning(self, "錯誤", f"儲存資料時發生錯誤：{str(e)}")
 
+    def on_company_changed(self):
+        """切換公司時更新車輛選單並重新篩選"""
+        self.update_vehicle_combo()
+        self.filter_scheduler.schedule()
+        self.request_company_records()
+
     def update_company_combo(self):
         """更新公司下拉選單"""
+        # 重建選單時不逐項觸發篩選
+        self.company_combo.blockSignals(True)
         self.company_combo.clear()
         self.company_combo.addItem("全部公司", "all")
         
@@ -249,9 +751,12 @@ class MainWindow(QMainWindow):
         
         for company_id, company_data in sorted_companies:
             self.company_combo.addItem(company_data["name"], company_id)
+        self.company_combo.blockSignals(False)
+        self.filter_scheduler.schedule()
 
     def update_vehicle_combo(self):
         """更新車輛下拉選單"""
+        self.vehicle_combo.blockSignals(True)
         self.vehicle_combo.clear()
         self.vehicle_combo.addItem("全部車輛", "all")
         company_id = self.company_combo.currentData()
@@ -264,11 +769,22 @@ class MainWindow(QMainWindow):
             )
             for vehicle_id, vehicle_data in sorted_vehicles:
                 self.vehicle_combo.addItem(f"{vehicle_data['plate']} ({vehicle_data['type']})", vehicle_id)
+        self.vehicle_combo.blockSignals(False)
+        self.filter_scheduler.schedule()
 
     def manage_companies(self):
         """管理公司"""
+        from company_manager_dialog import CompanyManagerDialog
+        company_ids = set(self.data["companies"])
         dialog = CompanyManagerDialog(self, self.data)
         dialog.exec()
+        # 本機新增的公司沒有其他紀錄，直接視為已載入並開始監聽
+        for company_id in set(self.data["companies"]) - company_ids:
+            self.loaded_companies.add(company_id)
+            self.watch_company(company_id)
+        for company_id in company_ids - set(self.data["companies"]):
+            self.loaded_companies.discard(company_id)
+            self.unwatch_company(company_id)
         self.update_company_combo()
         self.update_vehicle_combo()
         self.update_table()
@@ -279,6 +795,7 @@ class MainWindow(QMainWindow):
         if company_id == "all":
             QMessageBox.warning(self, "警告", "請先選擇一個公司")
             return
+        from vehicle_manager_dialog import VehicleManagerDialog
         dialog = VehicleManagerDialog(self, company_id, self.data)
         dialog.exec()
         self.update_vehicle_combo()
@@ -286,6 +803,7 @@ class MainWindow(QMainWindow):
 
     def add_record(self):
         """新增洗車紀錄"""
+        from add_record_dialog import AddRecordDialog
         dialog = AddRecordDialog(
             self,
             self.data,
@@ -308,122 +826,71 @@ class MainWindow(QMainWindow):
             # 添加紀錄到車輛資料中
             vehicle_data = self.data["companies"][company_id]["vehicles"][vehicle_id]
             if "records" not in vehicle_data:
-                vehicle_data["records"] = []
+                vehicle_data["records"] = {}
             
             # 建立新的記錄
+            record_id = new_record_id()
             new_record = {
+                "id": record_id,
+                "timestamp": int(time.time() * 1000),  # 與網頁版一致，毫秒
                 "date": record_data["date"],
                 "items": record_data["items"],
                 "remarks": record_data["remarks"],
                 "payment_type": record_data["payment_type"]  # 添加應付/應收資訊
             }
             
-            vehicle_data["records"].append(new_record)
+            vehicle_data["records"][record_id] = new_record
+            company_data = self.data["companies"][company_id]
+            self.database.mark_dirty(
+                "companies", company_id, "vehicles", vehicle_id, "records", record_id
+            )
             
             # 儲存並更新
             self.save_data()
-            self.update_table()
-
-    def search_records(self):
-        """搜尋紀錄"""
-        self.update_table()
+            self.table_model.add_record(
+                company_id, company_data, vehicle_id, vehicle_data, new_record
+            )
 
     def update_table(self):
-        """更新表格內容"""
-        self.table.setRowCount(0)
-        
-        # 獲取當前選擇的公司和車輛
-        selected_company_id = self.company_combo.currentData()
-        selected_vehicle_id = self.vehicle_combo.currentData()
-        
-        # 獲取記錄
-        records = []
-        for company_id, company_data in self.data["companies"].items():
-            # 如果選擇了特定公司，只顯示該公司的記錄
-            if selected_company_id != "all" and company_id != selected_company_id:
-                continue
-                
-            company_name = company_data["name"]
-            for vehicle_id, vehicle_data in company_data.get("vehicles", {}).items():
-                # 如果選擇了特定車輛，只顯示該車輛的記錄
-                if selected_vehicle_id != "all" and vehicle_id != selected_vehicle_id:
-                    continue
-                    
-                for record in vehicle_data.get("records", []):
-                    record_with_info = record.copy()
-                    record_with_info["company"] = company_name
-                    record_with_info["company_id"] = company_id
-                    record_with_info["vehicle_id"] = vehicle_id
-                    record_with_info["vehicle"] = vehicle_data
-                    records.append(record_with_info)
-        
-        # 填充表格
-        for record in records:
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-            
-            # 顯示應付/應收狀態
-            payment_type = record.get("payment_type", "")
-            payment_type_text = ""
-            if payment_type == "payable":
-                payment_type_text = "應付廠商"
-            elif payment_type == "receivable":
-                payment_type_text = "應收廠商"
-            self.table.setItem(row, 0, QTableWidgetItem(payment_type_text))
-            
-            # 設置日期
-            date_item = QTableWidgetItem(record["date"])
-            self.table.setItem(row, 1, date_item)
-            
-            # 設置公司
-            company_item = QTableWidgetItem(record["company"])
-            company_item.setData(Qt.ItemDataRole.UserRole, record["company_id"])
-            self.table.setItem(row, 2, company_item)
-            
-            # 設置車牌號碼
-            vehicle_item = QTableWidgetItem(record["vehicle"]["plate"])
-            vehicle_item.setData(Qt.ItemDataRole.UserRole, record["vehicle_id"])
-            remarks = record["vehicle"].get("remarks", "")
-            if remarks:
-                vehicle_item.setToolTip(f"備註：{remarks}")
-            self.table.setItem(row, 3, vehicle_item)
-            
-            # 確保表格項目可以顯示工具提示
-            self.table.setMouseTracking(True)  # 啟用滑鼠追蹤
-            self.table.viewport().setMouseTracking(True)
-            
-            # 設置車輛種類
-            self.table.setItem(row, 4, QTableWidgetItem(record["vehicle"]["type"]))
-            
-            # 處理項目顯示和計算總金額
-            items_text = []
-            total_amount = 0
-            for item in record["items"]:
-                if isinstance(item, dict):
-                    items_text.append(f"• {item['name']} - ${item['price']}")
-                    total_amount += item['price']
-                else:
-                    items_text.append(f"• {item}")
-            
-            # 使用換行符號連接項目
-            self.table.setItem(row, 5, QTableWidgetItem("\n".join(items_text)))
-            
-            # 設置備註
-            self.table.setItem(row, 6, QTableWidgetItem(record.get("remarks", "")))
-            
-            # 設置金額總計
-            total_amount_item = QTableWidgetItem(f"${total_amount:,}")
-            total_amount_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            self.table.setItem(row, 7, total_amount_item)
-            
-            # 添加刪除按鈕
-            delete_btn = QPushButton("刪除")
-            delete_btn.clicked.connect(lambda checked, r=row: self.delete_record(r))
-            self.table.setCellWidget(row, 8, delete_btn)
-            
-            # 調整該行的高度以適應多行內容
+        """資料變更後重建表格的來源模型，篩選條件由 proxy 套用"""
+        with metrics.span("ui.update_table"):
+            self.table_model.load(self.data)
+
+    def update_totals(self):
+        """更新表格下方的金額總計（由累計分組取得，不重新掃描紀錄）"""
+        # 連接到 table_model 的 signal，不能用 metrics.timed 包裝（會收到 signal 的參數）
+        with metrics.span("ui.update_totals"):
+            subtotal = self.proxy_model.subtotal()
+            grand_total = self.table_model.store.aggregates.get("all")
+        self.totals_label.setText(
+            f"共 {subtotal.count} 筆　"
+            f"應收：${subtotal.by_payment[PAYMENT_TYPE_CODES['receivable']]:,}　"
+            f"應付：${subtotal.by_payment[PAYMENT_TYPE_CODES['payable']]:,}　"
+            f"金額總計：${subtotal.amount:,}　"
+            f"（全部紀錄：${grand_total.amount:,}）"
+        )
+
+    def resize_visible_rows(self):
+        """依內容調整目前可見列的行高"""
+        first = self.table.rowAt(0)
+        if first < 0:
+            return
+        last = self.table.rowAt(self.table.viewport().height() - 1)
+        if last < 0:
+            last = self.proxy_model.rowCount() - 1
+        for row in range(first, last + 1):
             self.table.resizeRowToContents(row)
 
+    def show_table_menu(self, pos):
+        """表格右鍵選單"""
+        index = self.table.indexAt(pos)
+        if not index.isValid():
+            return
+        menu = QMenu(self)
+        delete_action = menu.addAction("刪除紀錄")
+        if menu.exec(self.table.viewport().mapToGlobal(pos)) == delete_action:
+            self.delete_record(index.row())
+
     def delete_record(self, row):
         """刪除記錄"""
         reply = QMessageBox.question(
@@ -436,165 +903,114 @@ class MainWindow(QMainWindow):
         
         if reply == QMessageBox.StandardButton.Yes:
             try:
-                # 從表格中獲取公司和車輛ID
-                company_id = self.table.item(row, 2).data(Qt.ItemDataRole.UserRole)
-                vehicle_id = self.table.item(row, 3).data(Qt.ItemDataRole.UserRole)
-                date_str = self.table.item(row, 1).text()
+                # 從表格中獲取公司、車輛及紀錄ID
+                record = self.proxy_model.record_at(row)
+                company_id = record["company_id"]
+                vehicle_id = record["vehicle_id"]
+                record_id = record["id"]
                 
-                if not company_id or not vehicle_id:
+                if not company_id or not vehicle_id or not record_id:
                     QMessageBox.warning(self, "錯誤", "無法獲取記錄資訊")
                     return
                 
-                # 找到並刪除對應的記錄
-                vehicle_records = self.data["companies"][company_id]["vehicles"][vehicle_id].get("records", [])
-                for i, record in enumerate(vehicle_records):
-                    if record["date"] == date_str:
-                        # 從本地數據中刪除
-                        vehicle_records.pop(i)
-                        # 從 Firebase 中刪除
-                        self.database.delete_record(company_id, vehicle_id, i)
-                        break
+                # 從本地數據及 Firebase 中刪除
+                vehicle_records = self.data["companies"][company_id]["vehicles"][vehicle_id].get("records", {})
+                removed = vehicle_records.pop(record_id, None) or {}
+                self.database.delete_record(company_id, vehicle_id, record_id, removed.get("version"))
                 
-                # 儲存並更新表格
-                self.save_data()
-                self.update_table()
+                # 更新表格
+                self.table_model.remove_record(record_id)
                 QMessageBox.information(self, "成功", "記錄已成功刪除！")
                 
             except Exception as e:
                 QMessageBox.warning(self, "錯誤", f"刪除記錄時發生錯誤：{str(e)}")
 
-    def export_excel(self):
-        """匯出資料到 Excel"""
-        try:
-            # 建立新的工作簿
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "洗車紀錄"
-            
-            # 寫入標題
-            headers = ["類型", "日期", "公司", "車牌號碼", "車輛種類", "服務項目", "備註", "金額總計"]
-            for col, header in enumerate(headers, 1):
-                ws.cell(row=1, column=col, value=header)
-            
-            # 寫入資料
-            excel_row = 2
-            for table_row in range(self.table.rowCount()):
-                # 獲取該行的服務項目
-                service_items = self.table.item(table_row, 5).text().split('\n')
-                first_item = True
-                
-                # 對每個服務項目創建一行
-                for item in service_items:
-                    # 如果是第一個項目，寫入所有欄位
-                    if first_item:
-                        for col in range(self.table.columnCount() - 1):  # 排除操作按鈕欄
-                            if col == 5:  # 服務項目欄
-                                ws.cell(row=excel_row, column=col + 1, value=item.strip())
-                            else:
-                                cell_item = self.table.item(table_row, col)
-                                if cell_item:
-                                    ws.cell(row=excel_row, column=col + 1, value=cell_item.text())
-                        first_item = False
-                    else:
-                        # 如果不是第一個項目，只寫入服務項目
-                        ws.cell(row=excel_row, column=6, value=item.strip())
-                    excel_row += 1
-                
-                # 在每個記錄之間添加一個空行
-                excel_row += 1
-            
-            # 調整欄寬
-            for col in ws.columns:
-                max_length = 0
-                for cell in col:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                ws.column_dimensions[col[0].column_letter].width = max_length + 2
-            
-            # 根據當前時間生成檔案名稱
-            current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-            default_filename = f"洗車紀錄_{current_time}.xlsx"
-            
-            # 選擇儲存位置
-            file_path, _ = QFileDialog.getSaveFileName(
-                self,
-                "儲存 Excel 檔案",
-                default_filename,  # 預設檔案名稱
-                "Excel 檔案 (*.xlsx)"
-            )
-            
-            if file_path:
-                if not file_path.endswith('.xlsx'):
-                    file_path += '.xlsx'
-                wb.save(file_path)
-                QMessageBox.information(self, "成功", "資料已成功匯出！")
-                
-        except Exception as e:
-            QMessageBox.warning(self, "錯誤", f"匯出資料時發生錯誤：{str(e)}")
+    def export_records(self):
+        """在背景匯出目前篩選結果（Excel、CSV 或 Parquet）"""
+        # 根據當前時間生成檔案名稱
+        current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+        default_filename = f"洗車紀錄_{current_time}.xlsx"
+
+        # 先選擇儲存位置，確定要匯出才開始產生檔案
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self,
+            "匯出篩選資料",
+            default_filename,  # 預設檔案名稱
+            ";;".join(EXPORT_FILE_FILTERS)
+        )
+        if not file_path:
+            return
+        extension = Path(file_path).suffix.lower()
+        if extension not in EXPORT_FILE_FILTERS.values():
+            extension = EXPORT_FILE_FILTERS.get(selected_filter, ".xlsx")
+            file_path += extension
+
+        from record_export import EXPORTERS
+        from export_worker import ExportWorker
+
+        # 匯出使用資料副本，匯出期間仍可新增或刪除紀錄
+        positions = self.proxy_model.source_rows()
+        self.export_worker = ExportWorker(
+            EXPORTERS[extension], self.table_model.store.snapshot(), positions, file_path, self
+        )
+        self.export_progress = QProgressDialog("正在匯出資料...", "取消", 0, max(len(positions), 1), self)
+        self.export_progress.setWindowTitle("匯出篩選資料")
+        # 不鎖住主視窗，匯出期間表格仍可操作；同時只執行一個匯出
+        self.export_progress.setWindowModality(Qt.WindowModality.NonModal)
+        self.export_progress.setAutoClose(False)
+        self.export_progress.setAutoReset(False)
+        self.export_progress.setMinimumDuration(0)
+        self.export_progress.canceled.connect(self.export_worker.cancel)
+        self.export_worker.progress.connect(lambda done, total: self.export_progress.setValue(done))
+        self.export_worker.finished.connect(self.on_export_finished)
+        self.export_worker.failed.connect(self.on_export_failed)
+        self.export_worker.cancelled.connect(self.on_export_cancelled)
+        self.export_btn.setEnabled(False)
+        self.export_worker.start()
+
+    def on_export_finished(self, file_path):
+        self.export_progress.close()
+        self.export_btn.setEnabled(True)
+        QMessageBox.information(self, "成功", "資料已成功匯出！")
+
+    def on_export_failed(self, message):
+        self.export_progress.close()
+        self.export_btn.setEnabled(True)
+        QMessageBox.warning(self, "錯誤", f"匯出資料時發生錯誤：{message}")
+
+    def on_export_cancelled(self):
+        self.export_progress.close()
+        self.export_btn.setEnabled(True)
+        self.statusBar().showMessage("已取消匯出", 3000)
+
+    def show_diagnostics(self):
+        """效能診斷（Ctrl+Shift+D）"""
+        from diagnostics_dialog import DiagnosticsDialog
+        DiagnosticsDialog(self).exec()
+
+    def on_wash_items_changed(self, items):
+        """洗車項目改名或改價後，參照這些項目的紀錄隨即更新"""
+        self.table_model.update_wash_items(self.wash_item_catalog.index())
+        self.update_totals()
 
     def save_wash_items(self, items):
         """儲存洗車項目"""
         try:
-            self.database.save_wash_items(items)
+            self.wash_item_catalog.set_items(items)
         except Exception as e:
             QMessageBox.warning(self, "錯誤", f"儲存洗車項目時發生錯誤：{str(e)}")
 
     def filter_records(self):
-        """根據搜尋條件過濾記錄"""
-        # 首先更新表格内容
-        self.update_table()
-        
-        search_text = self.search_input.text().lower().strip()
-        
-        # 獲取日期範圍
-        start_date = self.start_date.date()
-        end_date = self.end_date.date()
-
-        for row in range(self.table.rowCount()):
-            hide = False
-            
-            # 檢查日期
-            date_str = self.table.item(row, 1).text()
-            record_date = QDate.fromString(date_str, "yyyy-MM-dd")  # 先嘗試 yyyy-MM-dd 格式
-            if not record_date.isValid():
-                record_date = QDate.fromString(date_str, "yyyy/MM/dd")  # 如果無效，嘗試 yyyy/MM/dd 格式
-            
-            if not (start_date <= record_date <= end_date):  # 修改日期比较逻辑
-                hide = True
-            
-            # 檢查搜尋文字
-            if not hide and search_text:
-                found = False
-                
-                # 檢查每個欄位
-                for col in range(self.table.columnCount() - 1):
-                    item = self.table.item(row, col)
-                    if not item:
-                        continue
-                        
-                    cell_text = item.text().lower()
-                    
-                    # 特別處理服務項目欄位
-                    if col == 5:  # 服務項目欄位
-                        lines = cell_text.split('\n')
-                        for line in lines:
-                            service = line.replace('• ', '').split(' - $')[0].strip().lower()
-                            if search_text in service:
-                                found = True
-                                break
-                    else:
-                        if search_text in cell_text:
-                            found = True
-                            break
-                
-                if not found:
-                    hide = True
-            
-            # 設置行的顯示/隱藏狀態
-            self.table.setRowHidden(row, hide)
+        """根據搜尋條件過濾記錄（只重新篩選，不重建表格）"""
+        with metrics.span("ui.filter_records"):
+            self.proxy_model.set_filters(
+                self.company_combo.currentData(),
+                self.vehicle_combo.currentData(),
+                self.start_date.date().toPython().toordinal(),
+                self.end_date.date().toPython().toordinal(),
+                self.search_input.text(),
+            )
+            self.update_totals()
 
     def clear_search(self):
         """清除所有搜尋條件並重置顯示"""
@@ -609,15 +1025,12 @@ class MainWindow(QMainWindow):
         self.company_combo.setCurrentText("全部公司")
         self.vehicle_combo.setCurrentText("全部車輛")
         
-        # 重新載入所有資料
-        self.update_table()
-        
-        # 確保所有行都顯示
-        for row in range(self.table.rowCount()):
-            self.table.setRowHidden(row, False)
+        # 重新套用篩選條件（上面的變更只會執行一次篩選）
+        self.filter_scheduler.flush()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    window = MainWindow()
+    with startup.measure("window shell"):
+        window = MainWindow()
     window.show()
     sys.exit(app.exec())
@@ -0,0 +1,189 @@
+# metrics.py
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from functools import wraps
+
+# 直方圖的區間上限（毫秒），最後一格為超過 10 秒
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+SLOW_SPAN_MS = 100        # 超過這個時間的操作逐筆寫入紀錄檔
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+
+class Histogram:
+    """單一操作的耗時分布及累計的計數（例如傳送/接收的位元組）"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.counters = {}
+
+    def add(self, elapsed_ms, counters):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.buckets[bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def percentile(self, fraction):
+        """以區間上限估計百分位數（毫秒），最後一格以最大值代替"""
+        target = self.count * fraction
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return BUCKETS_MS[index] if index < len(BUCKETS_MS) else self.max_ms
+        return 0.0
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": round(self.max_ms, 2),
+            **self.counters,
+        }
+
+
+class Span:
+    """一次操作的計時，離開 with 區塊時記錄；add() 可累加位元組等計數"""
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.counters = {}
+
+    def add(self, key, value=1):
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.add("errors")
+        self.metrics.record(self.name, time.perf_counter() - self.start, self.counters)
+        return False
+
+
+class NullSpan:
+    """未啟用時使用，不做任何事"""
+
+    def add(self, key, value=1):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Metrics:
+    """記錄資料庫存取、表格重建、篩選、匯出及對話框開啟的耗時
+
+    以 --metrics 參數或 RECORD_SYSTEM_METRICS 環境變數啟動時才會記錄；
+    未啟用時 timed() 直接回傳原本的函式，span() 回傳不做事的物件，
+    幾乎沒有額外負擔。結果保存在記憶體的直方圖中（主視窗按 Ctrl+Shift+D
+    可查看），較慢的操作及摘要寫入資料目錄下的 metrics.log（自動輪替）。
+    """
+
+    def __init__(self):
+        self.enabled = ("--metrics" in sys.argv
+                        or bool(os.environ.get("RECORD_SYSTEM_METRICS")))
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.logger = None
+
+    def span(self, name):
+        return Span(self, name) if self.enabled else NULL_SPAN
+
+    def timed(self, name):
+        """計時函式的裝飾器，未啟用時不包裝
+
+        包裝後的函式接受任意參數，連接到 Qt signal 的 slot 請改用 span()。
+        """
+        def decorator(function):
+            if not self.enabled:
+                return function
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with Span(self, name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def increment(self, name, key, value=1):
+        """只累加計數、不計時的事件（例如重試）"""
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.setdefault(name, Histogram())
+            histogram.counters[key] = histogram.counters.get(key, 0) + value
+
+    def record(self, name, seconds, counters=None):
+        elapsed_ms = seconds * 1000
+        with self.lock:
+            self.histograms.setdefault(name, Histogram()).add(elapsed_ms, counters or {})
+        if elapsed_ms >= SLOW_SPAN_MS:
+            self.log({"span": name, "ms": round(elapsed_ms, 1), **(counters or {})})
+
+    def summary(self):
+        """{名稱: 統計}，依名稱排序"""
+        with self.lock:
+            return {name: self.histograms[name].summary() for name in sorted(self.histograms)}
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def write_summary(self):
+        """將目前的統計寫入紀錄檔，回傳檔案位置"""
+        return self.log({"summary": self.summary()})
+
+    def log(self, entry):
+        logger = self._get_logger()
+        entry = {"time": datetime.now().isoformat(timespec="milliseconds"), **entry}
+        logger.info(json.dumps(entry, ensure_ascii=False))
+        return logger.handlers[0].baseFilename
+
+    def _get_logger(self):
+        with self.lock:
+            if self.logger is None:
+                import logging
+                from logging.handlers import RotatingFileHandler
+                from app_paths import get_data_dir
+
+                handler = RotatingFileHandler(
+                    os.path.join(get_data_dir(), "metrics.log"),
+                    maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8",
+                )
+                self.logger = logging.getLogger("record_system.metrics")
+                self.logger.setLevel(logging.INFO)
+                self.logger.propagate = False
+                self.logger.addHandler(handler)
+            return self.logger
+
+
+def payload_size(value):
+    """資料以 JSON 傳輸時的大約位元組數"""
+    if value is None:
+        return 0
+    return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+metrics = Metrics()
@@ -0,0 +1,197 @@
+# record_export.py
+import csv
+import unicodedata
+from datetime import date
+from records import PAYMENT_TYPE_TEXT, item_name
+
+EXCEL_HEADERS = ["類型", "日期", "公司", "車牌號碼", "車輛種類", "服務項目", "項目金額", "備註", "金額總計"]
+AMOUNT_FORMAT = '"$"#,##0'
+DECIMAL_AMOUNT_FORMAT = '"$"#,##0.00'  # 網頁版可寫入含小數的價格
+DATE_FORMAT = "yyyy-mm-dd"
+WIDTH_SAMPLE_SIZE = 500  # 欄寬依前幾筆紀錄估算，不掃描全部儲存格
+PROGRESS_STEP = 1000  # 每寫入幾筆紀錄回報一次進度
+
+# CSV/Parquet 每筆紀錄一列，供會計程式重複讀取
+FLAT_HEADERS = ["紀錄ID", "類型", "日期", "公司", "車牌號碼", "車輛種類", "服務項目", "備註", "金額總計"]
+
+
+class ExportCancelled(Exception):
+    """使用者取消匯出"""
+
+
+def report_progress(progress, done, total):
+    """回報進度，progress 回傳 False 時中止匯出"""
+    if progress is not None and progress(done, total) is False:
+        raise ExportCancelled()
+
+
+def text_width(value):
+    """估算文字在 Excel 中的顯示寬度，全形字元算兩格"""
+    text = str(value)
+    return sum(2 if unicodedata.east_asian_width(char) in "WF" else 1 for char in text)
+
+
+def is_amount(value):
+    """金額可能是整數或小數（bool 不算）"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def item_price(item):
+    """服務項目的金額，舊格式（字串）的項目沒有金額"""
+    return item["price"] if isinstance(item, dict) else None
+
+
+def export_lines(store, positions):
+    """依 Excel 版面產生每一行的值
+
+    每筆紀錄的第一行包含所有欄位及第一個服務項目，其餘服務項目各佔一行，
+    紀錄之間空一行。日期、金額都是原本的型別，不是表格上的顯示文字。
+    """
+    for position in positions:
+        date_ordinal = store.date_ordinals[position]
+        items = store.items[position] or [""]
+        first_item = items[0]
+        yield [
+            PAYMENT_TYPE_TEXT.get(store.payment_type(position), ""),
+            date.fromordinal(date_ordinal) if date_ordinal else store.dates[position],
+            store.company_name(position),
+            store.plate(position),
+            store.vehicle_type(position),
+            f"• {item_name(first_item)}" if first_item else "",
+            item_price(first_item),
+            store.remarks[position],
+            store.totals[position],
+        ]
+        for item in items[1:]:
+            yield [None, None, None, None, None, f"• {item_name(item)}", item_price(item), None, None]
+        yield []
+
+
+def column_widths(store, positions):
+    """以標題及前 WIDTH_SAMPLE_SIZE 筆紀錄估算欄寬"""
+    widths = [text_width(header) for header in EXCEL_HEADERS]
+    for line in export_lines(store, positions[:WIDTH_SAMPLE_SIZE]):
+        for column, value in enumerate(line):
+            if value is None or value == "":
+                continue
+            if isinstance(value, date):
+                width = len(DATE_FORMAT)
+            elif is_amount(value):
+                width = len(f"${value:,}")
+            else:
+                width = text_width(value)
+            widths[column] = max(widths[column], width)
+    return [width + 2 for width in widths]
+
+
+def export_excel(store, positions, file_path, progress=None):
+    """將指定列的紀錄以 write-only 模式逐行寫入 Excel 檔"""
+    # openpyxl 載入較慢，實際匯出 Excel 時才載入
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+
+    positions = list(positions)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("洗車紀錄")
+    # write-only 模式必須在寫入資料前設定欄寬
+    for column, width in enumerate(column_widths(store, positions), 1):
+        ws.column_dimensions[get_column_letter(column)].width = width
+
+    ws.append(EXCEL_HEADERS)
+    for start in range(0, len(positions), PROGRESS_STEP):
+        for line in export_lines(store, positions[start:start + PROGRESS_STEP]):
+            ws.append([styled_cell(ws, value) for value in line])
+        report_progress(progress, min(start + PROGRESS_STEP, len(positions)), len(positions))
+    wb.save(file_path)
+
+
+def styled_cell(ws, value):
+    """日期及金額設定顯示格式，其餘直接寫入值"""
+    from openpyxl.cell import WriteOnlyCell
+
+    if isinstance(value, date):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.number_format = DATE_FORMAT
+        return cell
+    if is_amount(value):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.number_format = AMOUNT_FORMAT if value == int(value) else DECIMAL_AMOUNT_FORMAT
+        return cell
+    return value
+
+
+def items_summary(items):
+    """服務項目合併成一欄文字"""
+    return "、".join(
+        f"{item['name']} ${item['price']}" if isinstance(item, dict) else str(item)
+        for item in items or []
+    )
+
+
+def flat_row(store, position):
+    """CSV/Parquet 使用的一列，日期無法解析時保留原字串"""
+    date_ordinal = store.date_ordinals[position]
+    return [
+        store.ids[position],
+        PAYMENT_TYPE_TEXT.get(store.payment_type(position), ""),
+        date.fromordinal(date_ordinal).isoformat() if date_ordinal else store.dates[position],
+        store.company_name(position),
+        store.plate(position),
+        store.vehicle_type(position),
+        items_summary(store.items[position]),
+        store.remarks[position],
+        store.totals[position],
+    ]
+
+
+def export_csv(store, positions, file_path, progress=None):
+    """每筆紀錄一列寫入 CSV（UTF-8 BOM，Excel 可直接開啟）"""
+    positions = list(positions)
+    with open(file_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(FLAT_HEADERS)
+        for start in range(0, len(positions), PROGRESS_STEP):
+            writer.writerows(flat_row(store, position)
+                             for position in positions[start:start + PROGRESS_STEP])
+            report_progress(progress, min(start + PROGRESS_STEP, len(positions)), len(positions))
+
+
+def export_parquet(store, positions, file_path, progress=None):
+    """每筆紀錄一列寫入 Parquet，日期為 date 型別、金額為浮點數（需要 pyarrow）"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("匯出 Parquet 需要安裝 pyarrow 套件")
+
+    positions = list(positions)
+    schema = pa.schema([
+        ("紀錄ID", pa.string()),
+        ("類型", pa.string()),
+        ("日期", pa.date32()),
+        ("公司", pa.string()),
+        ("車牌號碼", pa.string()),
+        ("車輛種類", pa.string()),
+        ("服務項目", pa.string()),
+        ("備註", pa.string()),
+        ("金額總計", pa.float64()),
+    ])
+    with pq.ParquetWriter(file_path, schema) as writer:
+        for start in range(0, len(positions), PROGRESS_STEP):
+            batch = positions[start:start + PROGRESS_STEP]
+            columns = [list(column) for column in zip(*(flat_row(store, position) for position in batch))]
+            # 無法解析的日期寫入 null
+            columns[2] = [
+                date.fromordinal(store.date_ordinals[position]) if store.date_ordinals[position] else None
+                for position in batch
+            ]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            report_progress(progress, min(start + PROGRESS_STEP, len(positions)), len(positions))
+
+
+# 副檔名 -> 匯出函式
+EXPORTERS = {
+    ".xlsx": export_excel,
+    ".csv": export_csv,
+    ".parquet": export_parquet,
+}
@@ -0,0 +1,99 @@
+# record_query.py
+from aggregates import Totals
+
+
+class RecordQuery:
+    """公司、車輛、日期區間及搜尋文字的篩選條件
+
+    不依賴 Qt，主畫面的 proxy model 與命令列工具共用同一套篩選邏輯。
+    條件會先對 RecordStore 換算成公司/車輛代碼、日期列範圍及符合搜尋的
+    紀錄 ID，之後逐列判斷只需要整數比較；store 有增刪時才重新換算。
+    """
+
+    def __init__(self, company_id="all", vehicle_id="all", start_ordinal=None,
+                 end_ordinal=None, search_text=""):
+        self.company_id = company_id or "all"
+        self.vehicle_id = vehicle_id or "all"
+        self.start_ordinal = start_ordinal
+        self.end_ordinal = end_ordinal
+        self.search_text = (search_text or "").lower().strip()
+        self.company_code = None  # None 代表不限
+        self.vehicle_code = None
+        self.row_range = None  # 日期區間對應的列範圍，None 代表不限
+        self.matching_ids = None  # 符合搜尋文字的紀錄 ID，None 代表不限
+        self.bound_store = None
+        self.bound_version = None
+
+    def bind(self, store):
+        """依 store 目前的內容換算篩選條件"""
+        if self.bound_store is store and self.bound_version == store.version:
+            return
+        # 不存在的公司/車輛以 -1 表示，不會符合任何紀錄
+        if self.company_id == "all":
+            self.company_code = None
+        else:
+            code = store.companies.find(self.company_id)
+            self.company_code = -1 if code is None else code
+        if self.vehicle_id == "all":
+            self.vehicle_code = None
+        else:
+            code = store.vehicles.find(self.vehicle_id)
+            self.vehicle_code = -1 if code is None else code
+        if self.start_ordinal is None and self.end_ordinal is None:
+            self.row_range = None
+        else:
+            self.row_range = store.date_range(self.start_ordinal, self.end_ordinal)
+        if self.search_text:
+            self.matching_ids = store.search_index.search(self.search_text)
+        else:
+            self.matching_ids = None
+        self.bound_store = store
+        self.bound_version = store.version
+
+    def accepts(self, position):
+        """判斷某列是否符合條件（需先呼叫 bind）"""
+        store = self.bound_store
+        if self.row_range is not None and not self.row_range[0] <= position < self.row_range[1]:
+            return False
+        if self.company_code is not None and store.company_codes[position] != self.company_code:
+            return False
+        if self.vehicle_code is not None and store.vehicle_codes[position] != self.vehicle_code:
+            return False
+        if self.matching_ids is not None and store.ids[position] not in self.matching_ids:
+            return False
+        return True
+
+    def candidates(self, store):
+        """可能符合條件的列位置（依日期排序，需先呼叫 bind）
+
+        每筆符合搜尋的紀錄以 position_of 定位需要一次二分搜尋（約 log2(n) 次比較），
+        只有比逐列檢查日期範圍內的每一列便宜時才這樣做。
+        """
+        lo, hi = self.row_range or (0, len(store))
+        if (self.matching_ids is not None
+                and len(self.matching_ids) * len(store).bit_length() < hi - lo):
+            return sorted(
+                position for position in map(store.position_of, self.matching_ids)
+                if position is not None
+            )
+        return range(lo, hi)
+
+    def positions(self, store):
+        """符合條件的列位置（依日期排序）"""
+        self.bind(store)
+        return [position for position in self.candidates(store) if self.accepts(position)]
+
+    def subtotal(self, store):
+        """符合條件的紀錄小計
+
+        沒有搜尋文字時由累計分組取得；有搜尋文字時只加總符合搜尋的紀錄。
+        """
+        self.bind(store)
+        if self.matching_ids is None:
+            return store.subtotal(self.company_code, self.vehicle_code,
+                                  self.start_ordinal, self.end_ordinal)
+        totals = Totals()
+        for position in self.candidates(store):
+            if self.accepts(position):
+                totals.add(store.totals[position], store.payment_types[position])
+        return totals
@@ -0,0 +1,436 @@
+# record_store.py
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from records import parse_date_ordinal, format_items, build_search_text
+from search_index import NGramIndex
+from date_index import DateIndex
+from aggregates import RecordAggregates, Totals, month_of, month_start, next_month
+from wash_items import normalize_catalog, catalog_index, resolve_items, referenced_ids
+
+# 應付/應收類型以整數儲存
+PAYMENT_TYPES = ["", "payable", "receivable"]
+PAYMENT_TYPE_CODES = {payment_type: code for code, payment_type in enumerate(PAYMENT_TYPES)}
+
+
+def split_records(data):
+    """將巢狀資料拆成不含紀錄的公司/車輛結構，以及依日期排序的紀錄
+
+    回傳 (skeleton, entries)，entries 為 [(company_id, vehicle_id, record)]，
+    skeleton 中每台車輛的 records 為新的空字典，原本的資料不會被修改。
+    """
+    skeleton = {key: value for key, value in data.items() if key != "companies"}
+    skeleton["companies"] = {}
+    entries = []
+    for company_id, company_data in data.get("companies", {}).items():
+        vehicles = {}
+        for vehicle_id, vehicle_data in company_data.get("vehicles", {}).items():
+            vehicle = {key: value for key, value in vehicle_data.items() if key != "records"}
+            vehicle["records"] = {}
+            vehicles[vehicle_id] = vehicle
+            for record in vehicle_data.get("records", {}).values():
+                entries.append((company_id, vehicle_id, record))
+        company = {key: value for key, value in company_data.items() if key != "vehicles"}
+        company["vehicles"] = vehicles
+        skeleton["companies"][company_id] = company
+    entries.sort(key=lambda entry: RecordStore.sort_key(entry[2]))
+    return skeleton, entries
+
+
+class StringTable:
+    """字串與整數代碼的對照表，重複的字串只保存一份"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+    def code(self, value):
+        """取得字串的代碼，不存在時新增"""
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(sys.intern(value) if isinstance(value, str) else value)
+            self.codes[value] = code
+        return code
+
+    def find(self, value):
+        """取得字串的代碼，不存在時回傳 None"""
+        return self.codes.get(value)
+
+
+class RecordStore:
+    """以欄位陣列儲存的扁平紀錄表
+
+    由 get_all_data() 的巢狀資料建立一次，之後隨新增、刪除更新。各欄位以
+    平行的 array 儲存（日期序數、公司/車輛代碼、應付/應收類型），金額總計
+    可能含小數（網頁版以 parseFloat 寫入價格），以一般列表保存原本的數值，
+    名稱類字串存放在對照表中，列依日期排序，因此日期區間就是一段連續的列。
+    無法解析的日期序數為 0，排在最前面。
+    參照洗車項目目錄的服務項目在加入時展開為名稱及金額（見 wash_items）。
+    """
+
+    def __init__(self):
+        self.wash_items = {}  # 項目 ID -> 目錄項目，清除紀錄時保留
+        self.clear()
+
+    def clear(self):
+        self.ids = []
+        self.date_ordinals = array('l')
+        self.timestamps = array('q')
+        self.company_codes = array('l')
+        self.vehicle_codes = array('l')
+        self.totals = []  # 整數或小數，依紀錄中的價格
+        self.payment_types = array('b')
+        self.dates = []
+        self.items = []  # 原始紀錄的項目列表，只有參照目錄的項目才另外展開
+        self.remarks = []
+
+        self.companies = StringTable()  # company_id <-> 代碼
+        self.company_names = []  # 依公司代碼
+        self.vehicles = StringTable()  # vehicle_id <-> 代碼
+        self.vehicle_company_codes = array('l')  # 依車輛代碼
+        self.vehicle_plates = []
+        self.vehicle_types = StringTable()
+        self.vehicle_type_codes = array('l')
+        self.vehicle_remarks = []
+
+        self.sort_keys = {}  # record_id -> 排序鍵，用於二分搜尋定位
+        self.search_index = NGramIndex()
+        self.vehicle_dates = {}  # 車輛代碼 -> DateIndex
+        self.item_dates = {}  # 項目 ID -> DateIndex，目錄變更及依項目查詢時使用
+        self.aggregates = RecordAggregates()
+        self.version = 0  # 資料有增刪時遞增，供快取判斷是否過期
+
+    def __len__(self):
+        return len(self.ids)
+
+    def load(self, data):
+        """由巢狀的公司/車輛/紀錄資料重建"""
+        self.clear()
+        if "wash_items" in data:
+            self.wash_items = catalog_index(normalize_catalog(data["wash_items"]))
+        entries = []
+        for company_id, company_data in data["companies"].items():
+            for vehicle_id, vehicle_data in company_data.get("vehicles", {}).items():
+                vehicle_code = self.register_vehicle(
+                    company_id, company_data, vehicle_id, vehicle_data
+                )
+                for record in vehicle_data.get("records", {}).values():
+                    entries.append((self.sort_key(record), vehicle_code, record))
+        entries.sort(key=lambda entry: entry[0])
+        for key, vehicle_code, record in entries:
+            self._append(len(self.ids), vehicle_code, record, key)
+        self.search_index.add_many(
+            (record_id, self.search_text(position)) for position, record_id in enumerate(self.ids)
+        )
+        self.version += 1
+
+    def register_vehicle(self, company_id, company_data, vehicle_id, vehicle_data):
+        """登錄（或更新）公司與車輛資訊，回傳車輛代碼"""
+        company_code = self.companies.code(company_id)
+        if company_code == len(self.company_names):
+            self.company_names.append(company_data["name"])
+        else:
+            self.company_names[company_code] = company_data["name"]
+
+        vehicle_code = self.vehicles.code(vehicle_id)
+        type_code = self.vehicle_types.code(vehicle_data["type"])
+        if vehicle_code == len(self.vehicle_plates):
+            self.vehicle_company_codes.append(company_code)
+            self.vehicle_plates.append(vehicle_data["plate"])
+            self.vehicle_type_codes.append(type_code)
+            self.vehicle_remarks.append(vehicle_data.get("remarks", ""))
+        else:
+            self.vehicle_company_codes[vehicle_code] = company_code
+            self.vehicle_plates[vehicle_code] = vehicle_data["plate"]
+            self.vehicle_type_codes[vehicle_code] = type_code
+            self.vehicle_remarks[vehicle_code] = vehicle_data.get("remarks", "")
+        return vehicle_code
+
+    def update_company(self, company_id, company_data):
+        """公司資料變更：更新名稱並重建該公司紀錄的搜尋文字，回傳受影響的列"""
+        company_code = self.companies.find(company_id)
+        if company_code is None:
+            return []
+        self.company_names[company_code] = company_data["name"]
+        return self._reindex(self.company_codes, company_code)
+
+    def update_vehicle(self, company_id, company_data, vehicle_id, vehicle_data):
+        """車輛資料變更：更新車牌、種類並重建該車輛紀錄的搜尋文字，回傳受影響的列"""
+        if self.vehicles.find(vehicle_id) is None:
+            return []
+        vehicle_code = self.register_vehicle(company_id, company_data, vehicle_id, vehicle_data)
+        return self._reindex(self.vehicle_codes, vehicle_code)
+
+    def update_wash_items(self, index):
+        """洗車項目目錄變更：重新展開參照到有變動項目的紀錄，回傳受影響的列"""
+        previous, self.wash_items = self.wash_items, index
+        changed = {item_id for item_id in set(previous) | set(index)
+                   if previous.get(item_id) != index.get(item_id)}
+        record_ids = set()
+        for item_id in changed & set(self.item_dates):
+            record_ids.update(self.item_dates[item_id].range())
+        positions = sorted(self.position_of(record_id) for record_id in record_ids)
+        for position in positions:
+            items = resolve_items(self.items[position], index)
+            if items is self.items[position]:
+                continue  # 網頁版寫入的項目，名稱及金額在紀錄中
+            _, total_amount = format_items(items)
+            if total_amount != self.totals[position]:
+                args = (self.company_codes[position], self.vehicle_codes[position],
+                        self.date_ordinals[position], self.payment_types[position])
+                self.aggregates.remove(self.totals[position], *args)
+                self.aggregates.add(total_amount, *args)
+                self.totals[position] = total_amount
+            self.items[position] = items
+            self.search_index.add(self.ids[position], self.search_text(position))
+        if positions:
+            self.version += 1
+        return positions
+
+    def _reindex(self, column, code):
+        positions = [position for position, value in enumerate(column) if value == code]
+        for position in positions:
+            self.search_index.add(self.ids[position], self.search_text(position))
+        if positions:
+            self.version += 1
+        return positions
+
+    @staticmethod
+    def sort_key(record):
+        """依日期排序，同一天依建立時間"""
+        return (parse_date_ordinal(record["date"]) or 0, record.get("timestamp") or 0, record["id"])
+
+    def _bisect(self, key, right=True):
+        """在已排序的列中找出 key 的位置"""
+        lo, hi = 0, len(self.ids)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key = (self.date_ordinals[mid], self.timestamps[mid], self.ids[mid])
+            if mid_key < key or (right and mid_key == key):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def insert_position(self, record, key=None):
+        """新增紀錄時會插入的列位置，key 為已算好的 sort_key(record)"""
+        if key is None:
+            key = self.sort_key(record)
+        if not self.ids or key > (self.date_ordinals[-1], self.timestamps[-1], self.ids[-1]):
+            return len(self.ids)  # 依日期載入時幾乎都接在最後面
+        return self._bisect(key)
+
+    def position_of(self, record_id):
+        """取得紀錄所在的列位置，不存在時回傳 None"""
+        key = self.sort_keys.get(record_id)
+        if key is None:
+            return None
+        return self._bisect(key, right=False)
+
+    def add(self, company_id, company_data, vehicle_id, vehicle_data, record, key=None):
+        """新增一筆紀錄，回傳插入的列位置；key 為已算好的 sort_key(record)"""
+        vehicle_code = self.register_vehicle(company_id, company_data, vehicle_id, vehicle_data)
+        if key is None:
+            key = self.sort_key(record)
+        position = self.insert_position(record, key)
+        self._append(position, vehicle_code, record, key)
+        self.search_index.add(record["id"], self.search_text(position))
+        self.version += 1
+        return position
+
+    def extend(self, entries, keys):
+        """將已依日期排序、且都排在最後面的紀錄接在後面，搜尋索引整批建立
+
+        entries 為 (company_id, company_data, vehicle_id, vehicle_data, record)，
+        keys 為對應的 sort_key。
+        """
+        start = len(self.ids)
+        for (company_id, company_data, vehicle_id, vehicle_data, record), key in zip(entries, keys):
+            vehicle_code = self.register_vehicle(company_id, company_data, vehicle_id, vehicle_data)
+            self._append(len(self.ids), vehicle_code, record, key)
+        self.search_index.add_many(
+            (self.ids[position], self.search_text(position)) for position in range(start, len(self.ids))
+        )
+        self.version += 1
+
+    def _append(self, position, vehicle_code, record, key):
+        record_id = record["id"]
+        items = resolve_items(record.get("items") or [], self.wash_items)
+        _, total_amount = format_items(items)
+        payment_code = PAYMENT_TYPE_CODES.get(record.get("payment_type") or "", 0)
+        company_code = self.vehicle_company_codes[vehicle_code]
+
+        self.ids.insert(position, record_id)
+        self.date_ordinals.insert(position, key[0])
+        self.timestamps.insert(position, key[1])
+        self.company_codes.insert(position, company_code)
+        self.vehicle_codes.insert(position, vehicle_code)
+        self.totals.insert(position, total_amount)
+        self.payment_types.insert(position, payment_code)
+        self.dates.insert(position, sys.intern(record["date"]))
+        self.items.insert(position, items)
+        self.remarks.insert(position, record.get("remarks", ""))
+        self.sort_keys[record_id] = key
+
+        if key[0]:
+            self.vehicle_dates.setdefault(vehicle_code, DateIndex()).add(key[0], record_id)
+        for item_id in referenced_ids(items):
+            self.item_dates.setdefault(item_id, DateIndex()).add(key[0], record_id)
+        self.aggregates.add(total_amount, company_code, vehicle_code, key[0], payment_code)
+
+    def remove(self, record_id):
+        """刪除一筆紀錄，回傳原本的列位置，不存在時回傳 None"""
+        position = self.position_of(record_id)
+        if position is None:
+            return None
+        date_ordinal = self.date_ordinals[position]
+        vehicle_code = self.vehicle_codes[position]
+        self.aggregates.remove(self.totals[position], self.company_codes[position],
+                               vehicle_code, date_ordinal, self.payment_types[position])
+        for item_id in referenced_ids(self.items[position]):
+            self.item_dates[item_id].remove(date_ordinal, record_id)
+        for column in (self.ids, self.date_ordinals, self.timestamps, self.company_codes,
+                       self.vehicle_codes, self.totals, self.payment_types, self.dates,
+                       self.items, self.remarks):
+            del column[position]
+        del self.sort_keys[record_id]
+        self.search_index.remove(record_id)
+        if date_ordinal and vehicle_code in self.vehicle_dates:
+            self.vehicle_dates[vehicle_code].remove(date_ordinal, record_id)
+        self.version += 1
+        return position
+
+    def snapshot(self):
+        """複製欄位資料供背景執行緒讀取（不含索引及累計）
+
+        陣列及列表只是淺層複製，之後主執行緒增刪紀錄不會影響副本的列位置。
+        """
+        copy = RecordStore.__new__(RecordStore)
+        for name in ("ids", "date_ordinals", "timestamps", "company_codes", "vehicle_codes",
+                     "totals", "payment_types", "dates", "items", "remarks",
+                     "company_names", "vehicle_company_codes", "vehicle_plates",
+                     "vehicle_type_codes", "vehicle_remarks"):
+            setattr(copy, name, getattr(self, name)[:])
+        for name in ("companies", "vehicles", "vehicle_types"):
+            table = StringTable()
+            table.values = getattr(self, name).values[:]
+            table.codes = dict(getattr(self, name).codes)
+            setattr(copy, name, table)
+        copy.sort_keys = {}
+        copy.search_index = None
+        copy.vehicle_dates = {}
+        copy.item_dates = {}
+        copy.wash_items = self.wash_items
+        copy.aggregates = None
+        copy.version = self.version
+        return copy
+
+    def date_range(self, start_ordinal=None, end_ordinal=None):
+        """日期區間對應的列範圍 [lo, hi)，無法解析日期的紀錄不包含在內"""
+        lo = bisect_left(self.date_ordinals, max(start_ordinal or 1, 1))
+        hi = len(self.ids) if end_ordinal is None else bisect_right(self.date_ordinals, end_ordinal)
+        return lo, max(lo, hi)
+
+    def vehicle_date_range(self, vehicle_id, start_ordinal=None, end_ordinal=None):
+        """單一車輛在日期區間內的紀錄 ID（依日期排序）"""
+        vehicle_code = self.vehicles.find(vehicle_id)
+        vehicle_index = self.vehicle_dates.get(vehicle_code)
+        return vehicle_index.range(start_ordinal, end_ordinal) if vehicle_index else []
+
+    def subtotal(self, company_code=None, vehicle_code=None, start_ordinal=None, end_ordinal=None):
+        """公司/車輛代碼及日期區間篩選下的小計
+
+        沒有日期限制時直接取分組累計；有日期區間時，完整的月份取月份累計，
+        只有頭尾不完整的月份才逐列加總（紀錄依日期排序，這些列是連續的）。
+        """
+        if vehicle_code is not None:
+            if company_code is not None and vehicle_code >= 0 and \
+                    self.vehicle_company_codes[vehicle_code] != company_code:
+                return Totals()
+            scope = ("vehicle", vehicle_code)
+        elif company_code is not None:
+            scope = ("company", company_code)
+        else:
+            scope = ()
+        if start_ordinal is None and end_ordinal is None:
+            return self.aggregates.get(*scope) if scope else self.aggregates.get("all")
+
+        totals = Totals()
+        lo, hi = self.date_range(start_ordinal, end_ordinal)
+        if lo >= hi:
+            return totals
+        month_scope = (f"{scope[0]}_month", scope[1]) if scope else ("month",)
+        month = month_of(self.date_ordinals[lo])
+        last_month = month_of(self.date_ordinals[hi - 1])
+        while month <= last_month:
+            first_day = month_start(month)
+            last_day = month_start(next_month(month)) - 1
+            if (start_ordinal is None or start_ordinal <= first_day) and \
+                    (end_ordinal is None or last_day <= end_ordinal):
+                totals.merge(self.aggregates.get(*month_scope, month))
+            else:
+                month_lo, month_hi = self.date_range(
+                    max(first_day, start_ordinal or first_day),
+                    min(last_day, end_ordinal or last_day),
+                )
+                self._sum_rows(totals, month_lo, month_hi, company_code, vehicle_code)
+            month = next_month(month)
+        return totals
+
+    def _sum_rows(self, totals, lo, hi, company_code, vehicle_code):
+        for position in range(lo, hi):
+            if company_code is not None and self.company_codes[position] != company_code:
+                continue
+            if vehicle_code is not None and self.vehicle_codes[position] != vehicle_code:
+                continue
+            totals.add(self.totals[position], self.payment_types[position])
+
+    def company_name(self, position):
+        return self.company_names[self.company_codes[position]]
+
+    def plate(self, position):
+        return self.vehicle_plates[self.vehicle_codes[position]]
+
+    def vehicle_type(self, position):
+        return self.vehicle_types[self.vehicle_type_codes[self.vehicle_codes[position]]]
+
+    def payment_type(self, position):
+        return PAYMENT_TYPES[self.payment_types[position]]
+
+    def search_text(self, position):
+        return build_search_text({
+            "payment_type": self.payment_type(position),
+            "date": self.dates[position],
+            "company": self.company_name(position),
+            "plate": self.plate(position),
+            "vehicle_type": self.vehicle_type(position),
+            "remarks": self.remarks[position],
+            "total_amount": self.totals[position],
+            "items": self.items[position],
+        })
+
+    def record_at(self, position):
+        """取得某列紀錄的完整資訊（需要時才組成字典）"""
+        vehicle_code = self.vehicle_codes[position]
+        return {
+            "id": self.ids[position],
+            "company_id": self.companies[self.company_codes[position]],
+            "vehicle_id": self.vehicles[vehicle_code],
+            "payment_type": self.payment_type(position),
+            "date": self.dates[position],
+            "company": self.company_name(position),
+            "plate": self.plate(position),
+            "vehicle_type": self.vehicle_type(position),
+            "vehicle_remarks": self.vehicle_remarks[vehicle_code],
+            "items": self.items[position],
+            "remarks": self.remarks[position],
+            "total_amount": self.totals[position],
+            "date_ordinal": self.date_ordinals[position] or None,
+        }
@@ -0,0 +1,199 @@
+# record_table_model.py
+from PySide6.QtCore import (Qt, QAbstractTableModel, QSortFilterProxyModel,
+                            QModelIndex, QEvent, Signal)
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import QStyledItemDelegate, QStyle
+from records import PAYMENT_TYPE_TEXT, format_items
+from record_store import RecordStore, PAYMENT_TYPES
+from record_query import RecordQuery
+
+COLUMN_HEADERS = ["類型", "日期", "公司", "車牌號碼", "車輛種類", "服務項目", "備註", "金額總計", "操作"]
+ACTION_COLUMN = 8
+
+
+class RecordTableModel(QAbstractTableModel):
+    """主畫面紀錄表格的資料模型
+
+    資料來源為 RecordStore 的欄位陣列（依日期排序），表格只會向模型索取
+    目前可見的儲存格，顯示文字也只在索取時才組成。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.store = RecordStore()
+
+    @property
+    def version(self):
+        return self.store.version
+
+    def load(self, data):
+        """由巢狀資料重建全部紀錄"""
+        self.beginResetModel()
+        self.store.load(data)
+        self.endResetModel()
+
+    def add_record(self, company_id, company_data, vehicle_id, vehicle_data, record, key=None):
+        """依日期順序插入一筆紀錄"""
+        if key is None:
+            key = self.store.sort_key(record)
+        position = self.store.insert_position(record, key)
+        self.beginInsertRows(QModelIndex(), position, position)
+        self.store.add(company_id, company_data, vehicle_id, vehicle_data, record, key)
+        self.endInsertRows()
+
+    def add_records(self, entries):
+        """批次加入紀錄，entries 為依日期排序的
+        [(company_id, company_data, vehicle_id, vehicle_data, record)]
+        """
+        if not entries:
+            return
+        # 每筆紀錄的排序鍵只計算一次
+        keys = [self.store.sort_key(entry[4]) for entry in entries]
+        start = len(self.store)
+        if self.store.insert_position(entries[0][4], keys[0]) != start:
+            # 與既有紀錄的日期交錯，逐筆插入
+            for entry, key in zip(entries, keys):
+                self.add_record(*entry, key)
+            return
+        # 全部接在最後面，只需通知一次
+        self.beginInsertRows(QModelIndex(), start, start + len(entries) - 1)
+        self.store.extend(entries, keys)
+        self.endInsertRows()
+
+    def remove_record(self, record_id):
+        """依紀錄 ID 移除一筆紀錄"""
+        position = self.store.position_of(record_id)
+        if position is None:
+            return
+        self.beginRemoveRows(QModelIndex(), position, position)
+        self.store.remove(record_id)
+        self.endRemoveRows()
+
+    def update_company(self, company_id, company_data):
+        """公司名稱變更，更新該公司的紀錄列"""
+        self._rows_changed(self.store.update_company(company_id, company_data))
+
+    def update_vehicle(self, company_id, company_data, vehicle_id, vehicle_data):
+        """車牌或車輛種類變更，更新該車輛的紀錄列"""
+        self._rows_changed(self.store.update_vehicle(company_id, company_data, vehicle_id, vehicle_data))
+
+    def update_wash_items(self, index):
+        """洗車項目改名或價格版本變更，更新參照這些項目的紀錄列"""
+        self._rows_changed(self.store.update_wash_items(index))
+
+    def _rows_changed(self, positions):
+        if positions:
+            self.dataChanged.emit(self.index(positions[0], 0),
+                                  self.index(positions[-1], self.columnCount() - 1))
+
+    def record_at(self, row):
+        return self.store.record_at(row)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.store)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMN_HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return COLUMN_HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        store = self.store
+        row = index.row()
+        column = index.column()
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return PAYMENT_TYPE_TEXT.get(PAYMENT_TYPES[store.payment_types[row]], "")
+            if column == 1:
+                return store.dates[row]
+            if column == 2:
+                return store.company_name(row)
+            if column == 3:
+                return store.plate(row)
+            if column == 4:
+                return store.vehicle_type(row)
+            if column == 5:
+                return format_items(store.items[row])[0]
+            if column == 6:
+                return store.remarks[row]
+            if column == 7:
+                return f"${store.totals[row]:,}"
+            return None
+        if role == Qt.ItemDataRole.ToolTipRole and column == 3:
+            vehicle_remarks = store.vehicle_remarks[store.vehicle_codes[row]]
+            if vehicle_remarks:
+                return f"備註：{vehicle_remarks}"
+            return None
+        if role == Qt.ItemDataRole.TextAlignmentRole and column == 7:
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        if role == Qt.ItemDataRole.UserRole:
+            return store.ids[row]
+        return None
+
+
+class RecordFilterProxyModel(QSortFilterProxyModel):
+    """依公司、車輛、日期範圍及搜尋文字篩選紀錄
+
+    篩選邏輯在 RecordQuery，變更篩選條件時不需要重建來源模型。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.query = RecordQuery()
+
+    def set_filters(self, company_id, vehicle_id, start_ordinal, end_ordinal, search_text):
+        """設定篩選條件並重新篩選"""
+        self.query = RecordQuery(company_id, vehicle_id, start_ordinal, end_ordinal, search_text)
+        self.invalidateFilter()
+
+    def record_at(self, row):
+        """取得篩選後第 row 列的紀錄"""
+        return self.sourceModel().record_at(self.source_row(row))
+
+    def subtotal(self):
+        """目前篩選結果的小計"""
+        return self.query.subtotal(self.sourceModel().store)
+
+    def source_row(self, row):
+        """篩選後第 row 列對應的來源列位置"""
+        return self.mapToSource(self.index(row, 0)).row()
+
+    def source_rows(self):
+        """篩選結果依顯示順序對應的來源列位置"""
+        return [self.source_row(row) for row in range(self.rowCount())]
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        self.query.bind(self.sourceModel().store)
+        return self.query.accepts(source_row)
+
+
+class DeleteButtonDelegate(QStyledItemDelegate):
+    """在「操作」欄繪製刪除按鈕，點擊時發出 delete_clicked(row)"""
+
+    delete_clicked = Signal(int)
+
+    def paint(self, painter, option, index):
+        rect = option.rect.adjusted(6, 4, -6, -4)
+        hovered = option.state & QStyle.StateFlag.State_MouseOver
+        painter.save()
+        painter.setRenderHint(painter.RenderHint.Antialiasing)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor("#357abd" if hovered else "#4a90e2"))
+        painter.drawRoundedRect(rect, 4, 4)
+        painter.setPen(QColor("white"))
+        painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, "刪除")
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.Type.MouseButtonRelease
+                and event.button() == Qt.MouseButton.LeftButton
+                and option.rect.contains(event.position().toPoint())):
+            self.delete_clicked.emit(index.row())
+            return True
+        return False
@@ -0,0 +1,118 @@
+# records.py
+import json
+import uuid
+from datetime import datetime
+from functools import lru_cache
+
+
+def new_record_id():
+    """產生新的紀錄 ID"""
+    return str(uuid.uuid4())
+
+
+def legacy_record_id(company_id, vehicle_id, key, record):
+    """替沒有 ID 的舊版紀錄產生固定的 ID
+
+    以紀錄所在位置及內容計算，轉換尚未寫回 Firebase 前，不論從哪個
+    管道（載入、即時更新）讀到同一筆紀錄都會得到相同的 ID。
+    """
+    content = json.dumps(record, ensure_ascii=False, sort_keys=True)
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{company_id}/{vehicle_id}/{key}/{content}"))
+
+
+def normalize_records(company_id, vehicle_id, records):
+    """將一台車輛的紀錄（陣列或字典）整理為以紀錄 ID 為 key 的字典
+
+    回傳 (紀錄字典, 是否需要寫回)。只會複製需要補上 "id" 的紀錄，
+    不修改傳入的資料。
+    """
+    if not records:
+        return {}, False
+    items = records.items() if isinstance(records, dict) else enumerate(records)
+    keyed = {}
+    changed = not isinstance(records, dict)
+    for key, record in items:
+        if not record:
+            continue  # Firebase 陣列刪除後留下的空位
+        record_id = record.get("id")
+        if not record_id:
+            record_id = legacy_record_id(company_id, vehicle_id, key, record)
+            record = dict(record, id=record_id)
+        if record_id != key:
+            changed = True
+        keyed[record_id] = record
+    return keyed, changed
+
+
+def migrate_records(data):
+    """將舊版以陣列儲存的紀錄轉為以紀錄 ID 為 key 的字典
+
+    紀錄內也保留 "id" 欄位，網頁版將紀錄寫回陣列時仍能對應到原本的 ID。
+    回傳有被轉換的 (company_id, vehicle_id) 列表。
+    """
+    migrated = []
+    for company_id, company_data in data.get("companies", {}).items():
+        for vehicle_id, vehicle_data in company_data.get("vehicles", {}).items():
+            records, changed = normalize_records(company_id, vehicle_id, vehicle_data.get("records"))
+            if not changed:
+                continue
+            vehicle_data["records"] = records
+            migrated.append((company_id, vehicle_id))
+    return migrated
+
+
+PAYMENT_TYPE_TEXT = {
+    "payable": "應付廠商",
+    "receivable": "應收廠商",
+}
+
+
+def format_items(items):
+    """將服務項目轉為顯示文字並計算總金額，舊格式（字串）的項目沒有金額"""
+    items_text = []
+    total_amount = 0
+    for item in items or []:
+        if isinstance(item, dict):
+            items_text.append(f"• {item['name']} - ${item['price']}")
+            total_amount += item['price']
+        else:
+            items_text.append(f"• {item}")
+    return "\n".join(items_text), total_amount
+
+
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d")
+
+
+@lru_cache(maxsize=8192)
+def parse_date_ordinal(date_str):
+    """將 yyyy-MM-dd 或 yyyy/MM/dd 格式的日期轉為整數序數，無法解析時回傳 None
+
+    紀錄的日期重複很多（同一天有多筆），結果會被快取，strptime 每個日期只執行一次。
+    """
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, date_format).toordinal()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def item_name(item):
+    """取得服務項目名稱（相容舊格式字串）"""
+    return item["name"] if isinstance(item, dict) else str(item)
+
+
+def build_search_text(row):
+    """產生搜尋用的正規化文字，服務項目只比對名稱"""
+    fields = [
+        PAYMENT_TYPE_TEXT.get(row["payment_type"], ""),
+        row["date"],
+        row["company"],
+        row["plate"],
+        row["vehicle_type"],
+        row["remarks"],
+        f"${row['total_amount']:,}",
+    ]
+    fields.extend(item_name(item) for item in row["items"])
+    return "\n".join(field for field in fields if field).lower()
+
@@ -0,0 +1,69 @@
+# request_pool.py
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# 同時進行的讀取數上限；firebase_admin 的所有 Reference 共用同一個 HTTP session，
+# requests 預設每個主機保留 10 條連線，不超過這個數量時連線都能重複使用
+MAX_WORKERS = 8
+
+
+class RequestPool:
+    """執行讀取請求的共用執行緒池
+
+    同一個 key（例如 ("get", 路徑)）的請求尚未完成時，後來的呼叫直接共用
+    同一個結果，不會重複下載。在池中的執行緒再送出請求時直接在該執行緒執行，
+    避免所有執行緒都在等待排隊中的工作。
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="database")
+        self.lock = threading.Lock()
+        self.in_flight = {}  # key -> Future
+        self.local = threading.local()
+
+    def submit(self, key, function):
+        """送出請求，回傳 Future"""
+        worker = getattr(self.local, "worker", False)
+        with self.lock:
+            future = self.in_flight.get(key)
+            # 池中的執行緒只共用已開始執行的請求，等待排隊中的請求可能永遠等不到空的執行緒
+            if future is not None and (not worker or future.running() or future.done()):
+                return future
+            if worker:
+                future = Future()
+                future.set_running_or_notify_cancel()
+                self.in_flight.setdefault(key, future)
+                inline = True
+            else:
+                future = self.executor.submit(self._run, function)
+                self.in_flight[key] = future
+                inline = False
+        future.add_done_callback(lambda done: self._finished(key, done))
+        if inline:
+            try:
+                future.set_result(function())
+            except Exception as e:
+                future.set_exception(e)
+        return future
+
+    def run(self, key, function):
+        """送出請求並等待結果"""
+        return self.submit(key, function).result()
+
+    def map(self, requests):
+        """同時執行多個請求，requests 為 [(key, function)]，依相同順序回傳結果
+
+        任一請求失敗時拋出第一個錯誤（其餘請求仍會執行完）。
+        """
+        futures = [self.submit(key, function) for key, function in requests]
+        return [future.result() for future in futures]
+
+    def _run(self, function):
+        self.local.worker = True
+        return function()
+
+    def _finished(self, key, future):
+        with self.lock:
+            if self.in_flight.get(key) is future:
+                del self.in_flight[key]
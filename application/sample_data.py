@@ -0,0 +1,178 @@
+# sample_data.py
+"""產生測試用的洗車紀錄資料
+
+產生的資料與 Database.get_all_data() 回傳的結構相同。服務項目大多以 ID
+參照洗車項目目錄（部分項目有調過價），並包含實際資料中會出現的舊格式：
+以陣列儲存、沒有 id 的紀錄，直接寫入名稱及金額或只有名稱（字串）的服務
+項目，yyyy/MM/dd 格式的日期，沒有 timestamp 或 payment_type 的紀錄。
+同一個 seed 每次產生的資料都相同，可用來比較不同版本的效能。
+
+用法（在 application 目錄下執行）：
+    python -m sample_data 10000 sample.json
+    set RECORD_SYSTEM_STORAGE=json:sample.json   （以產生的資料啟動程式）
+"""
+import argparse
+import json
+import random
+import sys
+import uuid
+from datetime import date, datetime, time, timedelta
+from wash_items import legacy_item_id, with_price, price_at, item_ref, catalog_to_storage
+
+WASH_ITEMS = [
+    {"name": "車身清洗", "price": 500},
+    {"name": "引擎清洗", "price": 800},
+    {"name": "底盤清洗", "price": 600},
+    {"name": "攪拌桶清洗", "price": 1200},
+    {"name": "內裝清潔", "price": 400},
+    {"name": "打蠟", "price": 1500},
+    {"name": "輪圈清洗", "price": 300},
+    {"name": "車頂清洗", "price": 350},
+]
+VEHICLE_TYPES = ["水泥攪拌車", "大貨車", "連結車", "其他"]
+COMPANY_WORDS = ["建設", "營造", "混凝土", "砂石", "工程", "運輸", "實業", "企業"]
+SURNAMES = "陳林黃張李王吳劉蔡楊許鄭謝郭洪曾邱廖賴周"
+REMARKS = ["", "", "", "", "加強清洗", "下次提醒更換雨刷", "司機自行送來", "月結", "急件"]
+CALIBRATION_NAMES = ["校正", "油漬加強", "追加清洗"]
+
+# 調價的項目：名稱 -> (新價格, 幾天前生效)
+PRICE_CHANGES = {"車身清洗": (550, 365), "攪拌桶清洗": (1300, 180)}
+
+# 舊格式資料的比例
+LEGACY_VEHICLE_RATIO = 0.05   # 紀錄仍以陣列儲存、沒有 id 的車輛
+LEGACY_ITEM_RATIO = 0.08      # 服務項目只有名稱（字串）的紀錄
+EMBEDDED_ITEM_RATIO = 0.3     # 服務項目直接寫入名稱及金額的紀錄（較早的版本、網頁版）
+SLASH_DATE_RATIO = 0.15       # 日期為 yyyy/MM/dd 的紀錄
+NO_TIMESTAMP_RATIO = 0.2      # 沒有 timestamp 的紀錄（早期版本）
+NO_PAYMENT_TYPE_RATIO = 0.1   # 沒有勾選應付/應收的紀錄
+
+RECORDS_PER_VEHICLE = 40      # 平均每台車輛的紀錄數
+VEHICLES_PER_COMPANY = 12     # 平均每間公司的車輛數
+DAYS = 3 * 365                # 紀錄分布在最近幾天內
+
+
+def random_id(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def random_plate(rng):
+    letters = "".join(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ") for _ in range(3))
+    return f"{letters}-{rng.randrange(10000):04d}"
+
+
+def build_catalog(end_date):
+    """洗車項目目錄（項目 ID 依名稱固定），PRICE_CHANGES 中的項目有兩個價格版本"""
+    catalog = []
+    for item in WASH_ITEMS:
+        entry = dict(item, id=legacy_item_id(item["name"]))
+        if item["name"] in PRICE_CHANGES:
+            price, days = PRICE_CHANGES[item["name"]]
+            entry = with_price(entry, price, (end_date - timedelta(days=days)).isoformat())
+        catalog.append(entry)
+    return catalog
+
+
+def random_items(rng, catalog, day):
+    entries = rng.sample(catalog, rng.choice([1, 1, 2, 2, 3, 4]))
+    calibration = None
+    if rng.random() < 0.1:
+        calibration = {"name": rng.choice(CALIBRATION_NAMES), "price": rng.randrange(1, 20) * 100}
+    roll = rng.random()
+    if roll < LEGACY_ITEM_RATIO:
+        items = [entry["name"] for entry in entries]
+        return items + [calibration["name"]] if calibration else items
+    if roll < LEGACY_ITEM_RATIO + EMBEDDED_ITEM_RATIO:
+        items = [{"name": entry["name"], "price": price_at(entry, day)} for entry in entries]
+    else:
+        items = [item_ref(entry, day) for entry in entries]
+    return items + [calibration] if calibration else items
+
+
+def random_record(rng, end_date, catalog):
+    day = end_date - timedelta(days=rng.randrange(DAYS))
+    date_format = "%Y/%m/%d" if rng.random() < SLASH_DATE_RATIO else "%Y-%m-%d"
+    record = {
+        "date": day.strftime(date_format),
+        "items": random_items(rng, catalog, day.isoformat()),
+        "remarks": rng.choice(REMARKS),
+    }
+    # 沒有勾選時寫入的 None 不會存到 Firebase，讀回來時沒有這個欄位
+    if rng.random() >= NO_PAYMENT_TYPE_RATIO:
+        record["payment_type"] = rng.choice(["receivable", "receivable", "payable"])
+    if rng.random() >= NO_TIMESTAMP_RATIO:
+        created = datetime.combine(day, time(8)) + timedelta(seconds=rng.randrange(10 * 3600))
+        record["timestamp"] = int(created.timestamp() * 1000)
+    return record
+
+
+def generate_data(record_count, seed=0, end_date=None):
+    """產生約 record_count 筆紀錄的公司/車輛/紀錄資料
+
+    end_date 預設為今天（主畫面預設只顯示最近一年的紀錄），要完全重現
+    同一份資料時請一併指定。
+    """
+    rng = random.Random(seed)
+    end_date = end_date or date.today()
+    catalog = build_catalog(end_date)
+    vehicle_count = max(1, round(record_count / RECORDS_PER_VEHICLE))
+    company_count = max(1, round(vehicle_count / VEHICLES_PER_COMPANY))
+
+    companies = {}
+    company_ids = []
+    for index in range(company_count):
+        company_id = random_id(rng)
+        company_ids.append(company_id)
+        companies[company_id] = {
+            "name": f"{rng.choice(SURNAMES)}{rng.choice(SURNAMES)}{rng.choice(COMPANY_WORDS)}{index + 1}",
+            "tax_id": f"{rng.randrange(10 ** 8):08d}",
+            "phone": f"0{rng.randrange(2, 9)}-{rng.randrange(10 ** 7):07d}",
+            "address": "",
+            "sort_index": index,
+            "vehicles": {},
+        }
+
+    # 每台車輛的紀錄數不平均：少數車輛洗得特別頻繁
+    weights = [rng.paretovariate(1.5) for _ in range(vehicle_count)]
+    scale = record_count / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for index in rng.sample(range(vehicle_count), record_count - sum(counts)):
+        counts[index] += 1
+
+    for index, count in enumerate(counts):
+        company = companies[company_ids[index % company_count]]
+        records = [random_record(rng, end_date, catalog) for _ in range(count)]
+        if rng.random() >= LEGACY_VEHICLE_RATIO:
+            keyed = {}
+            for record in records:
+                record["id"] = random_id(rng)
+                keyed[record["id"]] = record
+            records = keyed
+        vehicle = {
+            "plate": random_plate(rng),
+            "type": rng.choice(VEHICLE_TYPES),
+            "remarks": rng.choice(REMARKS),
+            "sort_index": len(company["vehicles"]),
+        }
+        if records:
+            vehicle["records"] = records
+        company["vehicles"][random_id(rng)] = vehicle
+
+    return {"companies": companies, "wash_items": catalog_to_storage(catalog)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sample_data", description="產生測試用的洗車紀錄資料")
+    parser.add_argument("count", type=int, help="紀錄筆數")
+    parser.add_argument("path", help="輸出的 JSON 檔案（可作為 json 儲存後端使用）")
+    parser.add_argument("--seed", type=int, default=0, help="亂數種子，相同種子產生相同資料")
+    args = parser.parse_args(argv)
+
+    data = generate_data(args.count, args.seed)
+    with open(args.path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    print(f"已產生 {len(data['companies'])} 間公司、{args.count} 筆紀錄到 {args.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# search_index.py
+from collections import defaultdict
+
+
+def ngrams(text, n):
+    """取出文字中所有長度為 n 的連續字元"""
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class NGramIndex:
+    """字元 n-gram 反向索引
+
+    中文沒有空白可以斷詞，因此以單字及雙字（bigram）建立索引。查詢時先取
+    查詢字串各 bigram 的 posting list 交集，再對少量候選文件確認子字串，
+    結果與逐筆 `query in text` 相同，但不需要掃描全部紀錄。
+    文件的各欄位以換行分隔，n-gram 不跨欄位（搜尋框無法輸入換行）。
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(set)  # gram -> {doc_id}
+        self.documents = {}  # doc_id -> 正規化後的文字
+        self.version = 0  # 每次增刪文件都會遞增，供快取判斷是否過期
+        # 上一次的查詢結果，逐字輸入時新的查詢包含上一次的查詢，只需從上次的結果中篩選
+        self.last_query = None
+        self.last_result = None
+        self.last_version = None
+
+    @staticmethod
+    def normalize(text):
+        return text.lower()
+
+    @staticmethod
+    def grams_of(text):
+        grams = set()
+        for field in text.split("\n"):
+            grams |= ngrams(field, 1)
+            grams |= ngrams(field, 2)
+        return grams
+
+    def add(self, doc_id, text):
+        """加入或更新一份文件"""
+        if doc_id in self.documents:
+            self.remove(doc_id)
+        text = self.normalize(text)
+        self.documents[doc_id] = text
+        for gram in self.grams_of(text):
+            self.postings[gram].add(doc_id)
+        self.version += 1
+
+    def add_many(self, documents):
+        """一次加入大量新文件（載入資料時使用），documents 為 (doc_id, text)
+
+        公司名稱、車牌、服務項目等欄位在許多紀錄中重複，先依欄位內容分組，
+        每個不同的欄位只取一次 n-gram，再整批併入 posting list。
+        """
+        field_docs = defaultdict(list)  # 欄位內容 -> [doc_id]
+        for doc_id, text in documents:
+            if doc_id in self.documents:
+                self.remove(doc_id)
+            text = self.normalize(text)
+            self.documents[doc_id] = text
+            for field in set(text.split("\n")):
+                field_docs[field].append(doc_id)
+        for field, doc_ids in field_docs.items():
+            for gram in ngrams(field, 1) | ngrams(field, 2):
+                self.postings[gram].update(doc_ids)
+        self.version += 1
+
+    def remove(self, doc_id):
+        """移除一份文件"""
+        text = self.documents.pop(doc_id, None)
+        if text is None:
+            return
+        for gram in self.grams_of(text):
+            posting = self.postings.get(gram)
+            if posting is not None:
+                posting.discard(doc_id)
+                if not posting:
+                    del self.postings[gram]
+        self.version += 1
+
+    def clear(self):
+        self.postings.clear()
+        self.documents.clear()
+        self.version += 1
+
+    def search(self, query):
+        """回傳包含 query 子字串的文件 ID 集合"""
+        query = self.normalize(query)
+        if not query:
+            return set(self.documents)
+        if "\n" in query:
+            return {doc_id for doc_id, text in self.documents.items() if query in text}
+        grams = ngrams(query, 2) if len(query) >= 2 else {query}
+        postings = [self.postings.get(gram, set()) for gram in grams]
+        extends_last = (self.last_version == self.version and self.last_query is not None
+                        and self.last_query in query)
+        if extends_last:
+            postings.append(self.last_result)
+        # 由最小的 posting list 開始交集，候選數量一路遞減
+        postings.sort(key=len)
+        if not postings[0]:
+            result = set()
+        else:
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates &= posting
+                if not candidates:
+                    break
+            if len(query) <= 2 or not candidates:
+                result = candidates
+            else:
+                # bigram 都出現不代表順序相同，需確認子字串
+                result = {doc_id for doc_id in candidates if query in self.documents[doc_id]}
+        self.last_query, self.last_result, self.last_version = query, result, self.version
+        return result
@@ -0,0 +1,49 @@
+# startup_timer.py
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """記錄啟動各階段的耗時
+
+    以 --startup-report 參數或 RECORD_SYSTEM_STARTUP_REPORT 環境變數啟動時，
+    背景同步完成後會印出報告。
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []  # (名稱, 開始時間, 耗時)，時間皆相對於 started，單位秒
+        self.enabled = ("--startup-report" in sys.argv
+                        or bool(os.environ.get("RECORD_SYSTEM_STARTUP_REPORT")))
+
+    def add(self, name, start, end=None):
+        """記錄一個階段，start/end 為 time.perf_counter() 的值"""
+        end = time.perf_counter() if end is None else end
+        self.phases.append((name, start - self.started, end - start))
+
+    def mark(self, name):
+        """記錄某個時間點（耗時即為啟動到現在的時間）"""
+        self.add(name, self.started)
+
+    @contextmanager
+    def measure(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start)
+
+    def report(self):
+        lines = ["啟動時間報告："]
+        for name, offset, duration in self.phases:
+            lines.append(f"  {name:<16}{duration * 1000:8.1f} ms（開始於 {offset * 1000:.1f} ms）")
+        return "\n".join(lines)
+
+    def print_report(self):
+        if self.enabled:
+            print(self.report())
+
+
+startup = StartupTimer()
@@ -0,0 +1,571 @@
+# storage.py
+"""資料儲存後端
+
+Database 只透過 StorageBackend 的介面存取資料，可依設定選擇：
+    firebase  Firebase Realtime Database（預設）
+    sqlite    本機 SQLite 檔案，單機使用不需要網路
+    json      本機 JSON 檔案（與 Firebase 匯出的格式相同）
+    memory    只存在記憶體中，測試及效能量測用
+
+設定方式（優先順序由高到低）：
+    1. RECORD_SYSTEM_STORAGE 環境變數，例如 "sqlite"、"json:D:/data/records.json"、"memory"
+    2. 資料目錄下的 config.json：{"storage": {"backend": "sqlite", "path": "..."}}
+    3. 預設使用 Firebase
+"""
+import copy
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from collections import namedtuple
+from app_paths import get_data_dir
+from change_tracker import assoc_path, get_path_value
+from local_cache import subtree_of
+from metrics import metrics, payload_size
+
+DEFAULT_DATABASE_URL = 'https://record-system-aa15c-default-rtdb.firebaseio.com'
+
+# 與 firebase_admin 的監聽事件相同的欄位：event_type 為 put 或 patch，path 相對於監聽的路徑
+StorageEvent = namedtuple("StorageEvent", "event_type path data")
+
+
+def split_path(path):
+    return [part for part in (path or "").split("/") if part]
+
+
+def shallow_of(value):
+    """shallow 查詢的結果：基本型別直接回傳，物件以 True 代替"""
+    if isinstance(value, list):
+        value = {str(index): child for index, child in enumerate(value) if child is not None}
+    if isinstance(value, dict):
+        return {key: True if isinstance(child, (dict, list)) else child
+                for key, child in value.items()}
+    return value
+
+
+def prune(value):
+    """與 Firebase 相同，空的物件不會被儲存"""
+    if isinstance(value, dict):
+        pruned = {}
+        for key, child in value.items():
+            child = prune(child)
+            if child is not None:
+                pruned[key] = child
+        return pruned or None
+    if isinstance(value, list):
+        return value if any(child is not None for child in value) else None
+    return value
+
+
+def split_units(tree):
+    """將整棵資料樹拆成 {單位: 資料}：每間公司一筆，其餘最上層節點各一筆"""
+    units = {}
+    for key, child in (tree or {}).items():
+        if key == "companies":
+            for company_id, company in (child or {}).items():
+                units[f"companies/{company_id}"] = company
+        else:
+            units[key] = child
+    return units
+
+
+def join_units(units):
+    """split_units 的反向操作"""
+    tree = {}
+    for unit, value in units:
+        if value is None:
+            continue
+        if unit.startswith("companies/"):
+            tree.setdefault("companies", {})[unit.split("/", 1)[1]] = value
+        else:
+            tree[unit] = value
+    return tree
+
+
+def units_of(data):
+    return {unit: value for unit, value in split_units(prune(data)).items() if value is not None}
+
+
+def etag_of(value):
+    content = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return hashlib.md5(content.encode("utf-8")).hexdigest()
+
+
+def resolved_path(path):
+    """檔案的完整路徑，同一個檔案的不同寫法（相對路徑、大小寫）得到相同結果"""
+    return os.path.normcase(os.path.realpath(path))
+
+
+class StorageBackend:
+    """資料儲存後端的介面
+
+    路徑以 "/" 分隔（例如 "companies/<id>/vehicles"），空字串代表整棵樹。
+    寫入的值為 None 代表刪除。listen 的 callback 在背景執行緒中呼叫。
+    """
+
+    name = None
+
+    def local_path(self, filename):
+        """本地副本（LocalCache）及待上傳佇列（WriteQueue）的檔案位置
+
+        依後端及資料來源（source()）分開，切換後端或檔案時不會混用。
+        """
+        base, extension = os.path.splitext(filename)
+        suffix = self.name
+        source = self.source()
+        if source:
+            suffix += "-" + hashlib.sha1(source.encode("utf-8")).hexdigest()[:8]
+        return os.path.join(get_data_dir(), f"{base}.{suffix}{extension}")
+
+    def source(self):
+        """資料來源的識別（檔案的完整路徑或資料庫網址），None 代表只依後端區分"""
+        return None
+
+    def connect(self):
+        """建立連線（只會在第一次需要存取資料時呼叫）"""
+
+    def close(self):
+        """釋放資源"""
+
+    def get(self, path="", shallow=False):
+        """取得路徑下的資料，shallow 時只回傳一層"""
+        raise NotImplementedError
+
+    def get_with_etag(self, path):
+        """回傳 (資料, etag)"""
+        raise NotImplementedError
+
+    def get_if_changed(self, path, etag):
+        """etag 相同時不回傳資料，回傳 (是否變更, 資料, etag)"""
+        raise NotImplementedError
+
+    def update(self, updates):
+        """多路徑更新 {路徑: 資料}，同一次呼叫的寫入一起成功或失敗"""
+        raise NotImplementedError
+
+    def delete(self, path):
+        self.update({path: None})
+
+    def transaction(self, path, update_function):
+        """以目前的資料呼叫 update_function(current)，將回傳值寫回並回傳
+
+        與 Firebase 相同：回傳值不可為 None（不能以 transaction 刪除），
+        update_function 拋出的例外會中止 transaction 並傳給呼叫端。
+        """
+        raise NotImplementedError
+
+    def listen(self, path, callback):
+        """監聽路徑的變更，callback(event) 的 event 帶有 event_type、path、data；
+        回傳的物件可呼叫 close() 停止監聽"""
+        raise NotImplementedError
+
+
+class FirebaseBackend(StorageBackend):
+    """Firebase Realtime Database"""
+
+    def __init__(self, database_url=None, credentials=None):
+        self.database_url = database_url or DEFAULT_DATABASE_URL
+        self.credentials = credentials
+        self.root = None
+
+    name = "firebase"
+
+    def local_path(self, filename):
+        if self.database_url == DEFAULT_DATABASE_URL:
+            # 沿用原本的檔名，已安裝的電腦不需要重新下載
+            return os.path.join(get_data_dir(), filename)
+        return super().local_path(filename)
+
+    def source(self):
+        return self.database_url.rstrip("/")
+
+    def connect(self):
+        import firebase_admin
+        from firebase_admin import credentials, db
+
+        # 檢查是否已經初始化
+        if not firebase_admin._apps:
+            try:
+                key_path = self.credentials
+                if not key_path:
+                    if getattr(sys, 'frozen', False):
+                        # 如果是打包後的執行檔
+                        application_path = sys._MEIPASS
+                    else:
+                        # 如果是直接執行 Python 檔案
+                        application_path = os.path.dirname(os.path.abspath(__file__))
+                    key_path = os.path.join(application_path, 'firebase-key.json')
+                cred = credentials.Certificate(key_path)
+                firebase_admin.initialize_app(cred, {'databaseURL': self.database_url})
+            except Exception as e:
+                print(f"Firebase 初始化失敗：{e}")
+                raise
+        self.root = db.reference()
+
+    def _ref(self, path):
+        return self.root.child(path) if split_path(path) else self.root
+
+    def get(self, path="", shallow=False):
+        return self._ref(path).get(shallow=shallow)
+
+    def get_with_etag(self, path):
+        return self._ref(path).get(etag=True)
+
+    def get_if_changed(self, path, etag):
+        return self._ref(path).get_if_changed(etag)
+
+    def update(self, updates):
+        self.root.update(updates)
+
+    def delete(self, path):
+        self._ref(path).delete()
+
+    def transaction(self, path, update_function):
+        return self._ref(path).transaction(update_function)
+
+    def listen(self, path, callback):
+        return self._ref(path).listen(callback)
+
+
+class Registration:
+    def __init__(self, backend, path, callback):
+        self.backend = backend
+        self.path = path
+        self.callback = callback
+
+    def close(self):
+        self.backend._remove_listener(self)
+
+
+class LocalBackend(StorageBackend):
+    """本機後端的共用實作
+
+    以「公司」及其他最上層節點為單位（與 LocalCache 相同）讀寫，子類別只需
+    實作單位的載入與儲存。監聽事件由背景執行緒依序送出，與 Firebase 相同。
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.listeners = []
+        self.events = queue.Queue()
+        self.dispatcher = None
+
+    # 子類別實作 -------------------------------------------------------
+
+    def _load_unit(self, unit):
+        """回傳單位的資料（呼叫端可以修改），不存在時回傳 None"""
+        raise NotImplementedError
+
+    def _unit_names(self):
+        raise NotImplementedError
+
+    def _save_units(self, units):
+        """儲存 {單位: 資料}，資料為 None 代表刪除"""
+        raise NotImplementedError
+
+    # 讀取 ------------------------------------------------------------
+
+    def _read(self, path):
+        parts = split_path(path)
+        if not parts or parts == ["companies"]:
+            tree = join_units((unit, self._load_unit(unit)) for unit in self._unit_names())
+            return tree.get("companies") if parts else (tree or None)
+        unit = subtree_of("/".join(parts))
+        value = self._load_unit(unit)
+        rest = parts[len(split_path(unit)):]
+        return get_path_value(value, "/".join(rest)) if rest else value
+
+    def get(self, path="", shallow=False):
+        with self.lock:
+            value = self._read(path)
+        return shallow_of(value) if shallow else value
+
+    def get_with_etag(self, path):
+        value = self.get(path)
+        return value, etag_of(value)
+
+    def get_if_changed(self, path, etag):
+        value, new_etag = self.get_with_etag(path)
+        if new_etag == etag:
+            return False, None, etag
+        return True, value, new_etag
+
+    # 寫入 ------------------------------------------------------------
+
+    def update(self, updates):
+        with self.lock:
+            self._write(updates)
+
+    def transaction(self, path, update_function):
+        with self.lock:
+            current = self._read(path)
+            value = update_function(copy.deepcopy(current))
+            if value is None:
+                raise ValueError("Value must not be none.")
+            if value != current:
+                self._write({path: value})
+            return value
+
+    def _write(self, updates):
+        # 依單位分組，每個單位只載入一次
+        units = {}
+        for path, value in updates.items():
+            value = prune(copy.deepcopy(value))
+            parts = split_path(path)
+            if not parts or parts == ["companies"]:
+                for unit in set(self._unit_names()) | set(units):
+                    if not parts or unit.startswith("companies/"):
+                        units[unit] = None
+                units.update(split_units({"companies": value} if parts else value))
+                continue
+            unit = subtree_of("/".join(parts))
+            if unit not in units:
+                units[unit] = self._load_unit(unit)
+            rest = parts[len(split_path(unit)):]
+            units[unit] = prune(assoc_path(units[unit], rest, value))
+        self._save_units(units)
+        self._notify(updates)
+
+    # 監聽 ------------------------------------------------------------
+
+    def listen(self, path, callback):
+        registration = Registration(self, "/".join(split_path(path)), callback)
+        with self.lock:
+            self.listeners.append(registration)
+            self._dispatch(registration, StorageEvent("put", "/", self._read(path)))
+        return registration
+
+    def _remove_listener(self, registration):
+        with self.lock:
+            if registration in self.listeners:
+                self.listeners.remove(registration)
+
+    def _notify(self, updates):
+        for registration in self.listeners:
+            base = registration.path
+            for path, value in updates.items():
+                path = "/".join(split_path(path))
+                if base == "" or path == base or path.startswith(base + "/"):
+                    relative = path[len(base):].strip("/")
+                    self._dispatch(registration, StorageEvent("put", "/" + relative, prune(copy.deepcopy(value))))
+                elif path == "" or base.startswith(path + "/"):
+                    self._dispatch(registration, StorageEvent("put", "/", self._read(base)))
+
+    def _dispatch(self, registration, event):
+        if self.dispatcher is None:
+            self.dispatcher = threading.Thread(target=self._run_dispatcher, daemon=True)
+            self.dispatcher.start()
+        self.events.put((registration, event))
+
+    def _run_dispatcher(self):
+        while True:
+            registration, event = self.events.get()
+            if registration not in self.listeners:
+                continue
+            try:
+                registration.callback(event)
+            except Exception as e:
+                print(f"處理資料變更事件失敗：{e}")
+
+
+class MemoryBackend(LocalBackend):
+    """只存在記憶體中的資料，可傳入初始資料"""
+
+    name = "memory"
+
+    def __init__(self, data=None):
+        super().__init__()
+        self.units = units_of(data)
+
+    def local_path(self, filename):
+        return ":memory:"
+
+    def _load_unit(self, unit):
+        return copy.deepcopy(self.units.get(unit))
+
+    def _unit_names(self):
+        return list(self.units)
+
+    def _save_units(self, units):
+        for unit, value in units.items():
+            if value is None:
+                self.units.pop(unit, None)
+            else:
+                self.units[unit] = value
+
+
+class JsonFileBackend(MemoryBackend):
+    """整棵資料樹存在一個 JSON 檔案中，每次寫入後整個檔案重寫"""
+
+    name = "json"
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def connect(self):
+        data = None
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        with self.lock:
+            self.units = units_of(data)
+
+    def local_path(self, filename):
+        return StorageBackend.local_path(self, filename)
+
+    def source(self):
+        return resolved_path(self.path)
+
+    def _save_units(self, units):
+        super()._save_units(units)
+        if not units:
+            return
+        tree = join_units(self.units.items())
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # 先寫入暫存檔再取代，寫到一半中斷也不會破壞原本的檔案
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(tree, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+
+class SqliteBackend(LocalBackend):
+    """本機 SQLite 檔案，每間公司（及其他最上層節點）一筆"""
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.conn = None
+
+    def source(self):
+        return resolved_path(self.path)
+
+    def connect(self):
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS nodes (path TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def _load_unit(self, unit):
+        row = self.conn.execute("SELECT value FROM nodes WHERE path = ?", (unit,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _unit_names(self):
+        return [row[0] for row in self.conn.execute("SELECT path FROM nodes")]
+
+    def _save_units(self, units):
+        with self.conn:
+            for unit, value in units.items():
+                if value is None:
+                    self.conn.execute("DELETE FROM nodes WHERE path = ?", (unit,))
+                else:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO nodes (path, value) VALUES (?, ?)",
+                        (unit, json.dumps(value, ensure_ascii=False))
+                    )
+
+
+class MeasuredStorage(StorageBackend):
+    """記錄每次存取的耗時及傳送/接收的資料量（啟用 metrics 時由 Database 包裝）"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+
+    def local_path(self, filename):
+        return self.backend.local_path(filename)
+
+    def connect(self):
+        with metrics.span("storage.connect"):
+            self.backend.connect()
+
+    def close(self):
+        self.backend.close()
+
+    def get(self, path="", shallow=False):
+        with metrics.span("storage.get_shallow" if shallow else "storage.get") as span:
+            value = self.backend.get(path, shallow)
+            span.add("bytes_received", payload_size(value))
+        return value
+
+    def get_with_etag(self, path):
+        with metrics.span("storage.get") as span:
+            value, etag = self.backend.get_with_etag(path)
+            span.add("bytes_received", payload_size(value))
+        return value, etag
+
+    def get_if_changed(self, path, etag):
+        with metrics.span("storage.get_if_changed") as span:
+            changed, value, etag = self.backend.get_if_changed(path, etag)
+            span.add("bytes_received", payload_size(value))
+        return changed, value, etag
+
+    def update(self, updates):
+        with metrics.span("storage.update") as span:
+            span.add("bytes_sent", payload_size(updates))
+            self.backend.update(updates)
+
+    def transaction(self, path, update_function):
+        with metrics.span("storage.transaction") as span:
+            value = self.backend.transaction(path, update_function)
+            span.add("bytes_sent", payload_size(value))
+        return value
+
+    def listen(self, path, callback):
+        def measured(event):
+            metrics.increment("storage.listen_event", "bytes_received", payload_size(event.data))
+            callback(event)
+        return self.backend.listen(path, measured)
+
+
+def parse_storage_spec(spec):
+    """將 "sqlite"、"json:路徑" 之類的字串轉為設定"""
+    backend, _, path = spec.partition(":")
+    config = {"backend": backend.strip().lower()}
+    if path:
+        config["path"] = path
+    return config
+
+
+def load_storage_config():
+    spec = os.environ.get("RECORD_SYSTEM_STORAGE")
+    if spec:
+        return parse_storage_spec(spec)
+    config_path = os.path.join(get_data_dir(), "config.json")
+    if os.path.exists(config_path):
+        try:
+            with open(config_path, encoding="utf-8") as f:
+                return json.load(f).get("storage") or {}
+        except (OSError, ValueError) as e:
+            print(f"讀取設定檔失敗：{e}")
+    return {}
+
+
+def create_storage(config=None):
+    """依設定建立儲存後端，config 為 None 時讀取環境變數或設定檔"""
+    if config is None:
+        config = load_storage_config()
+    backend = config.get("backend") or "firebase"
+    if backend == "firebase":
+        return FirebaseBackend(config.get("database_url"), config.get("credentials"))
+    if backend == "sqlite":
+        return SqliteBackend(config.get("path") or os.path.join(get_data_dir(), "records.db"))
+    if backend == "json":
+        return JsonFileBackend(config.get("path") or os.path.join(get_data_dir(), "washing_records.json"))
+    if backend == "memory":
+        return MemoryBackend()
+    raise ValueError(f"不支援的儲存後端：{backend}")
@@ -0,0 +1,58 @@
+# subtree_cache.py
+import json
+import threading
+from collections import OrderedDict
+
+
+class SubtreeCache:
+    """已下載子樹的 LRU 快取，以位元組上限控制記憶體用量
+
+    內容以 JSON 字串保存：大小可以精確計算，每次取出都是新的物件，
+    呼叫端修改取出的資料不會影響快取。
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # path -> 編碼後的 JSON
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def __contains__(self, path):
+        with self.lock:
+            return path in self.entries
+
+    def get(self, path):
+        """取出快取的資料，不存在時回傳 None"""
+        with self.lock:
+            encoded = self.entries.get(path)
+            if encoded is None:
+                return None
+            self.entries.move_to_end(path)
+        return json.loads(encoded)
+
+    def put(self, path, value):
+        """放入資料，超過上限時淘汰最久未使用的子樹"""
+        encoded = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        with self.lock:
+            self._discard(path)
+            if len(encoded) > self.max_bytes:
+                return  # 單一子樹超過上限時不快取
+            self.entries[path] = encoded
+            self.size += len(encoded)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def discard(self, path):
+        with self.lock:
+            self._discard(path)
+
+    def _discard(self, path):
+        encoded = self.entries.pop(path, None)
+        if encoded is not None:
+            self.size -= len(encoded)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
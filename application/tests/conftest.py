@@ -0,0 +1,6 @@
+# conftest.py
+import os
+import sys
+
+# 程式以 application 目錄為工作目錄執行，模組之間以頂層名稱互相匯入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,55 @@
+# test_aggregates.py
+from datetime import date
+from aggregates import RecordAggregates, Totals, month_of, month_start, next_month
+
+JAN = date(2024, 1, 15).toordinal()
+FEB = date(2024, 2, 3).toordinal()
+
+
+def test_month_helpers():
+    assert month_of(JAN) == 202401
+    assert month_of(0) is None
+    assert month_start(202402) == date(2024, 2, 1).toordinal()
+    assert next_month(202412) == 202501
+    assert next_month(202401) == 202402
+
+
+def test_totals_add_and_merge():
+    totals = Totals()
+    totals.add(100, 1)
+    totals.add(12.5, 2)
+    other = Totals()
+    other.add(50, 2)
+    totals.merge(other)
+    assert (totals.count, totals.amount, totals.by_payment) == (3, 162.5, [0, 100, 62.5])
+
+
+def test_aggregates_group_by_company_vehicle_month_and_payment():
+    aggregates = RecordAggregates()
+    aggregates.add(100, 0, 0, JAN, 1)
+    aggregates.add(200, 0, 1, FEB, 2)
+    aggregates.add(300, 1, 2, FEB, 2)
+    assert aggregates.get("all").amount == 600
+    assert aggregates.get("company", 0).amount == 300
+    assert aggregates.get("vehicle", 2).amount == 300
+    assert aggregates.get("month", 202402).amount == 500
+    assert aggregates.get("company_month", 0, 202401).amount == 100
+    assert aggregates.get("vehicle_month", 1, 202402).count == 1
+    assert aggregates.get("payment", 2).amount == 500
+
+
+def test_aggregates_remove_drops_empty_groups():
+    aggregates = RecordAggregates()
+    aggregates.add(100, 0, 0, JAN, 1)
+    aggregates.add(50, 0, 0, FEB, 1)
+    aggregates.remove(100, 0, 0, JAN, 1)
+    assert ("month", 202401) not in aggregates.groups
+    assert aggregates.get("month", 202401).count == 0
+    assert aggregates.get("company", 0).amount == 50
+
+
+def test_records_without_date_have_no_month_group():
+    aggregates = RecordAggregates()
+    aggregates.add(100, 0, 0, 0, 0)
+    assert aggregates.get("all").amount == 100
+    assert not any(key[0] == "month" for key in aggregates.groups)
@@ -0,0 +1,72 @@
+# test_change_stream.py
+from change_stream import ChangeEvent, diff_company, diff_vehicle
+
+
+def vehicle(plate="AAA-111", **records):
+    return {"plate": plate, "type": "水泥車", "records": records}
+
+
+def record(record_id, remarks=""):
+    return {"id": record_id, "date": "2024-01-05", "items": [], "remarks": remarks}
+
+
+def diff(function, *args):
+    events = []
+    function(*args, events)
+    return events
+
+
+def test_diff_vehicle_reports_record_changes():
+    before = vehicle(r1=record("r1"), r2=record("r2"))
+    after = vehicle(r1=record("r1", "改"), r3=record("r3"))
+    events = diff(diff_vehicle, "c1", "v1", before, after)
+    assert events == [
+        ChangeEvent("update", "record", "c1", "v1", "r1", record("r1", "改")),
+        ChangeEvent("insert", "record", "c1", "v1", "r3", record("r3")),
+        ChangeEvent("delete", "record", "c1", "v1", "r2", None),
+    ]
+
+
+def test_diff_vehicle_reports_fields_without_records():
+    events = diff(diff_vehicle, "c1", "v1", vehicle(r1=record("r1")), vehicle("BBB-222", r1=record("r1")))
+    assert events == [
+        ChangeEvent("update", "vehicle", "c1", "v1", None, {"plate": "BBB-222", "type": "水泥車"}),
+    ]
+    assert diff(diff_vehicle, "c1", "v1", vehicle(), vehicle()) == []
+
+
+def test_diff_vehicle_insert_and_delete():
+    events = diff(diff_vehicle, "c1", "v1", None, vehicle(r1=record("r1")))
+    assert [(event.kind, event.level) for event in events] == [("insert", "vehicle"), ("insert", "record")]
+    events = diff(diff_vehicle, "c1", "v1", vehicle(r1=record("r1")), None)
+    # 紀錄先刪除，最後才刪除車輛
+    assert [(event.kind, event.level) for event in events] == [("delete", "record"), ("delete", "vehicle")]
+
+
+def test_diff_vehicle_requests_migration_of_list_records():
+    # 網頁版以陣列寫回的紀錄
+    after = {"plate": "AAA-111", "type": "水泥車", "records": [record("r1")]}
+    events = diff(diff_vehicle, "c1", "v1", vehicle(r1=record("r1")), after)
+    assert events == [ChangeEvent("update", "migrate", "c1", "v1", None, None)]
+
+
+def test_diff_company_only_compares_changed_vehicles():
+    shared = vehicle(r1=record("r1"))
+    before = {"name": "甲公司", "vehicles": {"v1": shared, "v2": vehicle(r2=record("r2"))}}
+    after = {"name": "甲公司改", "vehicles": {"v1": shared, "v3": vehicle("CCC-333")}}
+    events = diff(diff_company, "c1", before, after)
+    assert [(event.kind, event.level, event.vehicle_id) for event in events] == [
+        ("update", "company", None),
+        ("insert", "vehicle", "v3"),
+        ("delete", "record", "v2"),
+        ("delete", "vehicle", "v2"),
+    ]
+    assert events[0].value == {"name": "甲公司改"}
+
+
+def test_diff_company_delete():
+    before = {"name": "甲公司", "vehicles": {"v1": vehicle(r1=record("r1"))}}
+    events = diff(diff_company, "c1", before, None)
+    assert [(event.kind, event.level) for event in events] == [
+        ("delete", "record"), ("delete", "vehicle"), ("delete", "company"),
+    ]
@@ -0,0 +1,32 @@
+# test_record_query.py
+from record_query import RecordQuery
+from record_store import RecordStore
+from test_record_store import company, record, vehicle
+
+
+def many_records_store():
+    # 只有少數紀錄符合搜尋時以二分搜尋定位，多數符合時逐列檢查
+    records = [record(f"r{index:03}", f"2024-01-{index % 28 + 1:02}", 100, timestamp=index)
+               for index in range(200)]
+    records[5]["remarks"] = "特殊備註"
+    records[150]["remarks"] = "特殊備註"
+    store = RecordStore()
+    store.load({"companies": {"c1": company("甲公司", {"v1": vehicle("AAA-111", records)})}})
+    return store
+
+
+def brute_force(store, query):
+    query.bind(store)
+    return [position for position in range(len(store)) if query.accepts(position)]
+
+
+def test_positions_and_subtotal_match_row_scan():
+    store = many_records_store()
+    for search_text in ("特殊", "甲公司", "不存在"):
+        query = RecordQuery(search_text=search_text)
+        expected = brute_force(store, query)
+        assert query.positions(store) == expected
+        subtotal = query.subtotal(store)
+        assert subtotal.count == len(expected)
+        assert subtotal.amount == sum(store.totals[position] for position in expected)
+    assert len(RecordQuery(search_text="特殊").positions(store)) == 2
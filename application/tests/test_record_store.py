@@ -0,0 +1,146 @@
+# test_record_store.py
+from datetime import date
+from record_store import RecordStore, PAYMENT_TYPE_CODES
+
+
+def ordinal(day):
+    return date.fromisoformat(day).toordinal()
+
+
+def record(record_id, day, *prices, payment_type="receivable", timestamp=0):
+    return {
+        "id": record_id,
+        "date": day,
+        "timestamp": timestamp,
+        "payment_type": payment_type,
+        "items": [{"name": f"項目{index}", "price": price} for index, price in enumerate(prices)],
+        "remarks": "",
+    }
+
+
+def company(name, vehicles):
+    return {"name": name, "vehicles": vehicles}
+
+
+def vehicle(plate, records):
+    return {"plate": plate, "type": "水泥車", "records": {r["id"]: r for r in records}}
+
+
+def sample_data():
+    return {"companies": {
+        "c1": company("甲公司", {
+            "v1": vehicle("AAA-111", [
+                record("r1", "2024-01-05", 100, 50),
+                record("r3", "2024-02-10", 200, payment_type="payable"),
+            ]),
+        }),
+        "c2": company("乙公司", {
+            "v2": vehicle("BBB-222", [
+                record("r2", "2024-01-20", 300),
+                record("r4", "2024-03-01", 400),
+            ]),
+        }),
+    }}
+
+
+def test_load_sorts_rows_by_date():
+    store = RecordStore()
+    store.load(sample_data())
+    assert store.ids == ["r1", "r2", "r3", "r4"]
+    assert store.totals == [150, 300, 200, 400]
+    assert store.company_name(1) == "乙公司"
+    assert store.plate(2) == "AAA-111"
+    assert store.payment_type(2) == "payable"
+
+
+def test_load_accepts_fractional_prices():
+    # 網頁版以 parseFloat 寫入價格
+    data = {"companies": {"c1": company("甲公司", {
+        "v1": vehicle("AAA-111", [record("r1", "2024-01-05", 12.5), record("r2", "2024-01-06", 10, 0.25)]),
+    })}}
+    store = RecordStore()
+    store.load(data)
+    assert store.totals == [12.5, 10.25]
+    assert store.subtotal().amount == 22.75
+    assert store.record_at(0)["total_amount"] == 12.5
+    assert store.snapshot().totals == [12.5, 10.25]
+
+
+def test_add_and_remove_keep_order_and_totals():
+    store = RecordStore()
+    data = sample_data()
+    store.load(data)
+    c1 = data["companies"]["c1"]
+    position = store.add("c1", c1, "v1", c1["vehicles"]["v1"], record("r5", "2024-01-10", 7.5))
+    assert position == 1
+    assert store.ids == ["r1", "r5", "r2", "r3", "r4"]
+    assert store.subtotal().amount == 1057.5
+    assert store.position_of("r5") == 1
+
+    assert store.remove("r5") == 1
+    assert store.position_of("r5") is None
+    assert store.remove("r5") is None
+    assert store.ids == ["r1", "r2", "r3", "r4"]
+    assert store.subtotal().amount == 1050
+    assert store.vehicle_date_range("v1") == ["r1", "r3"]
+
+
+def test_add_appends_later_dates_and_reuses_given_key():
+    store = RecordStore()
+    data = sample_data()
+    store.load(data)
+    c1 = data["companies"]["c1"]
+    late = record("r6", "2024-05-01", 10)
+    key = RecordStore.sort_key(late)
+    assert store.insert_position(late, key) == len(store)
+    assert store.add("c1", c1, "v1", c1["vehicles"]["v1"], late, key) == 4
+    assert store.ids[-1] == "r6"
+    assert store.date_ordinals[-1] == ordinal("2024-05-01")
+
+    early = record("r7", "2023-12-31", 10)
+    assert store.add("c1", c1, "v1", c1["vehicles"]["v1"], early) == 0
+    assert store.position_of("r7") == 0
+
+
+def test_subtotal_by_scope_and_date_range():
+    store = RecordStore()
+    store.load(sample_data())
+    c1 = store.companies.find("c1")
+    v2 = store.vehicles.find("v2")
+
+    totals = store.subtotal()
+    assert (totals.count, totals.amount) == (4, 1050)
+    assert totals.by_payment[PAYMENT_TYPE_CODES["payable"]] == 200
+    assert store.subtotal(company_code=c1).amount == 350
+    assert store.subtotal(vehicle_code=v2).amount == 700
+    # 車輛不屬於該公司
+    assert store.subtotal(company_code=c1, vehicle_code=v2).count == 0
+
+    # 整個一月取月份累計，二月只有部分日期逐列加總
+    totals = store.subtotal(start_ordinal=ordinal("2024-01-01"), end_ordinal=ordinal("2024-02-15"))
+    assert (totals.count, totals.amount) == (3, 650)
+    totals = store.subtotal(company_code=c1, start_ordinal=ordinal("2024-01-06"))
+    assert (totals.count, totals.amount) == (1, 200)
+    assert store.subtotal(start_ordinal=ordinal("2025-01-01")).count == 0
+
+
+def test_search_index_follows_add_and_remove():
+    store = RecordStore()
+    data = sample_data()
+    store.load(data)
+    assert store.search_index.search("乙公司") == {"r2", "r4"}
+    store.remove("r2")
+    assert store.search_index.search("乙公司") == {"r4"}
+
+
+def test_subtotal_matches_row_sums():
+    store = RecordStore()
+    store.load(sample_data())
+    start, end = ordinal("2024-01-10"), ordinal("2024-02-28")
+    for company_code in (None, 0, 1):
+        totals = store.subtotal(company_code=company_code, start_ordinal=start, end_ordinal=end)
+        rows = [position for position in range(len(store))
+                if start <= store.date_ordinals[position] <= end
+                and company_code in (None, store.company_codes[position])]
+        assert totals.count == len(rows)
+        assert totals.amount == sum(store.totals[position] for position in rows)
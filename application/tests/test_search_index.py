@@ -0,0 +1,44 @@
+# test_search_index.py
+from search_index import NGramIndex
+
+
+DOCUMENTS = {
+    "d1": "應收\n2024-01-05\n甲公司\nAAA-111\n攪拌桶清洗",
+    "d2": "應付\n2024-01-06\n乙公司\nBBB-222\n車身清洗",
+    "d3": "應收\n2024-01-07\n甲公司\nAAB-333\n攪拌機保養",
+}
+
+
+def brute_force(query):
+    query = query.lower()
+    return {doc_id for doc_id, text in DOCUMENTS.items() if query in text.lower()}
+
+
+def test_add_many_matches_incremental_adds():
+    bulk = NGramIndex()
+    bulk.add_many(DOCUMENTS.items())
+    incremental = NGramIndex()
+    for doc_id, text in DOCUMENTS.items():
+        incremental.add(doc_id, text)
+    assert bulk.documents == incremental.documents
+    assert dict(bulk.postings) == dict(incremental.postings)
+
+
+def test_search_matches_substring_scan():
+    index = NGramIndex()
+    index.add_many(DOCUMENTS.items())
+    for query in ("甲", "甲公司", "aa", "AAB-3", "清洗", "攪拌桶", "桶清洗", "2024-01", "無此字", "司\n"):
+        assert index.search(query) == brute_force(query), query
+
+
+def test_extended_query_reuses_last_result_until_index_changes():
+    index = NGramIndex()
+    index.add_many(DOCUMENTS.items())
+    assert index.search("攪拌") == {"d1", "d3"}
+    assert index.search("攪拌桶") == {"d1"}
+    index.add("d4", "攪拌桶清洗")
+    assert index.search("攪拌桶清") == {"d1", "d4"}
+    index.remove("d1")
+    assert index.search("攪拌桶清洗") == {"d4"}
+    # 縮短查詢不能沿用較長查詢的結果
+    assert index.search("攪拌") == {"d3", "d4"}
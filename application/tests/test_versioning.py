@@ -0,0 +1,121 @@
+# test_versioning.py
+import pytest
+from storage import MemoryBackend
+from versioning import guard_of, merge_node, write_record, write_fields
+
+RECORD = "companies/c1/vehicles/v1/records/r1"
+
+
+def test_merge_node_keeps_remote_fields_and_reports_overwrites():
+    local = {"remarks": "本機", "date": "2024-01-05", "version": 3, "updated_at": 1}
+    remote = {"remarks": "遠端", "date": "2024-01-05", "payment_type": "payable", "version": 5, "updated_at": 2}
+    merged, overwritten = merge_node(local, remote, 6)
+    assert overwritten == ["remarks"]
+    assert merged["remarks"] == "本機"
+    assert merged["payment_type"] == "payable"
+    assert merged["version"] == 6
+    assert merged["updated_at"] > 2
+
+
+def test_merge_node_without_conflicting_fields():
+    merged, overwritten = merge_node({"remarks": "a"}, {"date": "2024-01-05", "version": 1}, 2)
+    assert overwritten == []
+    assert merged == {"remarks": "a", "date": "2024-01-05", "version": 2, "updated_at": merged["updated_at"]}
+
+
+def test_guard_of():
+    assert guard_of(f"{RECORD}/remarks") == RECORD
+    assert guard_of("companies/c1/vehicles/v1/plate") == "companies/c1/vehicles/v1"
+    assert guard_of("companies/c1/name") == "companies/c1"
+    assert guard_of("companies/c1/sort_index") is None
+    assert guard_of("companies/c1/vehicles/v1/records") is None
+    assert guard_of("wash_items") is None
+
+
+def test_write_record_returns_committed_version():
+    storage = MemoryBackend({"companies": {"c1": {"name": "甲公司", "vehicles": {"v1": {
+        "plate": "AAA-111", "records": {"r1": {"id": "r1", "remarks": "", "version": 2}}}}}}})
+    assert write_record(storage, RECORD, {"id": "r1", "remarks": "a"}, 2) == (True, 3)
+    # 以舊版本號寫入：合併後版本號仍然遞增
+    assert write_record(storage, RECORD, {"id": "r1", "remarks": "b"}, 2) == (True, 4)
+    assert storage.get(RECORD)["remarks"] == "b"
+    # 遠端已被修改時不刪除
+    assert write_record(storage, RECORD, None, 3) == (False, None)
+    assert write_record(storage, RECORD, None, 4) == (True, None)
+    assert storage.get(RECORD) is None
+
+
+def test_write_fields_returns_committed_version():
+    storage = MemoryBackend({"companies": {"c1": {"name": "甲公司", "version": 1}}})
+    assert write_fields(storage, "companies/c1", {"companies/c1/name": "乙公司"}, 1) == (True, 2)
+    assert write_fields(storage, "companies/c1", {"companies/c1/name": "丙公司"}, 2) == (True, 3)
+    assert storage.get("companies/c1") == {"name": "丙公司", "version": 3,
+                                           "updated_at": storage.get("companies/c1/updated_at")}
+
+
+class FakeClient:
+    """只處理 set_if_unchanged 送出的 PUT，資料存在 MemoryBackend"""
+
+    def __init__(self, memory):
+        self.memory = memory
+
+    def headers(self, method, url, json=None, headers=None):
+        self.memory.update({url[:-len(".json")]: json})
+        return {"ETag": "etag"}
+
+
+def firebase_storage(data):
+    """以 firebase_admin 的 Reference.transaction 執行的 FirebaseBackend（不連線）"""
+    db = pytest.importorskip("firebase_admin.db")
+    from storage import FirebaseBackend
+
+    memory = MemoryBackend(data)
+
+    class FakeReference(db.Reference):
+        def child(self, path):
+            return FakeReference(client=self._client, segments=self._segments + path.split("/"))
+
+        def get(self, etag=False, shallow=False):
+            value = memory.get("/".join(self._segments))
+            return (value, "etag") if etag else value
+
+        def update(self, value):
+            memory.update(value)
+
+    storage = FirebaseBackend()
+    storage.root = FakeReference(client=FakeClient(memory), path="/")
+    return storage, memory
+
+
+def test_transaction_rejects_none_like_firebase():
+    storage = MemoryBackend({"companies": {"c1": {"name": "甲公司"}}})
+    with pytest.raises(ValueError):
+        storage.transaction("companies/c1", lambda current: None)
+    assert storage.get("companies/c1/name") == "甲公司"
+
+
+@pytest.mark.parametrize("backend", ["memory", "firebase"])
+def test_deletes_with_firebase_transaction_semantics(backend):
+    data = {"companies": {"c1": {"name": "甲公司", "version": 1, "vehicles": {
+        "v1": {"plate": "AAA-111", "version": 1, "records": {"r1": {"id": "r1", "version": 2}}},
+        "v2": {"plate": "BBB-222", "version": 1},
+    }}}}
+    if backend == "memory":
+        storage = memory = MemoryBackend(data)
+    else:
+        storage, memory = firebase_storage(data)
+
+    # 遠端已被修改：不刪除
+    assert write_record(storage, RECORD, None, 1) == (False, None)
+    assert write_record(storage, RECORD, None, 2) == (True, None)
+    assert memory.get(RECORD) is None
+    # 遠端已被刪除：不重新建立
+    assert write_record(storage, RECORD, {"id": "r1", "remarks": "a"}, 2) == (False, None)
+    assert memory.get(RECORD) is None
+
+    vehicle = "companies/c1/vehicles/v2"
+    assert write_fields(storage, vehicle, {vehicle: None}, 5) == (False, None)
+    assert write_fields(storage, vehicle, {vehicle: None}, 1) == (True, None)
+    assert memory.get(vehicle) is None
+    assert write_fields(storage, vehicle, {f"{vehicle}/plate": "CCC-333"}, 1) == (False, None)
+    assert memory.get(vehicle) is None
@@ -0,0 +1,122 @@
+# test_write_queue.py
+import time
+import pytest
+from storage import MemoryBackend
+from write_queue import WriteQueue, is_transient
+
+RECORD = "companies/c1/vehicles/v1/records/r1"
+
+
+@pytest.fixture
+def queue(tmp_path):
+    # 不呼叫 start()，寫入留在 journal 中
+    return WriteQueue(MemoryBackend(), str(tmp_path / "pending_writes.db"))
+
+
+def test_unguarded_writes_share_one_batch(queue):
+    queue.enqueue({"wash_items": {"a": {"name": "引擎清洗"}}})
+    queue.enqueue({"companies/c1/sort_index": 2})
+    queue.enqueue({"companies/c2/sort_index": 1})
+    seqs, updates, guard = queue._next_batch()
+    assert len(seqs) == 3
+    assert list(updates) == ["wash_items", "companies/c1/sort_index", "companies/c2/sort_index"]
+    assert guard is None
+
+
+def test_batches_stop_at_a_different_guard(queue):
+    queue.enqueue({"companies/c1/sort_index": 2})
+    queue.enqueue({f"{RECORD}/remarks": "a", f"{RECORD}/date": "2024-01-05"}, {f"{RECORD}/remarks": 3})
+    _, updates, guard = queue._next_batch()
+    assert list(updates) == ["companies/c1/sort_index"] and guard is None
+
+
+def test_guarded_writes_are_batched_per_node(queue):
+    queue.enqueue({f"{RECORD}/remarks": "a", f"{RECORD}/date": "2024-01-05"},
+                  {f"{RECORD}/remarks": 3, f"{RECORD}/date": 3})
+    queue.enqueue({"companies/c1/name": "甲公司"}, {"companies/c1/name": 7})
+    _, updates, guard = queue._next_batch()
+    assert set(updates) == {f"{RECORD}/remarks", f"{RECORD}/date"}
+    assert guard == (RECORD, 3)
+
+
+def test_overlapping_paths_are_merged_in_order(queue):
+    queue.enqueue({"wash_items/a/price": 100})
+    queue.enqueue({"wash_items": {"a": {"price": 200}}})
+    assert queue.pending_updates() == {"wash_items": {"a": {"price": 200}}}
+    queue.enqueue({"wash_items/a/price": 300})
+    _, updates, _ = queue._next_batch()
+    # 上層路徑與下層路徑不放在同一次 update
+    assert updates == {"wash_items": {"a": {"price": 200}}}
+
+
+def test_requeued_path_keeps_first_base_version(queue):
+    queue.enqueue({f"{RECORD}/remarks": "a"}, {f"{RECORD}/remarks": 3})
+    queue.enqueue({f"{RECORD}/remarks": "b"}, {f"{RECORD}/remarks": 4})
+    _, updates, guard = queue._next_batch()
+    assert updates == {f"{RECORD}/remarks": "b"} and guard == (RECORD, 3)
+
+
+
+def test_committed_version_becomes_the_next_base(queue):
+    queue.enqueue({f"{RECORD}/remarks": "a"}, {f"{RECORD}/remarks": 3})
+    queue.enqueue({"companies/c1/name": "甲公司"}, {"companies/c1/name": 3})
+    with queue.lock, queue.conn:
+        queue._committed((RECORD, 3), 4)
+    assert queue.base_version(RECORD, 3) == 4
+    assert queue.base_version(RECORD, 5) == 5  # 之後收到其他人較新的版本
+    _, _, guard = queue._next_batch()
+    assert guard == (RECORD, 4)
+    # 其他節點的寫入不受影響
+    rows = dict(queue.conn.execute("SELECT path, base_version FROM pending").fetchall())
+    assert rows["companies/c1/name"] == 3
+
+
+class FailingStorage(MemoryBackend):
+    """指定路徑的寫入拋出例外"""
+
+    def __init__(self, errors):
+        super().__init__()
+        self.errors = errors
+
+    def update(self, updates):
+        for path in updates:
+            if path in self.errors:
+                raise self.errors[path]
+        super().update(updates)
+
+
+class FirebaseLikeError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+def test_is_transient():
+    assert is_transient(ConnectionError("reset"))
+    assert is_transient(TimeoutError())
+    assert is_transient(FirebaseLikeError("UNAVAILABLE"))
+    assert not is_transient(FirebaseLikeError("PERMISSION_DENIED"))
+    assert not is_transient(ValueError("Value must not be none."))
+
+
+def drain(queue):
+    for _ in range(200):
+        if not queue.pending_count():
+            return
+        time.sleep(0.01)
+
+
+def test_permanent_error_is_parked_and_queue_drains(tmp_path):
+    storage = FailingStorage({"wash_items": FirebaseLikeError("PERMISSION_DENIED")})
+    queue = WriteQueue(storage, str(tmp_path / "pending_writes.db"))
+    failed = []
+    queue.on_failed = lambda paths, message: failed.append((paths, message))
+    queue.enqueue({"wash_items": {"a": {"name": "引擎清洗"}}})
+    queue.enqueue({"companies/c1/vehicles/v1/records/r1": None})
+    queue.enqueue({"companies/c2/sort_index": 1})
+    queue.start()
+    drain(queue)
+    assert queue.pending_count() == 0
+    assert queue.failed_count() == 1
+    assert failed == [(["wash_items"], "FirebaseLikeError: PERMISSION_DENIED")]
+    assert storage.get("companies/c2/sort_index") == 1
@@ -4,6 +4,7 @@ from PySide6.QtCore import Qt, QDate, Signal
 from PySide6.QtGui import QFont, QPalette, QColor, QIcon
 from vehicle_dialog import VehicleDialog
 from style_sheet import StyleSheet
+from metrics import metrics
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QHBoxLayout, QLabel, QPushButton, QComboBox, 
                             QTableWidget, QTableWidgetItem, QHeaderView, 
@@ -15,6 +16,7 @@ from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
 class VehicleManagerDialog(QDialog):
     vehicle_updated = Signal()  # 添加信号
     
+    @metrics.timed("dialog.VehicleManagerDialog")
     def __init__(self, parent=None, company_id=None, data=None):
         super().__init__(parent)
         self.setWindowTitle("車輛管理")
@@ -35,7 +37,9 @@ class VehicleManagerDialog(QDialog):
             vehicle_id = item.data(Qt.UserRole)
             vehicles[vehicle_id] = self.data["companies"][self.company_id]["vehicles"][vehicle_id]
             # 添加排序索引
-            vehicles[vehicle_id]["sort_index"] = i
+            if vehicles[vehicle_id].get("sort_index") != i:
+                vehicles[vehicle_id]["sort_index"] = i
+                self.mark_dirty("companies", self.company_id, "vehicles", vehicle_id, "sort_index")
         
         # 更新資料
         self.data["companies"][self.company_id]["vehicles"] = vehicles
@@ -49,6 +53,12 @@ class VehicleManagerDialog(QDialog):
         self.load_vehicles()
         self.vehicle_updated.emit()  # 发出信号
 
+    def mark_dirty(self, *parts):
+        """標記變更的路徑，儲存時只上傳這些資料"""
+        database = getattr(self.parent, 'database', None)
+        if database:
+            database.mark_dirty(*parts)
+
     def setup_ui(self):
         layout = QVBoxLayout()
         layout.setSpacing(20)
@@ -112,6 +122,7 @@ class VehicleManagerDialog(QDialog):
             vehicle_data = dialog.get_vehicle_data()
             vehicle_id = str(uuid.uuid4())
             self.data["companies"][self.company_id]["vehicles"][vehicle_id] = vehicle_data
+            self.mark_dirty("companies", self.company_id, "vehicles", vehicle_id)
             self.load_vehicles()
             self.save_and_update()
             self.vehicle_updated.emit()  # 发出信号
@@ -131,6 +142,8 @@ class VehicleManagerDialog(QDialog):
             if "records" in vehicle_data:
                 updated_data["records"] = vehicle_data["records"]
             self.data["companies"][self.company_id]["vehicles"][vehicle_id].update(updated_data)
+            for key in ("plate", "type", "remarks"):
+                self.mark_dirty("companies", self.company_id, "vehicles", vehicle_id, key)
             self.load_vehicles()
             self.save_and_update()
             self.vehicle_updated.emit()  # 发出信号
@@ -152,6 +165,7 @@ class VehicleManagerDialog(QDialog):
         )
         if reply == QMessageBox.StandardButton.Yes:
             del self.data["companies"][self.company_id]["vehicles"][vehicle_id]
+            self.mark_dirty("companies", self.company_id, "vehicles", vehicle_id)
             self.load_vehicles()
             self.save_and_update()
             self.vehicle_updated.emit()  # 发出信号
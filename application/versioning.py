@@ -0,0 +1,180 @@
+# versioning.py
+"""紀錄、車輛及公司的版本號與條件式寫入
+
+每個節點帶有 version（每次寫入加一）及 updated_at（毫秒）。上傳時以本地
+最後看到的版本號為基準：遠端版本相同才直接寫入；不同代表其他人（其他電腦
+或網頁版）已修改過，此時以遠端最新資料為基礎重新套用本地修改的欄位，
+其他欄位保留遠端的值，不會整個覆蓋。
+"""
+import time
+
+# 不需要版本保護的欄位：排序、整批紀錄轉換及版本欄位本身
+UNGUARDED_FIELDS = {"vehicles", "records", "sort_index", "version", "updated_at"}
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def guard_of(path):
+    """回傳寫入路徑所屬、需要版本保護的節點路徑，不需要時回傳 None"""
+    parts = path.split("/")
+    if parts[0] != "companies" or len(parts) < 2:
+        return None
+    if len(parts) >= 6 and parts[2] == "vehicles" and parts[4] == "records":
+        return "/".join(parts[:6])
+    if len(parts) >= 4 and parts[2] == "vehicles":
+        if len(parts) >= 5 and parts[4] in UNGUARDED_FIELDS:
+            return None
+        return "/".join(parts[:4])
+    if len(parts) >= 3 and parts[2] in UNGUARDED_FIELDS:
+        return None
+    return "/".join(parts[:2])
+
+
+def is_record(node_path):
+    parts = node_path.split("/")
+    return len(parts) == 6 and parts[4] == "records"
+
+
+def merge_node(local, remote, version):
+    """以遠端最新資料為基礎重新套用本地的欄位，回傳 (合併結果, 被本地覆蓋的欄位)"""
+    merged = dict(remote)
+    overwritten = []
+    for field, value in local.items():
+        if field in ("version", "updated_at"):
+            continue
+        if field in remote and remote[field] != value:
+            overwritten.append(field)
+        merged[field] = value
+    merged["version"] = version
+    merged["updated_at"] = now_ms()
+    return merged, overwritten
+
+
+class TransactionSkipped(Exception):
+    """不需要寫入時中止 transaction（Firebase 的 transaction 不接受回傳 None，刪除另外寫入）"""
+
+
+def report_conflict(path, message):
+    print(f"資料衝突（{path}）：{message}")
+
+
+def write_record(storage, path, value, base_version):
+    """以 transaction 寫入或刪除一筆紀錄
+
+    刪除時若遠端已被修改則保留遠端的版本；寫入時遠端已被刪除則不重新建立。
+    base_version 為 None 的刪除不檢查版本。回傳 (是否有寫入, 寫入後的版本號)，
+    刪除或未寫入時版本號為 None。
+    刪除時 transaction 只用來確認版本，確認後另外以 update 刪除。
+    """
+    state = {}
+
+    def update(current):
+        state.clear()
+        remote_version = current.get("version") if isinstance(current, dict) else None
+        if value is None:
+            if current is not None and base_version is not None and remote_version != base_version:
+                state["skipped"] = "紀錄已被其他人修改，保留修改後的版本"
+            raise TransactionSkipped()
+        if current is None:
+            if base_version is not None:
+                state["skipped"] = "紀錄已被其他人刪除，不重新建立"
+                raise TransactionSkipped()
+            state["version"] = 1
+            return dict(value, version=1, updated_at=now_ms())
+        state["version"] = (remote_version or 0) + 1
+        if remote_version == base_version:
+            return dict(value, version=state["version"], updated_at=now_ms())
+        merged, overwritten = merge_node(value, current, state["version"])
+        if overwritten:
+            state["merged"] = f"其他人也修改了 {', '.join(overwritten)}，以本機的修改為準"
+        return merged
+
+    try:
+        storage.transaction(path, update)
+    except TransactionSkipped:
+        pass
+    version = state.pop("version", None)
+    for message in state.values():
+        report_conflict(path, message)
+    if "skipped" in state:
+        return False, None
+    if value is None:
+        storage.update({path: None})
+    return True, version
+
+
+def write_fields(storage, node_path, updates, base_version):
+    """公司、車輛（或紀錄欄位）的條件式寫入
+
+    先以 transaction 將 node/version 加一取得寫入權，版本與 base_version 不同時
+    代表其他人已修改，只寫入本地修改的欄位（其他欄位保留遠端的值）。
+    節點已被刪除時不寫入欄位，避免留下不完整的資料。回傳 (是否有寫入, 寫入後的版本號)，
+    刪除或未寫入時版本號為 None。
+    """
+    state = {}
+    value_deleted = node_path in updates and updates[node_path] is None
+
+    def claim(current):
+        state.clear()
+        if value_deleted and base_version is not None and current != base_version:
+            state["conflict"] = "已被其他人修改，取消刪除"
+            raise TransactionSkipped()
+        if current is None and base_version is not None:
+            state["conflict"] = "已被其他人刪除，不寫入修改"
+            raise TransactionSkipped()
+        if current != base_version:
+            state["merged"] = True
+        state["version"] = (current or 0) + 1
+        if value_deleted:
+            raise TransactionSkipped()  # 版本確認後整個節點另外刪除
+        return state["version"]
+
+    try:
+        storage.transaction(f"{node_path}/version", claim)
+    except TransactionSkipped:
+        pass
+    if "conflict" in state:
+        report_conflict(node_path, state["conflict"])
+        return False, None
+    if value_deleted:
+        storage.update({node_path: None})
+        return True, None
+
+    timestamp = now_ms()
+    if node_path in updates and not state.get("merged"):
+        # 新增整個節點
+        payload = {node_path: dict(updates[node_path], version=state["version"], updated_at=timestamp)}
+    else:
+        payload = {}
+        for path, value in updates.items():
+            if path == node_path:
+                # 遠端已有這個節點：只寫入欄位，不覆蓋下層的車輛或紀錄
+                payload.update((f"{node_path}/{field}", field_value)
+                               for field, field_value in value.items()
+                               if field not in UNGUARDED_FIELDS)
+            else:
+                payload[path] = value
+        if state.get("merged"):
+            fields = ", ".join(path[len(node_path) + 1:] for path in payload)
+            report_conflict(node_path, f"其他人也修改過，只重新套用本機修改的欄位（{fields}）")
+        payload[f"{node_path}/updated_at"] = timestamp
+    storage.update(payload)
+    return True, state["version"]
+
+
+def write_conditional(storage, node_path, updates, base_version):
+    """依節點種類選擇條件式寫入的方式，回傳 (是否有寫入, 寫入後的版本號)"""
+    if is_record(node_path) and list(updates) == [node_path]:
+        return write_record(storage, node_path, updates[node_path], base_version)
+    return write_fields(storage, node_path, updates, base_version)
+
+
+def same_content(a, b):
+    """比較兩個節點，忽略版本號及修改時間"""
+    if not isinstance(a, dict) or not isinstance(b, dict):
+        return a == b
+    ignored = ("version", "updated_at")
+    return ({k: v for k, v in a.items() if k not in ignored}
+            == {k: v for k, v in b.items() if k not in ignored})
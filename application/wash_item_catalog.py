@@ -0,0 +1,122 @@
+# wash_item_catalog.py
+from PySide6.QtCore import QObject, Signal
+from wash_items import (normalize_catalog, catalog_to_storage, catalog_index, new_item_id,
+                        with_price, item_ref, resolve_items)
+
+# 資料庫中沒有任何洗車項目時寫入的預設項目
+DEFAULT_WASH_ITEMS = ["引擎清洗", "車身清洗", "輪胎清洗", "車斗清洗", "內裝清洗"]
+
+
+class WashItemCatalog(QObject):
+    """程式內共用的洗車項目目錄
+
+    主視窗載入資料時以 reset() 放入（之後的即時更新也一樣），新增紀錄及
+    項目管理視窗都從這裡取得，不再各自下載或保存副本。修改只透過
+    add_item()、update_item() 等方法寫入資料庫一次，再以 items_changed
+    通知所有訂閱者，由各視窗就地更新畫面。
+
+    項目以 ID 識別（格式見 wash_items），刪除的項目仍保留在目錄中，
+    讓參照它的舊紀錄可以顯示名稱及當時的價格。
+    """
+
+    items_changed = Signal(object)  # 新的洗車項目列表（不含已刪除）
+
+    def __init__(self, database, parent=None):
+        super().__init__(parent)
+        self.database = database
+        self._entries = None  # None 表示尚未載入
+        self._stored = None  # 資料庫中的原始格式
+
+    def is_loaded(self):
+        return self._entries is not None
+
+    def items(self):
+        """目前的洗車項目（不含已刪除）；尚未載入時才從資料庫下載
+
+        資料庫中沒有任何項目時寫入預設項目。
+        """
+        if self._entries is None:
+            try:
+                self._stored = self.database.get_wash_items()
+                self._entries = normalize_catalog(self._stored)
+            except Exception as e:
+                print(f"載入洗車項目時發生錯誤：{str(e)}")
+                return []
+        if not self._entries:
+            try:
+                self.set_items(DEFAULT_WASH_ITEMS)
+            except Exception as e:
+                print(f"儲存洗車項目時發生錯誤：{str(e)}")
+        return self._active()
+
+    def _active(self):
+        return [dict(entry) for entry in self._entries or [] if not entry.get("deleted")]
+
+    def index(self):
+        """項目 ID -> 項目（含已刪除），給 resolve_items 使用"""
+        return catalog_index(self._entries or [])
+
+    def get(self, item_id):
+        return self.index().get(item_id)
+
+    def find(self, name):
+        """依名稱找出未刪除的項目，找不到為 None"""
+        for entry in self._entries or []:
+            if entry["name"] == name and not entry.get("deleted"):
+                return entry
+        return None
+
+    def snapshot(self):
+        """資料庫中的原始格式，不觸發下載，尚未載入時回傳 None（給 ChangeStream 比對用）"""
+        return self._stored
+
+    def reset(self, value):
+        """放入從資料庫或即時更新取得的項目，不會寫回資料庫"""
+        entries = normalize_catalog(value)
+        self._stored = value
+        if entries == self._entries:
+            return
+        self._entries = entries
+        self.items_changed.emit(self._active())
+
+    def ref(self, item_id, day=None):
+        """新增紀錄時寫入的項目參照，day 為紀錄日期（yyyy-MM-dd）"""
+        return item_ref(self.index()[item_id], day)
+
+    def resolve(self, items):
+        return resolve_items(items, self.index())
+
+    def set_items(self, items):
+        """以新的列表取代全部項目並寫入資料庫，失敗時拋出例外
+
+        不在列表中的項目標示為已刪除。
+        """
+        entries = normalize_catalog(items)
+        kept = {entry["id"] for entry in entries}
+        entries.extend(dict(entry, deleted=True) for entry in self._entries or []
+                       if entry["id"] not in kept)
+        self._save(entries)
+
+    def add_item(self, name, price):
+        entry = {"id": new_item_id(), "name": name, "price": price}
+        self._save([entry] if self._entries is None else self._entries + [entry])
+        return entry
+
+    def update_item(self, item_id, name, price, effective_date=None):
+        """修改名稱及價格；名稱直接套用到所有紀錄，價格自 effective_date（預設今天）起生效"""
+        self._save([with_price(dict(entry, name=name), price, effective_date)
+                    if entry["id"] == item_id else entry for entry in self._entries])
+
+    def remove_item(self, item_id):
+        self._save([dict(entry, deleted=True) if entry["id"] == item_id else entry
+                    for entry in self._entries])
+
+    def _save(self, entries):
+        # 已刪除的項目排在最後，不影響顯示順序
+        entries = sorted(entries, key=lambda entry: bool(entry.get("deleted")))
+        stored = catalog_to_storage(entries)
+        if not self.database.save_wash_items(stored):
+            raise RuntimeError("無法寫入待上傳佇列")
+        self._stored = stored
+        self._entries = normalize_catalog(stored)
+        self.items_changed.emit(self._active())
@@ -8,21 +8,29 @@ from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QListWidgetItem, QMenu, QScrollArea, QFileDialog,
                             QStyle, QInputDialog)
 from style_sheet import StyleSheet
+from metrics import metrics
+from wash_item_catalog import WashItemCatalog
 
 class WashItemManagerDialog(QDialog):
+    @metrics.timed("dialog.WashItemManagerDialog")
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("洗車項目管理")
         self.setStyleSheet(StyleSheet.MAIN_STYLE)
         self.setMinimumWidth(600)
-        self.wash_items = []
         self.parent = parent
-        if hasattr(parent, 'wash_items'):
-            self.wash_items = parent.wash_items.copy()
+        # 與主視窗及新增紀錄視窗共用同一份洗車項目目錄
+        self.wash_item_catalog = getattr(parent, 'wash_item_catalog', None)
         if hasattr(parent, 'database'):
             self.database = parent.database
+            if self.wash_item_catalog is None:
+                self.wash_item_catalog = WashItemCatalog(self.database, self)
+        self.wash_items = self.wash_item_catalog.items() if self.wash_item_catalog else []
         self.setup_ui()
         self.load_items()
+        if self.wash_item_catalog:
+            self.wash_item_catalog.items_changed.connect(self.on_items_changed)
+            self.finished.connect(self.unsubscribe)
 
     def setup_ui(self):
         layout = QVBoxLayout()
@@ -68,159 +76,128 @@ class WashItemManagerDialog(QDialog):
         """載入洗車項目到列表"""
         self.item_list.clear()
         for item in self.wash_items:
-            # 檢查項目是否為新格式（字典）
-            if isinstance(item, dict):
-                display_text = f"{item['name']} - ${item['price']}"
-                list_item = QListWidgetItem(display_text)
-                list_item.setData(Qt.UserRole, item)  # 儲存完整的項目資料
-            else:
-                # 處理舊格式的資料（字串）
-                list_item = QListWidgetItem(f"{item} - $0")
-                list_item.setData(Qt.UserRole, {"name": item, "price": 0})
+            list_item = QListWidgetItem(f"{item['name']} - ${item['price']}")
+            list_item.setData(Qt.UserRole, item["id"])
             self.item_list.addItem(list_item)
 
     def item_selected(self, item):
         """當選擇項目時觸發"""
         self.current_item = item
-        item_data = item.data(Qt.UserRole)
-        if isinstance(item_data, dict):
+        item_data = self.wash_item_catalog.get(item.data(Qt.UserRole))
+        if item_data:
             self.item_input.setText(item_data["name"])
             self.price_input.setText(str(item_data["price"]))
-        else:
-            self.item_input.setText(item_data)
-            self.price_input.setText("0")
         self.item_input.setFocus()
 
-    def update_database(self):
-        """更新 Firebase 資料庫"""
-        if hasattr(self, 'database'):
-            try:
-                self.database.save_wash_items(self.wash_items)
-            except Exception as e:
-                QMessageBox.warning(self, "錯誤", f"儲存到資料庫時發生錯誤：{str(e)}")
-
-    def edit_item(self):
-        """編輯選中的項目"""
-        current_item = self.item_list.currentItem()
-        if not current_item:
-            QMessageBox.warning(self, "錯誤", "請先選擇要編輯的項目")
+    def on_items_changed(self, items):
+        """洗車項目變更（包括這個視窗的修改）後重新載入列表，保留目前選擇的項目"""
+        if items == self.wash_items:
             return
+        current_item = self.item_list.currentItem()
+        current_id = current_item.data(Qt.UserRole) if current_item else None
+        self.wash_items = items
+        self.load_items()
+        for row in range(self.item_list.count()):
+            if self.item_list.item(row).data(Qt.UserRole) == current_id:
+                self.item_list.setCurrentRow(row)
+                break
 
+    def unsubscribe(self):
+        try:
+            self.wash_item_catalog.items_changed.disconnect(self.on_items_changed)
+        except (RuntimeError, TypeError):
+            pass
+
+    def update_database(self, update):
+        """透過共用的目錄寫入資料庫，所有顯示洗車項目的視窗都會收到通知"""
+        if not self.wash_item_catalog:
+            QMessageBox.warning(self, "錯誤", "尚未連接資料庫")
+            return False
+        try:
+            update(self.wash_item_catalog)
+            return True
+        except Exception as e:
+            QMessageBox.warning(self, "錯誤", f"儲存到資料庫時發生錯誤：{str(e)}")
+            return False
+
+    def read_inputs(self, require_price=True):
+        """讀取名稱及金額欄位，格式錯誤時顯示訊息並回傳 None
+
+        require_price 為 False 時金額可以空白（回傳的金額為 None）。
+        """
         new_name = self.item_input.text().strip()
         new_price = self.price_input.text().strip()
 
         if not new_name:
             QMessageBox.warning(self, "錯誤", "項目名稱不能為空")
-            return
+            return None
+
+        if not new_price:
+            if not require_price:
+                return new_name, None
+            QMessageBox.warning(self, "錯誤", "請輸入服務金額")
+            return None
 
         try:
-            new_price = int(new_price) if new_price else 0
+            return new_name, int(new_price)
         except ValueError:
             QMessageBox.warning(self, "錯誤", "金額必須為數字")
-            return
-
-        old_item = current_item.data(Qt.UserRole)
-        
-        # 如果名稱和金額都沒有變更，則不需要更新
-        if old_item["name"] == new_name and old_item["price"] == new_price:
-            return
+            return None
 
-        new_item = {
-            "name": new_name,
-            "price": old_item["price"]  # 預設保持原有金額
-        }
+    def edit_item(self):
+        """編輯選中的項目
 
-        # 只有在金額欄位有輸入時才更新金額
-        if new_price != old_item["price"]:
-            new_item["price"] = new_price
+        項目以 ID 儲存在紀錄中，改名會直接套用到所有紀錄；改價則從今天起
+        生效，之前的紀錄仍以原本的價格計算。
+        """
+        current_item = self.item_list.currentItem()
+        if not current_item:
+            QMessageBox.warning(self, "錯誤", "請先選擇要編輯的項目")
+            return
 
-        # 檢查是否有重複的項目名稱（排除自己）
-        if new_name != old_item["name"] and any(
-            (isinstance(item, dict) and item["name"] == new_name) or 
-            (isinstance(item, str) and item == new_name) 
-            for item in self.wash_items
-        ):
-            QMessageBox.warning(self, "錯誤", "已存在相同名稱的項目")
+        inputs = self.read_inputs(require_price=False)
+        if inputs is None:
             return
+        new_name, new_price = inputs
 
-        # 找到要更新的項目索引
-        idx = -1
-        for i, item in enumerate(self.wash_items):
-            if isinstance(item, dict):
-                if item["name"] == old_item["name"] and item["price"] == old_item["price"]:
-                    idx = i
-                    break
-            else:  # 處理舊格式的字串項目
-                if item == old_item["name"]:
-                    idx = i
-                    break
-                
-        if idx == -1:
+        item_id = current_item.data(Qt.UserRole)
+        old_item = self.wash_item_catalog.get(item_id)
+        if old_item is None:
             QMessageBox.warning(self, "錯誤", "找不到要編輯的項目")
             return
+        if new_price is None:
+            new_price = old_item["price"]  # 金額欄位空白時保持原有金額
 
-        # 更新項目
-        self.wash_items[idx] = new_item
-        current_item.setText(f"{new_name} - ${new_item['price']}")
-        current_item.setData(Qt.UserRole, new_item)
+        # 如果名稱和金額都沒有變更，則不需要更新
+        if old_item["name"] == new_name and old_item["price"] == new_price:
+            return
 
-        # 更新資料庫
-        self.update_database()
+        # 檢查是否有重複的項目名稱（排除自己）
+        existing = self.wash_item_catalog.find(new_name)
+        if existing is not None and existing["id"] != item_id:
+            QMessageBox.warning(self, "錯誤", "已存在相同名稱的項目")
+            return
 
-        # 更新父視窗
-        if hasattr(self.parent, 'wash_items'):
-            self.parent.wash_items = self.wash_items.copy()
-        if hasattr(self.parent, 'update_wash_items'):
-            self.parent.update_wash_items()
-        if hasattr(self.parent, 'setup_wash_items'):
-            self.parent.setup_wash_items()
+        self.update_database(lambda catalog: catalog.update_item(item_id, new_name, new_price))
 
     def add_item(self):
         """新增洗車項目"""
-        new_name = self.item_input.text().strip()
-        new_price = self.price_input.text().strip()
-
-        if not new_name:
-            QMessageBox.warning(self, "錯誤", "項目名稱不能為空")
-            return
-
-        if not new_price:
-            QMessageBox.warning(self, "錯誤", "請輸入服務金額")
-            return
-
-        try:
-            new_price = int(new_price)
-        except ValueError:
-            QMessageBox.warning(self, "錯誤", "金額必須為數字")
+        inputs = self.read_inputs()
+        if inputs is None:
             return
+        new_name, new_price = inputs
 
         # 檢查是否有重複的項目名稱
-        if any(item["name"] == new_name for item in self.wash_items):
+        if self.wash_item_catalog and self.wash_item_catalog.find(new_name) is not None:
             QMessageBox.warning(self, "錯誤", "已存在相同名稱的項目")
             return
 
-        # 新增項目
-        new_item = {"name": new_name, "price": new_price}
-        self.wash_items.append(new_item)
-        list_item = QListWidgetItem(f"{new_name} - ${new_price}")
-        list_item.setData(Qt.UserRole, new_item)
-        self.item_list.addItem(list_item)
-        self.item_input.clear()
-        self.price_input.clear()
-        
-        # 更新資料庫
-        self.update_database()
-        
-        # 更新父視窗
-        if hasattr(self.parent, 'wash_items'):
-            self.parent.wash_items = self.wash_items.copy()
-        if hasattr(self.parent, 'update_wash_items'):
-            self.parent.update_wash_items()
-        if hasattr(self.parent, 'setup_wash_items'):
-            self.parent.setup_wash_items()
+        if self.update_database(lambda catalog: catalog.add_item(new_name, new_price)):
+            self.item_input.clear()
+            self.price_input.clear()
 
     def delete_item(self):
-        """刪除選中的項目"""
+        """刪除選中的項目（已使用這個項目的紀錄不受影響）"""
         current_item = self.item_list.currentItem()
         if not current_item:
             QMessageBox.warning(self, "錯誤", "請先選擇要刪除的項目")
@@ -235,25 +212,13 @@ class WashItemManagerDialog(QDialog):
         )
 
         if reply == QMessageBox.StandardButton.Yes:
-            item_data = current_item.data(Qt.UserRole)
-            self.wash_items.remove(item_data)
-            self.item_list.takeItem(self.item_list.row(current_item))
-            self.item_input.clear()
-            self.price_input.clear()
-            if hasattr(self, 'current_item'):
-                delattr(self, 'current_item')
-            
-            # 更新資料庫
-            self.update_database()
-            
-            # 更新父視窗
-            if hasattr(self.parent, 'wash_items'):
-                self.parent.wash_items = self.wash_items.copy()
-            if hasattr(self.parent, 'update_wash_items'):
-                self.parent.update_wash_items()
-            if hasattr(self.parent, 'setup_wash_items'):
-                self.parent.setup_wash_items()
+            item_id = current_item.data(Qt.UserRole)
+            if self.update_database(lambda catalog: catalog.remove_item(item_id)):
+                self.item_input.clear()
+                self.price_input.clear()
+                if hasattr(self, 'current_item'):
+                    delattr(self, 'current_item')
 
     def get_wash_items(self):
         """獲取當前的洗車項目列表"""
-        return self.wash_items.copy()
+        return list(self.wash_items)
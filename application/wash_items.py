@@ -0,0 +1,141 @@
+# wash_items.py
+"""洗車項目目錄及紀錄中項目參照的轉換
+
+目錄（Firebase 的 wash_items）以項目 ID 為 key，與網頁版相同：
+    {項目ID: {"name", "price", "sort_index", "prices": [...], "deleted": True}}
+prices 為價格版本列表 [{"price", "effective_date"}]，依序附加、不會修改，
+版本號即為列表位置；沒有 prices 時只有一個版本（目前的 price，不限日期）。
+刪除的項目只加上 deleted，舊紀錄仍能找到名稱及價格。
+
+紀錄中的服務項目可能是：
+    {"id", "price_version"}      參照目錄中的項目（本程式新增的紀錄）
+    {"name", "price", ...}       直接寫入名稱及金額（較早的紀錄、網頁版、校正項目）
+    "名稱"                       最早期只有名稱，沒有金額
+resolve_items() 將參照展開為含 name、price 的字典，其他格式原樣保留。
+"""
+import uuid
+from datetime import date
+
+DELETED_ITEM_NAME = "（已刪除的項目）"
+
+
+def new_item_id():
+    return str(uuid.uuid4())
+
+
+def legacy_item_id(name):
+    """舊版以列表儲存、沒有 ID 的項目依名稱產生固定的 ID"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"wash_items/{name}"))
+
+
+def price_versions(entry):
+    """目錄項目的價格版本列表"""
+    prices = entry.get("prices")
+    if isinstance(prices, dict):
+        # 陣列經過部分儲存後端時可能變成以索引為 key 的物件
+        prices = [prices[key] for key in sorted(prices, key=int)]
+    return prices or [{"price": entry.get("price", 0), "effective_date": None}]
+
+
+def price_version_at(entry, day=None):
+    """day（yyyy-MM-dd）當天適用的價格版本號，未指定時為最新版本"""
+    versions = price_versions(entry)
+    if day is None:
+        return len(versions) - 1
+    version = 0
+    for index, price in enumerate(versions):
+        effective_date = price.get("effective_date")
+        if effective_date is None or effective_date <= day:
+            version = index
+    return version
+
+
+def price_at(entry, day=None):
+    return price_versions(entry)[price_version_at(entry, day)]["price"]
+
+
+def with_price(entry, price, effective_date=None):
+    """回傳改為新價格的項目，價格不同時附加一個自 effective_date（預設今天）起適用的版本"""
+    versions = price_versions(entry)
+    if versions[-1]["price"] == price:
+        return dict(entry, price=price)
+    effective_date = effective_date or date.today().isoformat()
+    return dict(entry, price=price,
+                prices=versions + [{"price": price, "effective_date": effective_date}])
+
+
+def item_ref(entry, day=None):
+    """紀錄中參照目錄項目的寫法，價格版本為紀錄日期適用的版本"""
+    return {"id": entry["id"], "price_version": price_version_at(entry, day)}
+
+
+def normalize_catalog(value):
+    """將 Firebase 上的洗車項目整理為依 sort_index 排序、都有 id 的項目列表
+
+    相容網頁版的物件格式、舊版的列表格式（字典或只有名稱的字串）。
+    """
+    if isinstance(value, dict):
+        pairs = list(value.items())
+    else:
+        pairs = [(None, item) for item in value or []]
+    entries = []
+    for position, (key, item) in enumerate(pairs):
+        if item is None:
+            continue  # Firebase 陣列刪除後留下的空位
+        if not isinstance(item, dict):
+            item = {"name": str(item), "price": 0}
+        item_id = key if key is not None else item.get("id")
+        entry = dict(item, id=item_id or legacy_item_id(item.get("name", "")))
+        entry.setdefault("price", 0)
+        entry.setdefault("sort_index", position)
+        entries.append(entry)
+    entries.sort(key=lambda entry: entry["sort_index"])
+    return entries
+
+
+def catalog_to_storage(entries):
+    """寫入 Firebase 的物件格式，只有一個價格版本時不寫 prices"""
+    stored = {}
+    for sort_index, entry in enumerate(entries):
+        value = {key: entry[key] for key in entry if key not in ("id", "prices")}
+        value["sort_index"] = sort_index
+        versions = price_versions(entry)
+        if len(versions) > 1:
+            value["prices"] = [
+                {key: price[key] for key in ("price", "effective_date") if price.get(key) is not None}
+                for price in versions
+            ]
+        stored[entry["id"]] = value
+    return stored
+
+
+def catalog_index(entries):
+    """項目 ID -> 項目（含已刪除）"""
+    return {entry["id"]: entry for entry in entries}
+
+
+def resolve_item(item, index):
+    if not isinstance(item, dict) or "price_version" not in item:
+        return item
+    entry = index.get(item.get("id"))
+    if entry is None:
+        return dict(item, name=item.get("name") or DELETED_ITEM_NAME, price=item.get("price", 0))
+    versions = price_versions(entry)
+    version = item["price_version"]
+    price = versions[version]["price"] if 0 <= version < len(versions) else entry["price"]
+    return dict(item, name=entry["name"], price=price)
+
+
+def resolve_items(items, index):
+    """將紀錄中參照目錄的項目展開為含 name、price 的字典
+
+    沒有參照時直接回傳原本的列表，不另外複製。
+    """
+    if not items or not any(isinstance(item, dict) and "price_version" in item for item in items):
+        return items
+    return [resolve_item(item, index) for item in items]
+
+
+def referenced_ids(items):
+    """紀錄中帶有項目 ID 的項目（參照或網頁版寫入的項目）"""
+    return {item["id"] for item in items or [] if isinstance(item, dict) and item.get("id")}
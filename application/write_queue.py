@@ -0,0 +1,232 @@
+# write_queue.py
+import os
+import json
+import sqlite3
+import threading
+import time
+from app_paths import get_data_dir
+from versioning import guard_of, write_conditional
+
+
+# firebase_admin 例外的 code 中，稍後重試可能成功的錯誤
+TRANSIENT_ERROR_CODES = {"UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL", "UNKNOWN",
+                         "RESOURCE_EXHAUSTED", "ABORTED"}
+
+
+def is_transient(error):
+    """網路中斷、逾時、伺服器暫時無法使用等錯誤重試；資料錯誤、權限不足等重試也不會成功"""
+    code = getattr(error, "code", None)
+    if isinstance(code, str):
+        return code in TRANSIENT_ERROR_CODES
+    # requests 的連線錯誤也是 OSError；本機 SQLite 被鎖定時稍後再試
+    return isinstance(error, (OSError, sqlite3.OperationalError))
+
+
+def paths_overlap(a, b):
+    """兩個路徑相同或互為上下層"""
+    return a == b or a.startswith(b + "/") or b.startswith(a + "/")
+
+
+class WriteQueue:
+    """背景寫入佇列
+
+    寫入操作先存進本地 journal（SQLite）後立即返回，再由背景執行緒以多路徑
+    update 上傳 Firebase。同一路徑的寫入會合併，程式中斷後重新啟動會繼續上傳，
+    網路失敗時以遞增的間隔重試。重試也不會成功的錯誤（見 is_transient）
+    將該批寫入移到 failed 表並通知，不會擋住之後的寫入。
+
+    紀錄、車輛及公司的寫入會連同本地最後看到的版本號（base_version）一起
+    保存，上傳時改以條件式寫入（見 versioning.py），不會覆蓋其他人的修改。
+    """
+
+    MIN_RETRY_DELAY = 1   # 秒
+    MAX_RETRY_DELAY = 60  # 秒
+
+    def __init__(self, storage, path=None):
+        self.storage = storage
+        self.path = path or os.path.join(get_data_dir(), 'pending_writes.db')
+        self.on_pending_changed = None  # callback(pending_count)，於背景執行緒呼叫
+        self.on_conflict = None  # callback(節點路徑)，本地修改因衝突未寫入時於背景執行緒呼叫
+        self.on_failed = None  # callback(路徑列表, 錯誤訊息)，寫入無法上傳而放棄時於背景執行緒呼叫
+        self.versions = {}  # 節點路徑 -> 本次執行最後寫入的版本號
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS pending ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "path TEXT NOT NULL UNIQUE, value TEXT NOT NULL, base_version INTEGER)"
+            )
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(pending)")]
+            if "base_version" not in columns:
+                self.conn.execute("ALTER TABLE pending ADD COLUMN base_version INTEGER")
+            # 放棄上傳的寫入保留原本的內容及錯誤，需要時可以查看或手動處理
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS failed ("
+                "seq INTEGER PRIMARY KEY, path TEXT NOT NULL, value TEXT NOT NULL, "
+                "base_version INTEGER, error TEXT NOT NULL, failed_at REAL NOT NULL)"
+            )
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        """啟動背景上傳，journal 中上次未完成的寫入會先被重送"""
+        self.thread.start()
+        self.wakeup.set()
+
+    def enqueue(self, updates, base_versions=None):
+        """加入 {路徑: 資料} 寫入，資料為 None 代表刪除
+
+        base_versions 為 {路徑: 修改前的版本號}，同一路徑尚未上傳時保留最早的版本號。
+        """
+        base_versions = base_versions or {}
+        with self.lock, self.conn:
+            for path, value in updates.items():
+                base_version = base_versions.get(path)
+                row = self.conn.execute(
+                    "SELECT base_version FROM pending WHERE path = ?", (path,)
+                ).fetchone()
+                if row is not None and row[0] is not None:
+                    base_version = row[0]
+                # 新的寫入會覆蓋同一路徑及其子路徑上尚未上傳的寫入
+                prefix = path + "/"
+                self.conn.execute(
+                    "DELETE FROM pending WHERE path = ? OR substr(path, 1, ?) = ?",
+                    (path, len(prefix), prefix)
+                )
+                self.conn.execute(
+                    "INSERT INTO pending (path, value, base_version) VALUES (?, ?, ?)",
+                    (path, json.dumps(value, ensure_ascii=False), base_version)
+                )
+        self._notify()
+        self.wakeup.set()
+
+    def pending_count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    def pending_updates(self):
+        """依加入順序取得尚未上傳的 {路徑: 資料}"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path, value FROM pending ORDER BY seq"
+            ).fetchall()
+        return {path: json.loads(value) for path, value in rows}
+
+    def _next_batch(self):
+        """取出可以放在同一次 update 的寫入，遇到路徑重疊就停止以維持順序
+
+        需要版本保護的寫入以節點為單位分批，回傳 (seqs, updates, guard)，
+        guard 為 (節點路徑, base_version)，一般寫入為 None。
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT seq, path, value, base_version FROM pending ORDER BY seq"
+            ).fetchall()
+        seqs, updates, guard = [], {}, None
+        for seq, path, value, base_version in rows:
+            node = guard_of(path)
+            row_guard = None if node is None else (node, base_version)
+            if updates and row_guard != guard:
+                break
+            if any(paths_overlap(path, other) for other in updates):
+                break
+            guard = row_guard
+            seqs.append(seq)
+            updates[path] = json.loads(value)
+        return seqs, updates, guard
+
+    def _run(self):
+        delay = self.MIN_RETRY_DELAY
+        while True:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            while True:
+                seqs, updates, guard = self._next_batch()
+                if not updates:
+                    delay = self.MIN_RETRY_DELAY
+                    break
+                written, version = True, None
+                try:
+                    if guard is None:
+                        self.storage.update(updates)
+                    else:
+                        written, version = write_conditional(self.storage, guard[0], updates, guard[1])
+                except Exception as e:
+                    if not is_transient(e):
+                        self._fail(seqs, guard, e)
+                        continue
+                    print(f"上傳失敗，{delay} 秒後重試：{e}")
+                    # 等待期間若有新的寫入也會提早重試
+                    self.wakeup.wait(delay)
+                    self.wakeup.clear()
+                    delay = min(delay * 2, self.MAX_RETRY_DELAY)
+                    continue
+                delay = self.MIN_RETRY_DELAY
+                with self.lock, self.conn:
+                    self.conn.executemany(
+                        "DELETE FROM pending WHERE seq = ?", [(seq,) for seq in seqs]
+                    )
+                    if guard is not None:
+                        self._committed(guard, version if written else None)
+                self._notify()
+                if not written and self.on_conflict:
+                    self.on_conflict(guard[0])
+
+    def _fail(self, seqs, guard, error):
+        """將無法上傳的一批寫入移到 failed 表，讓之後的寫入繼續上傳"""
+        message = f"{type(error).__name__}: {error}"
+        print(f"上傳失敗，放棄這筆寫入：{message}")
+        with self.lock, self.conn:
+            marks = ", ".join("?" * len(seqs))
+            paths = [row[0] for row in self.conn.execute(
+                f"SELECT path FROM pending WHERE seq IN ({marks}) ORDER BY seq", seqs)]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO failed (seq, path, value, base_version, error, failed_at) "
+                f"SELECT seq, path, value, base_version, ?, ? FROM pending WHERE seq IN ({marks})",
+                [message, time.time(), *seqs]
+            )
+            self.conn.execute(f"DELETE FROM pending WHERE seq IN ({marks})", seqs)
+        self._notify()
+        if self.on_failed:
+            self.on_failed(paths, message)
+        # 本地資料已與遠端不同，重新載入該節點
+        if guard is not None and self.on_conflict:
+            self.on_conflict(guard[0])
+
+    def failed_count(self):
+        """放棄上傳的寫入數量"""
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM failed").fetchone()[0]
+
+    def base_version(self, node_path, local_version):
+        """節點修改前的版本號：本次執行已寫入較新的版本時使用寫入後的版本號
+
+        自己上傳的修改不一定會經由即時更新回到本地資料，若仍以本地資料中的
+        版本號為基準，下一次修改同一節點會被誤判為衝突。
+        """
+        with self.lock:
+            version = self.versions.get(node_path)
+        if version is None or (local_version is not None and local_version >= version):
+            return local_version
+        return version
+
+    def _committed(self, guard, version):
+        """節點寫入完成（呼叫時已持有 lock）：記錄新的版本號，同一節點以舊版本號
+        排隊中的寫入改以新版本號為基準"""
+        node_path, base_version = guard
+        if version is None:
+            self.versions.pop(node_path, None)
+            return
+        self.versions[node_path] = version
+        rows = self.conn.execute(
+            "SELECT seq, path FROM pending WHERE base_version IS ?", (base_version,)
+        ).fetchall()
+        self.conn.executemany(
+            "UPDATE pending SET base_version = ? WHERE seq = ?",
+            [(version, seq) for seq, path in rows if guard_of(path) == node_path]
+        )
+
+    def _notify(self):
+        if self.on_pending_changed:
+            self.on_pending_changed(self.pending_count())
@@ -1,12 +1,13 @@
 import React, { useState, useEffect } from 'react';
 import { Button, Form, Row, Col, InputGroup, Card, OverlayTrigger, Tooltip, Badge, ListGroup } from 'react-bootstrap';
-import { ref, set, get, onValue } from 'firebase/database';
+import { ref, get, onValue } from 'firebase/database';
 import DatePicker from 'react-datepicker';
 import { FaPlus, FaTrash, FaCalendarAlt, FaTimes, FaSearch, FaMinus, FaPlus as FaPlusCircle } from 'react-icons/fa';
 import Snackbar from '@mui/material/Snackbar';
 import Alert from '@mui/material/Alert';
 import Select from 'react-select';
 import 'react-datepicker/dist/react-datepicker.css';
+import * as firebaseService from '../services/firebase';
 
 // 格式化洗車項目顯示名稱
 const formatWashItemName = (washItem) => {
@@ -153,7 +154,10 @@ const AddRecordForm = ({ data, setData, database, companyId, vehicleId, editingR
                     const itemsArray = Object.entries(items).map(([id, item]) => ({
                         id,
                         ...item
-                    })).sort((a, b) => (a.sort_index || 0) - (b.sort_index || 0));
+                    }))
+                        // 已刪除的項目只保留給舊紀錄查詢名稱及價格
+                        .filter(item => !item.deleted)
+                        .sort((a, b) => (a.sort_index || 0) - (b.sort_index || 0));
                     setWashItems(itemsArray);
                 } else {
                     setWashItems([]);
@@ -451,23 +455,16 @@ const AddRecordForm = ({ data, setData, database, companyId, vehicleId, editingR
                 timestamp: timestamp
             };
 
-            let updatedRecords;
-            if (editingRecord) {
-                // 更新現有記錄，確保只更新一筆
-                const recordIndex = records.findIndex(record => record.timestamp === editingRecord.timestamp);
-                if (recordIndex !== -1) {
-                    updatedRecords = [...records];
-                    updatedRecords[recordIndex] = newRecord;
-                } else {
-                    updatedRecords = [...records, newRecord];
-                }
-            } else {
-                // 添加新記錄
-                updatedRecords = [...records, newRecord];
-            }
-
-            // 更新 Firebase
-            await set(ref(database, `companies/${selectedCompanyId}/vehicles/${selectedVehicleId}/records`), updatedRecords);
+            // 以 transaction 只寫入這一筆紀錄，不覆蓋其他人同時新增或修改的紀錄
+            const savedRecord = await firebaseService.saveRecord(
+                selectedCompanyId,
+                selectedVehicleId,
+                editingRecord ? { ...newRecord, id: editingRecord.id } : newRecord,
+                editingRecord
+            );
+            const updatedRecords = firebaseService.toRecordList(records)
+                .filter(record => !editingRecord || record.timestamp !== editingRecord.timestamp);
+            updatedRecords.push(savedRecord);
 
             // 更新本地狀態
             const newData = { ...data };
@@ -488,7 +485,7 @@ const AddRecordForm = ({ data, setData, database, companyId, vehicleId, editingR
 
             // 創建一個格式化的記錄用於前端顯示
             const formattedRecord = {
-                ...newRecord,
+                ...savedRecord,
                 companyId: selectedCompanyId,
                 companyName: data.companies[selectedCompanyId].name,
                 vehicleId: selectedVehicleId,
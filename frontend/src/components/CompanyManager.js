@@ -5,6 +5,7 @@ import { DragDropContext, Droppable, Draggable } from 'react-beautiful-dnd';
 import {  FaBars } from 'react-icons/fa';
 import Snackbar from '@mui/material/Snackbar';
 import Alert from '@mui/material/Alert';
+import * as firebaseService from '../services/firebase';
 
 // 解決 React 18 StrictMode 相容性問題的自定義 Droppable
 const StrictModeDroppable = ({ children, ...props }) => {
@@ -155,8 +156,8 @@ const CompanyManager = ({ data, setData, database, onSave }) => {
                 sort_index: selectedCompany.sort_index
             };
 
-            // 更新 Firebase
-            await set(ref(database, `companies/${selectedCompany.id}`), updatedCompany);
+            // 只更新公司欄位，不覆蓋其他人同時修改的車輛及紀錄
+            await firebaseService.updateCompany(selectedCompany.id, updatedCompany);
 
             // 更新本地狀態
             const updatedCompanies = companies.map(company =>
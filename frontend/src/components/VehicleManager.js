@@ -6,6 +6,7 @@ import { FaCog, FaBars } from 'react-icons/fa';
 // MUI 組件
 import Snackbar from '@mui/material/Snackbar';
 import Alert from '@mui/material/Alert';
+import * as firebaseService from '../services/firebase';
 
 // 解決 React 18 StrictMode 相容性問題的自定義 Droppable
 const StrictModeDroppable = ({ children, ...props }) => {
@@ -219,8 +220,8 @@ const VehicleManager = ({ data, companyId, setData, database, onSave }) => {
                 sort_index: selectedVehicle.sort_index
             };
 
-            // 更新 Firebase
-            await set(ref(database, `companies/${companyId}/vehicles/${selectedVehicle.id}`), updatedVehicle);
+            // 只更新車輛欄位，不覆蓋其他人同時新增的紀錄
+            await firebaseService.updateVehicle(companyId, selectedVehicle.id, updatedVehicle);
 
             // 更新本地狀態
             const updatedVehicles = vehicles.map(vehicle =>
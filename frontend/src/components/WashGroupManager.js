@@ -446,7 +446,7 @@ const WashGroupManager = ({ database, onSave }) => {
         const itemsArray = Object.entries(washItems).map(([id, item]) => ({
             id,
             ...item
-        }));
+        })).filter(item => !item.deleted);
 
         // 獲取分組中的項目IDs
         const groupItemIds = selectedGroup?.items || [];
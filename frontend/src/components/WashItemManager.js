@@ -1,10 +1,11 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Button, Form, Row, Col, ListGroup, Modal } from 'react-bootstrap';
 import { ref, set, get } from 'firebase/database';
 import { DragDropContext, Droppable, Draggable } from 'react-beautiful-dnd';
 import { FaPlus, FaBars } from 'react-icons/fa';
 import Snackbar from '@mui/material/Snackbar';
 import Alert from '@mui/material/Alert';
+import { withPriceHistory } from '../services/firebase';
 
 // 創建自定義拖曳樣式
 const getItemStyle = (isDragging, draggableStyle) => ({
@@ -52,6 +53,8 @@ const StrictModeDroppable = ({ children, droppableId }) => {
 // 清理不必要的狀態和函數
 const WashItemManager = ({ database, onSave }) => {
     const [washItems, setWashItems] = useState([]);
+    // Firebase 上的原始資料（含價格歷史及已刪除的項目）
+    const storedItems = useRef({});
     const [newItemName, setNewItemName] = useState('');
     const [newItemPrice, setNewItemPrice] = useState('');
     const [newItemId, setNewItemId] = useState('');
@@ -72,11 +75,14 @@ const WashItemManager = ({ database, onSave }) => {
                 const snapshot = await get(washItemsRef);
                 if (snapshot.exists()) {
                     const items = snapshot.val();
+                    storedItems.current = items;
                     const itemsList = Object.entries(items)
                         .map(([id, item]) => ({
                             id,
                             ...item
                         }))
+                        // 已刪除的項目只保留給舊紀錄查詢名稱及價格
+                        .filter(item => !item.deleted)
                         // 依照 sort_index 由小到大排序 (0在最上面)
                         .sort((a, b) => (a.sort_index || 0) - (b.sort_index || 0));
                     setWashItems(itemsList);
@@ -103,15 +109,25 @@ const WashItemManager = ({ database, onSave }) => {
 
             // 對每個項目設置 sort_index，確保順序與顯示一致
             items.forEach((item, index) => {
+                const prices = withPriceHistory(item, storedItems.current[item.id]);
                 itemsObject[item.id] = {
                     name: item.name,
                     price: item.price,
-                    sort_index: index // 索引越小越靠前
+                    sort_index: index, // 索引越小越靠前
+                    ...(prices ? { prices } : {})
                 };
             });
 
+            // 刪除或改了 ID 的項目標示為已刪除，桌面版新增的紀錄以 ID 參照項目
+            Object.entries(storedItems.current).forEach(([id, item]) => {
+                if (!itemsObject[id]) {
+                    itemsObject[id] = { ...item, deleted: true };
+                }
+            });
+
             // 一次性寫入所有項目
             await set(washItemsRef, itemsObject);
+            storedItems.current = itemsObject;
 
             if (onSave) {
                 onSave({ reload: false });
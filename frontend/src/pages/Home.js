@@ -17,7 +17,19 @@ import { useNavigate } from 'react-router-dom';
 import 'bootstrap/dist/css/bootstrap.min.css';
 import 'react-datepicker/dist/react-datepicker.css';
 import '../assets/Home.css';
-import { ref, set } from 'firebase/database';
+
+// 沒有時間戳的舊紀錄：使用日期轉換成時間戳，或使用當前時間作為備用
+const timestampFromDate = (record) => {
+    const dateParts = record.date?.split('-');
+    if (dateParts && dateParts.length === 3) {
+        return new Date(
+            parseInt(dateParts[0]),
+            parseInt(dateParts[1]) - 1,
+            parseInt(dateParts[2])
+        ).getTime();
+    }
+    return Date.now() - Math.floor(Math.random() * 10000000); // 隨機偏移，避免所有舊記錄有相同時間戳
+};
 
 function Home() {
     const navigate = useNavigate();
@@ -105,27 +117,14 @@ function Home() {
                     const recordsWithTimestamp = vehicle.records.map(record => {
                         if (!record.timestamp) {
                             needsUpdate = true;
-                            // 如果沒有時間戳，使用日期轉換成時間戳，或使用當前時間作為備用
-                            const dateParts = record.date?.split('-');
-                            let timestamp;
-                            if (dateParts && dateParts.length === 3) {
-                                const recordDate = new Date(
-                                    parseInt(dateParts[0]),
-                                    parseInt(dateParts[1]) - 1,
-                                    parseInt(dateParts[2])
-                                );
-                                timestamp = recordDate.getTime();
-                            } else {
-                                timestamp = Date.now() - Math.floor(Math.random() * 10000000); // 隨機偏移，避免所有舊記錄有相同時間戳
-                            }
-                            return { ...record, timestamp };
+                            return { ...record, timestamp: timestampFromDate(record) };
                         }
                         return record;
                     });
 
-                    // 如果有記錄被更新，更新 Firebase
+                    // 如果有記錄被更新，只為 Firebase 上缺少時間戳的紀錄補上
                     if (needsUpdate) {
-                        set(ref(database, `companies/${companyId}/vehicles/${vehicleId}/records`), recordsWithTimestamp)
+                        firebaseService.fillRecordTimestamps(companyId, vehicleId, timestampFromDate)
                             .catch(error => console.error('更新記錄時間戳錯誤:', error));
                     }
 
@@ -133,6 +132,7 @@ function Home() {
                     recordsWithTimestamp.forEach(record => {
                         allRecords.push({
                             ...record,
+                            items: firebaseService.resolveRecordItems(record.items, data.wash_items),
                             companyId,
                             companyName,
                             vehicleId,
@@ -370,16 +370,13 @@ function Home() {
 
             if (recordIndex === -1) throw new Error('找不到要刪除的記錄');
 
+            // 以 transaction 只刪除這一筆，其他人同時寫入的紀錄不受影響
+            await firebaseService.deleteRecord(record.companyId, record.vehicleId, record);
+
             // 從資料中移除此記錄
             const newData = { ...data };
             newData.companies[record.companyId].vehicles[record.vehicleId].records.splice(recordIndex, 1);
 
-            // 更新 Firebase
-            await firebaseService.saveData(
-                `companies/${record.companyId}/vehicles/${record.vehicleId}/records`,
-                newData.companies[record.companyId].vehicles[record.vehicleId].records
-            );
-
             // 更新狀態
             setData(newData);
             processRecords(newData);
@@ -1,5 +1,5 @@
 import { initializeApp } from 'firebase/app';
-import { getDatabase, ref, get, set, push, remove } from 'firebase/database';
+import { getDatabase, ref, get, set, push, remove, update, runTransaction, increment } from 'firebase/database';
 import { getAuth, GoogleAuthProvider, signInWithPopup } from 'firebase/auth';
 
 // 使用環境變量中的Firebase配置
@@ -38,12 +38,53 @@ export const signInWithGoogle = async () => {
     }
 };
 
+// 桌面版以紀錄 ID 為 key 儲存紀錄，網頁版統一轉為陣列處理
+export const toRecordList = (records) => {
+    if (!records) return [];
+    return Array.isArray(records) ? records.filter(Boolean) : Object.values(records);
+};
+
+// 價格版本列表：沒有 prices 時只有目前的價格一個版本
+export const priceVersions = (item) => {
+    const prices = item?.prices ? Object.values(item.prices) : [];
+    return prices.length ? prices : [{ price: item?.price || 0 }];
+};
+
+// 桌面版新增的紀錄只寫入 { id, price_version }，依 wash_items 展開為名稱及金額
+// 其他格式（直接寫入名稱及金額、只有名稱的字串）原樣保留
+export const resolveRecordItems = (items, washItems) => {
+    if (!Array.isArray(items)) return items;
+    return items.map(item => {
+        if (!item || typeof item !== 'object' || item.price_version === undefined) return item;
+        const entry = washItems?.[item.id];
+        if (!entry) return { ...item, name: item.name || '（已刪除的項目）', price: item.price || 0 };
+        const version = priceVersions(entry)[item.price_version];
+        return { ...item, name: entry.name, price: version ? version.price : entry.price };
+    });
+};
+
+// 儲存服務項目時保留價格歷史：價格變更時附加今天起生效的版本
+export const withPriceHistory = (item, previous) => {
+    const prices = priceVersions(previous || item);
+    if (prices[prices.length - 1].price === item.price) {
+        return prices.length > 1 ? prices : undefined;
+    }
+    return [...prices, { price: item.price, effective_date: new Date().toISOString().split('T')[0] }];
+};
+
 // 獲取所有資料
 export const getAllData = async () => {
     try {
         // 直接獲取companies資料
         const companiesSnapshot = await get(ref(database, 'companies'));
         const companies = companiesSnapshot.val() || {};
+        Object.values(companies).forEach(company => {
+            Object.values(company.vehicles || {}).forEach(vehicle => {
+                if (vehicle.records) {
+                    vehicle.records = toRecordList(vehicle.records);
+                }
+            });
+        });
 
         // 獲取wash_items資料 (如果需要)
         const washItemsSnapshot = await get(ref(database, 'wash_items'));
@@ -89,12 +130,9 @@ export const addCompany = async (company) => {
 
 // 更新公司
 export const updateCompany = async (companyId, company) => {
-    try {
-        await set(ref(database, `companies/${companyId}`), company);
-    } catch (error) {
-        console.error('更新公司時發生錯誤:', error);
-        throw error;
-    }
+    // 不寫入 vehicles，避免覆蓋其他人同時新增的車輛及紀錄
+    const { vehicles, ...fields } = company;
+    await updateFields(`companies/${companyId}`, fields);
 };
 
 // 刪除公司
@@ -121,12 +159,9 @@ export const addVehicle = async (companyId, vehicle) => {
 
 // 更新車輛
 export const updateVehicle = async (companyId, vehicleId, vehicle) => {
-    try {
-        await set(ref(database, `companies/${companyId}/vehicles/${vehicleId}`), vehicle);
-    } catch (error) {
-        console.error('更新車輛時發生錯誤:', error);
-        throw error;
-    }
+    // 不寫入 records，避免覆蓋其他人同時新增的紀錄
+    const { records, ...fields } = vehicle;
+    await updateFields(`companies/${companyId}/vehicles/${vehicleId}`, fields);
 };
 
 // 刪除車輛
@@ -139,34 +174,134 @@ export const deleteVehicle = async (companyId, vehicleId) => {
     }
 };
 
-// 新增紀錄
-export const addRecord = async (companyId, vehicleId, record) => {
+// 紀錄以 ID 對應；沒有 ID 的舊紀錄以日期 + 時間戳對應
+const isSameRecord = (a, b) => {
+    if (!a || !b) return false;
+    if (a.id && b.id) return a.id === b.id;
+    return a.date === b.date && a.timestamp === b.timestamp;
+};
+
+const newRecordId = () => (
+    window.crypto?.randomUUID
+        ? window.crypto.randomUUID()
+        : `${Date.now()}-${Math.random().toString(16).slice(2)}`
+);
+
+// 將 records 節點（陣列或物件）轉為以 key 為索引的物件，陣列刪除後的空位一併移除
+const toRecordMap = (records) => {
+    const map = {};
+    Object.entries(records || {}).forEach(([key, record]) => {
+        if (record) map[key] = record;
+    });
+    return map;
+};
+
+// 以遠端最新的紀錄為基礎，重新套用本次修改的欄位（其他人修改的欄位保留）
+const mergeRecord = (base, local, remote) => {
+    const merged = { ...remote };
+    Object.keys(local).forEach(key => {
+        if (JSON.stringify(local[key]) !== JSON.stringify(base?.[key])) {
+            merged[key] = local[key];
+        }
+    });
+    return merged;
+};
+
+// 新增或修改紀錄：以 transaction 只改動這一筆，不會覆蓋其他人同時寫入的紀錄
+// previous 為修改前的紀錄（新增時為 null），遠端版本不同時以欄位合併
+export const saveRecord = async (companyId, vehicleId, record, previous = null) => {
+    const recordsRef = ref(database, `companies/${companyId}/vehicles/${vehicleId}/records`);
+    let saved = null;
+    let deleted = false;
     try {
-        const vehicleRef = ref(database, `companies/${companyId}/vehicles/${vehicleId}`);
-        const snapshot = await get(vehicleRef);
-        const vehicle = snapshot.val();
-        const records = vehicle.records || [];
-        records.push(record);
-        await set(ref(database, `companies/${companyId}/vehicles/${vehicleId}/records`), records);
+        await runTransaction(recordsRef, (current) => {
+            saved = null;
+            deleted = false;
+            const records = toRecordMap(current);
+            const key = previous
+                ? Object.keys(records).find(k => isSameRecord(records[k], previous))
+                : undefined;
+            if (previous && key === undefined) {
+                // 第一次執行時可能還沒有資料，回傳原值讓伺服器比對後重試
+                deleted = true;
+                return current;
+            }
+            const existing = key !== undefined ? records[key] : null;
+            let next = { ...record };
+            if (existing && (existing.version || 0) !== (previous.version || 0)) {
+                next = mergeRecord(previous, record, existing);
+            }
+            const id = next.id || existing?.id || newRecordId();
+            saved = { ...next, id, version: (existing?.version || 0) + 1, updated_at: Date.now() };
+            records[key !== undefined ? key : id] = saved;
+            return records;
+        });
     } catch (error) {
-        console.error('新增紀錄時發生錯誤:', error);
+        console.error('儲存紀錄時發生錯誤:', error);
         throw error;
     }
+    if (deleted) throw new Error('紀錄已被其他人刪除');
+    return saved;
 };
 
-// 刪除紀錄
-export const deleteRecord = async (companyId, vehicleId, recordIndex) => {
+// 新增紀錄
+export const addRecord = (companyId, vehicleId, record) => saveRecord(companyId, vehicleId, record);
+
+// 刪除紀錄：遠端在讀取後被其他人修改過時不刪除
+export const deleteRecord = async (companyId, vehicleId, record) => {
+    const recordsRef = ref(database, `companies/${companyId}/vehicles/${vehicleId}/records`);
+    let conflict = false;
     try {
-        const vehicleRef = ref(database, `companies/${companyId}/vehicles/${vehicleId}`);
-        const snapshot = await get(vehicleRef);
-        const vehicle = snapshot.val();
-        const records = vehicle.records || [];
-        records.splice(recordIndex, 1);
-        await set(ref(database, `companies/${companyId}/vehicles/${vehicleId}/records`), records);
+        await runTransaction(recordsRef, (current) => {
+            conflict = false;
+            if (current === null) return current;
+            const records = toRecordMap(current);
+            const key = Object.keys(records).find(k => isSameRecord(records[k], record));
+            if (key === undefined) return undefined; // 已被刪除
+            if ((records[key].version || 0) !== (record.version || 0)) {
+                conflict = true;
+                return undefined;
+            }
+            delete records[key];
+            return records;
+        });
     } catch (error) {
         console.error('刪除紀錄時發生錯誤:', error);
         throw error;
     }
+    if (conflict) throw new Error('紀錄已被其他人修改，請重新整理後再刪除');
+};
+
+// 為沒有時間戳的舊紀錄補上時間戳，只修改缺少時間戳的紀錄
+export const fillRecordTimestamps = async (companyId, vehicleId, timestampOf) => {
+    const recordsRef = ref(database, `companies/${companyId}/vehicles/${vehicleId}/records`);
+    await runTransaction(recordsRef, (current) => {
+        if (current === null) return current;
+        const records = toRecordMap(current);
+        const missing = Object.keys(records).filter(key => !records[key].timestamp);
+        if (missing.length === 0) return undefined;
+        missing.forEach(key => {
+            records[key] = { ...records[key], timestamp: timestampOf(records[key]) };
+        });
+        return records;
+    });
+};
+
+// 只更新公司或車輛的欄位並遞增版本號，不覆蓋其他人同時修改的欄位及下層資料
+export const updateFields = async (path, fields) => {
+    try {
+        const values = Object.fromEntries(
+            Object.entries(fields).filter(([, value]) => value !== undefined)
+        );
+        await update(ref(database, path), {
+            ...values,
+            version: increment(1),
+            updated_at: Date.now()
+        });
+    } catch (error) {
+        console.error('更新資料時發生錯誤:', error);
+        throw error;
+    }
 };
 
 // 登出用戶